@@ -0,0 +1,86 @@
+"""
+Benchmark API describe endpoints.
+
+Compares computing API and API resource descriptions for each
+request against serving the precomputed cached descriptions.
+
+Usage:
+    python benchmarks/describe.py [REQUEST_COUNT]
+
+"""
+import json
+import sys
+import timeit
+
+from pyramid import testing
+
+from sandglass.time.api import API
+from sandglass.time.api.v1 import ApiV1DescribeResource
+from sandglass.time.describe.cache import DESCRIPTIONS
+
+DEFAULT_REQUEST_COUNT = 200
+
+SETTINGS = {
+    'database.url': 'sqlite://',
+}
+
+
+def create_application():
+    config = testing.setUp(settings=SETTINGS, autocommit=True)
+    config.include('sandglass.time.config')
+    # Descriptions are cached when application is created
+    config.make_wsgi_app()
+
+
+def uncached_describe(version, resource_list):
+    api_data = ApiV1DescribeResource(None).describe()
+    json.dumps(api_data)
+    for resource_cls in resource_list:
+        resource = resource_cls(None)
+        data = resource.describer_cls(resource).describe()
+        json.dumps(data)
+
+
+def cached_describe(version, resource_list):
+    DESCRIPTIONS.get_api_description(version).body
+    for resource_cls in resource_list:
+        DESCRIPTIONS.get_resource_description(version, resource_cls).body
+
+
+def run_benchmark(describe, count, repeat=3):
+    version = 'v1'
+    resource_list = API.get_resources(version)
+
+    def describe_all():
+        for index in range(count):
+            describe(version, resource_list)
+
+    seconds = min(timeit.repeat(describe_all, number=1, repeat=repeat))
+    # Each call describes the API and all of its resources
+    return (count * (len(resource_list) + 1)) / seconds
+
+
+def main():
+    count = DEFAULT_REQUEST_COUNT
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+
+    create_application()
+    try:
+        uncached = run_benchmark(uncached_describe, count)
+        cached = run_benchmark(cached_describe, count)
+    finally:
+        testing.tearDown()
+
+    print("Described API {} times".format(count))
+    print("Uncached descriptions: {:>10.0f} descriptions/second".format(
+        uncached
+    ))
+    print("Cached descriptions:   {:>10.0f} descriptions/second".format(
+        cached
+    ))
+    print("Speedup: {:.1f}x".format(cached / uncached))
+
+
+if __name__ == '__main__':
+    main()
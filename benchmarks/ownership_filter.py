@@ -0,0 +1,134 @@
+"""
+Benchmark ownership query filters.
+
+Compares the query plan and timing of the `user_id = :uid OR user_id IS NULL`
+condition used by `ByCurrentUser` filter against a primary key semi-join
+with the `UNION ALL` of both conditions, using an SQLite table with an
+index on `user_id`.
+
+Queries are run as is, and ordered and limited like collection pages.
+
+Usage:
+    python benchmarks/ownership_filter.py [ROW_COUNT]
+
+"""
+import random
+import sys
+import timeit
+
+from sqlalchemy import Column
+from sqlalchemy import create_engine
+from sqlalchemy import Index
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import union_all
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import Integer
+
+from sandglass.time.filters import NULL
+
+DEFAULT_ROW_COUNT = 1000000
+USER_COUNT = 1000
+# Ratio of rows without a user
+NULL_RATIO = 0.01
+# Number of rows in a collection page
+PAGE_SIZE = 50
+
+Base = declarative_base()
+
+
+class Entry(Base):
+    __tablename__ = 'entry'
+    __table_args__ = (Index('ix_entry_user_id', 'user_id'), )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer)
+    value = Column(Integer)
+
+
+def union_all_or_null(field, condition):
+    # Match primary keys with one query for each condition
+    pk_field = field.class_.id
+    matches = select([pk_field]).where(condition)
+    nulls = select([pk_field]).where(field == NULL)
+    return pk_field.in_(union_all(matches, nulls))
+
+
+def create_database(row_count):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    random.seed(0)
+
+    def get_row(index):
+        user_id = None
+        if random.random() >= NULL_RATIO:
+            user_id = random.randint(1, USER_COUNT)
+
+        return {'user_id': user_id, 'value': index}
+
+    insert = Entry.__table__.insert()
+    with engine.begin() as connection:
+        chunk_size = 10000
+        for start in xrange(0, row_count, chunk_size):
+            stop = min(start + chunk_size, row_count)
+            rows = [get_row(index) for index in xrange(start, stop)]
+            connection.execute(insert, rows)
+
+    return engine
+
+
+def compile_statement(engine, statement):
+    compiled = statement.compile(
+        dialect=engine.dialect,
+        compile_kwargs={'literal_binds': True},
+    )
+    return str(compiled)
+
+
+def get_query_plan(engine, sql):
+    result = engine.execute('EXPLAIN QUERY PLAN ' + sql)
+    return [tuple(row)[-1] for row in result]
+
+
+def run_benchmark(engine, sql, repeat=5):
+    def execute():
+        engine.execute(sql).fetchall()
+
+    return min(timeit.repeat(execute, number=1, repeat=repeat))
+
+
+def main():
+    row_count = DEFAULT_ROW_COUNT
+    if len(sys.argv) > 1:
+        row_count = int(sys.argv[1])
+
+    engine = create_database(row_count)
+    field = Entry.user_id
+    user_id = USER_COUNT // 2
+    conditions = (
+        ('OR IS NULL', or_(field == user_id, field == NULL)),
+        ('UNION ALL', union_all_or_null(field, field == user_id)),
+    )
+    print("Filtered {} rows".format(row_count))
+    for paged in (False, True):
+        timings = []
+        for (name, condition) in conditions:
+            statement = select([Entry.id, Entry.value]).where(condition)
+            sql = compile_statement(engine, statement)
+            if paged:
+                name += ' (page)'
+                sql += ' ORDER BY entry.id LIMIT {}'.format(PAGE_SIZE)
+
+            seconds = run_benchmark(engine, sql)
+            timings.append(seconds)
+            print("")
+            print("{}: {:.2f} ms".format(name, seconds * 1000))
+            for detail in get_query_plan(engine, sql):
+                print("    {}".format(detail))
+
+        print("")
+        print("UNION ALL speedup: {:.1f}x".format(timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    main()
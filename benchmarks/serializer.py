@@ -0,0 +1,121 @@
+"""
+Benchmark model object serialization.
+
+Compares the compiled model serializer against the previous
+serialization, which inspected model mapper for each object.
+
+Usage:
+    python benchmarks/serializer.py [OBJECT_COUNT]
+
+"""
+import sys
+import timeit
+
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import object_mapper
+from sqlalchemy.orm import sessionmaker
+
+from sandglass.time.models import META
+from sandglass.time.models.activity import Activity
+
+# Import all models to create all tables
+from sandglass.time.models import client  # NOQA
+from sandglass.time.models import group  # NOQA
+from sandglass.time.models import permission  # NOQA
+from sandglass.time.models import project  # NOQA
+from sandglass.time.models import tag  # NOQA
+from sandglass.time.models import task  # NOQA
+from sandglass.time.models import user  # NOQA
+
+DEFAULT_OBJECT_COUNT = 20000
+
+
+class LegacyIterator(object):
+    """
+    Iterate object fields the way `BaseModel.__iter__` used to.
+
+    """
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __iter__(self):
+        self._mapper = object_mapper(self.obj)
+        self._col_iter = iter(self._mapper.columns)
+
+        return self
+
+    def next(self):
+        # Skip non public properties
+        column = self._col_iter.next()
+        mapper_property = self._mapper.get_property_by_column(column)
+        field_name = mapper_property.key
+
+        while field_name.startswith('_'):
+            column = self._col_iter.next()
+            mapper_property = self._mapper.get_property_by_column(column)
+            field_name = mapper_property.key
+
+        field_value = getattr(self.obj, field_name)
+
+        return (field_name, field_value)
+
+
+def legacy_serialize(obj):
+    return dict(LegacyIterator(obj))
+
+
+def compiled_serialize(obj):
+    return obj.get_serializer().serialize(obj)
+
+
+def create_activities(session, count):
+    start = datetime(2014, 1, 1, 8, 0)
+    for index in range(count):
+        activity = Activity(
+            description=u"Activity {}".format(index),
+            start=start,
+            end=start,
+            # SQLite doesn't check foreign keys by default
+            user_id=1,
+        )
+        session.add(activity)
+
+    session.commit()
+    return Activity.query(session=session).all()
+
+
+def run_benchmark(serialize, object_list, repeat=3):
+    def serialize_all():
+        for obj in object_list:
+            serialize(obj)
+
+    seconds = min(timeit.repeat(serialize_all, number=1, repeat=repeat))
+    return len(object_list) / seconds
+
+
+def main():
+    count = DEFAULT_OBJECT_COUNT
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+
+    engine = create_engine('sqlite://')
+    META.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    object_list = create_activities(session, count)
+
+    # Both serializations must return the same values
+    obj = object_list[0]
+    assert legacy_serialize(obj) == compiled_serialize(obj)
+
+    legacy = run_benchmark(legacy_serialize, object_list)
+    compiled = run_benchmark(compiled_serialize, object_list)
+    print("Serialized {} activities".format(count))
+    print("Legacy serializer:   {:>10.0f} objects/second".format(legacy))
+    print("Compiled serializer: {:>10.0f} objects/second".format(compiled))
+    print("Speedup: {:.1f}x".format(compiled / legacy))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,8 @@ CONFIG = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-fileConfig(CONFIG.config_file_name)
+if CONFIG.config_file_name:
+    fileConfig(CONFIG.config_file_name)
 
 # Register models so they are available in META
 scan_models('sandglass.time.models')
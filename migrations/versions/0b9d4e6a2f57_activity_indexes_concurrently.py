@@ -0,0 +1,90 @@
+"""Add indexes to activities table concurrently on PostgreSQL
+
+PostgreSQL indexes of 3f1c2a7d9b10 are created here, because
+`CREATE INDEX CONCURRENTLY` can't run inside a transaction.
+
+This migration is NOT transactional on PostgreSQL when it is the
+first migration of an upgrade: the migration transaction is committed,
+indexes are created concurrently without blocking writes to the table,
+and a new transaction is started for the following migrations. When
+index creation fails, indexes created before the failure are kept and
+the revision is not stamped, so the migration can be run again (invalid
+indexes left by an interrupted concurrent creation must be dropped
+first). To create the indexes concurrently on a database that is
+several revisions behind, upgrade to e5a1f7c3b920 first.
+
+When earlier migrations are applied in the same upgrade, their changes
+are not committed yet, so indexes are created using `CREATE INDEX`
+inside the migration transaction, which blocks writes to the table
+until the upgrade is finished.
+
+Other databases get the indexes from 3f1c2a7d9b10, so nothing is done.
+
+Revision ID: 0b9d4e6a2f57
+Revises: e5a1f7c3b920
+Create Date: 2026-10-19 01:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0b9d4e6a2f57'
+down_revision = 'e5a1f7c3b920'
+
+from alembic import op
+import sqlalchemy as sa
+
+TABLE_NAME = 'time_activity'
+
+INDEXES = (
+    ('idx_time_activity_user_start', ('user_id', 'start')),
+    ('idx_time_activity_project_start', ('project_id', 'start')),
+    ('idx_time_activity_task_id', ('task_id', )),
+)
+
+
+def get_index_names():
+    inspector = sa.inspect(op.get_bind())
+    return set(index['name'] for index in inspector.get_indexes(TABLE_NAME))
+
+
+def is_first_migration():
+    # Revision is stamped at the end of the upgrade, so current revision
+    # is the one the upgrade started from
+    return op.get_context().get_current_revision() == down_revision
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    index_names = get_index_names()
+    missing = [
+        (name, columns)
+        for (name, columns) in INDEXES
+        if name not in index_names
+    ]
+    if not missing:
+        return
+
+    concurrently = is_first_migration()
+    if concurrently:
+        # Nothing was changed by this upgrade yet, so committing the
+        # migration transaction doesn't leave other migrations half applied
+        op.execute('COMMIT')
+
+    for (name, columns) in missing:
+        op.execute('CREATE INDEX {}{} ON {} ({})'.format(
+            ('CONCURRENTLY ' if concurrently else ''),
+            name,
+            TABLE_NAME,
+            ', '.join(columns),
+        ))
+
+    if concurrently:
+        # Start a new transaction for following migrations and revision stamp
+        op.execute('BEGIN')
+
+
+def downgrade():
+    # Indexes are dropped by 3f1c2a7d9b10 downgrade
+    pass
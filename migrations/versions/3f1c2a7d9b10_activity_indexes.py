@@ -0,0 +1,71 @@
+"""Add indexes to activities table
+
+Indexes are created without blocking writes to the table when
+database supports it, so they can be added to large tables while
+the application is running:
+
+  - PostgreSQL: indexes are not created by this migration. Concurrent
+    indexes can't be created inside the migration transaction, so they
+    are created by the non transactional 0b9d4e6a2f57 migration.
+  - MySQL: indexes are created using in place online DDL.
+  - Other databases: indexes are created using `CREATE INDEX`.
+
+Indexes that already exist are skipped, so migration can also be
+applied to databases created with the indexes.
+
+Revision ID: 3f1c2a7d9b10
+Revises: None
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = None
+
+from alembic import op
+import sqlalchemy as sa
+
+TABLE_NAME = 'time_activity'
+
+INDEXES = (
+    ('idx_time_activity_user_start', ('user_id', 'start')),
+    ('idx_time_activity_project_start', ('project_id', 'start')),
+    ('idx_time_activity_task_id', ('task_id', )),
+)
+
+
+def get_index_names():
+    inspector = sa.inspect(op.get_bind())
+    return set(index['name'] for index in inspector.get_indexes(TABLE_NAME))
+
+
+def create_index(name, columns):
+    dialect_name = op.get_bind().dialect.name
+    sql = 'CREATE INDEX {} ON {} ({})'.format(
+        name,
+        TABLE_NAME,
+        ', '.join(columns),
+    )
+    if dialect_name == 'mysql':
+        op.execute(sql + ' ALGORITHM=INPLACE LOCK=NONE')
+    else:
+        op.create_index(name, TABLE_NAME, list(columns))
+
+
+def upgrade():
+    # PostgreSQL indexes are created concurrently by 0b9d4e6a2f57
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+
+    index_names = get_index_names()
+    for (name, columns) in INDEXES:
+        if name not in index_names:
+            create_index(name, columns)
+
+
+def downgrade():
+    index_names = get_index_names()
+    for (name, columns) in INDEXES:
+        if name in index_names:
+            op.drop_index(name, TABLE_NAME)
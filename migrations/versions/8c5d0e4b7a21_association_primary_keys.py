@@ -0,0 +1,99 @@
+"""Add primary keys and reverse indexes to association tables
+
+Association tables are created again with both columns as primary key,
+because SQLite can't add a primary key to an existing table. Rows are
+copied without duplicates and without rows that have NULL values,
+and an index with reversed columns is created for each table.
+
+Tables are locked while rows are copied, so migration should be
+applied when application is not running.
+
+Revision ID: 8c5d0e4b7a21
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8c5d0e4b7a21'
+down_revision = '3f1c2a7d9b10'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Association table names, with the name and related
+# table for the first and the second columns.
+TABLES = (
+    ('time_activity_tag', 'activity_id', 'time_activity',
+     'tag_id', 'time_tag'),
+    ('time_group_user', 'group_id', 'time_group', 'user_id', 'time_user'),
+    ('time_group_permission', 'group_id', 'time_group',
+     'permission_id', 'time_permission'),
+    ('time_group_project', 'group_id', 'time_group',
+     'project_id', 'time_project'),
+)
+
+
+def get_reverse_index_name(table_name, column_name):
+    return 'idx_{}_{}'.format(table_name, column_name)
+
+
+def copy_table(table_name, first, first_table, second, second_table,
+               primary_key=True):
+    """
+    Create an association table again copying its unique rows.
+
+    """
+    new_table_name = table_name + '_new'
+    constraints = [
+        sa.ForeignKeyConstraint([first], [first_table + '.id']),
+        sa.ForeignKeyConstraint([second], [second_table + '.id']),
+    ]
+    if primary_key:
+        constraints.append(sa.PrimaryKeyConstraint(
+            first,
+            second,
+            name=table_name + '_pkey',
+        ))
+
+    op.create_table(
+        new_table_name,
+        sa.Column(first, sa.Integer(), nullable=(not primary_key)),
+        sa.Column(second, sa.Integer(), nullable=(not primary_key)),
+        *constraints
+    )
+    op.execute(
+        'INSERT INTO {new_table} ({first}, {second}) '
+        'SELECT DISTINCT {first}, {second} FROM {table} '
+        'WHERE {first} IS NOT NULL AND {second} IS NOT NULL'.format(
+            new_table=new_table_name,
+            table=table_name,
+            first=first,
+            second=second,
+        )
+    )
+    op.drop_table(table_name)
+    op.rename_table(new_table_name, table_name)
+
+
+def upgrade():
+    for (table_name, first, first_table, second, second_table) in TABLES:
+        copy_table(table_name, first, first_table, second, second_table)
+        op.create_index(
+            get_reverse_index_name(table_name, second),
+            table_name,
+            [second, first],
+        )
+
+
+def downgrade():
+    # Indexes are removed together with the tables
+    for (table_name, first, first_table, second, second_table) in TABLES:
+        copy_table(
+            table_name,
+            first,
+            first_table,
+            second,
+            second_table,
+            primary_key=False,
+        )
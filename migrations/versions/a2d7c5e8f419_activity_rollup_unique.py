@@ -0,0 +1,52 @@
+"""Add unique index to daily activity totals
+
+Totals computed at the same time by concurrent requests could be
+saved twice. Totals of users with duplicated totals are deleted by
+this migration. After upgrading run `sandglass manage rebuild_rollup`
+to compute them again.
+
+Revision ID: a2d7c5e8f419
+Revises: b6e4f1a9c382
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a2d7c5e8f419'
+down_revision = 'b6e4f1a9c382'
+
+from alembic import op
+from sqlalchemy.sql import column
+from sqlalchemy.sql import table
+import sqlalchemy as sa
+
+TABLE_NAME = 'time_activity_rollup'
+
+INDEX_NAME = 'uq_time_activity_rollup_group'
+
+GROUP_COLUMNS = ('user_id', 'day', 'project_id', 'task_id', 'activity_type')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    indexes = inspector.get_indexes(TABLE_NAME)
+    if INDEX_NAME in set(index['name'] for index in indexes):
+        return
+
+    # Totals of users with duplicated totals are deleted
+    rollup = table(TABLE_NAME, *[column(name) for name in GROUP_COLUMNS])
+    group_columns = [rollup.c[name] for name in GROUP_COLUMNS]
+    statement = sa.select([rollup.c.user_id]).group_by(*group_columns)
+    statement = statement.having(sa.func.count() > 1)
+    user_id_list = set(user_id for (user_id, ) in bind.execute(statement))
+    if user_id_list:
+        op.execute(
+            rollup.delete().where(rollup.c.user_id.in_(sorted(user_id_list)))
+        )
+
+    op.create_index(INDEX_NAME, TABLE_NAME, list(GROUP_COLUMNS), unique=True)
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, TABLE_NAME)
@@ -0,0 +1,57 @@
+"""Add created and modified columns to API model tables
+
+Columns are added only to tables that don't have them, so migration
+can also be applied to databases created with the columns.
+
+Revision ID: b6e4f1a9c382
+Revises: f3a8d6b2c147
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b6e4f1a9c382'
+down_revision = 'f3a8d6b2c147'
+
+from alembic import op
+import sqlalchemy as sa
+
+TABLE_NAMES = (
+    'time_activity',
+    'time_client',
+    'time_group',
+    'time_project',
+    'time_tag',
+    'time_task',
+)
+
+COLUMN_NAMES = ('created', 'modified')
+
+
+def get_column_names(table_name):
+    inspector = sa.inspect(op.get_bind())
+    columns = inspector.get_columns(table_name)
+    return set(column['name'] for column in columns)
+
+
+def upgrade():
+    for table_name in TABLE_NAMES:
+        column_names = get_column_names(table_name)
+        for name in COLUMN_NAMES:
+            if name not in column_names:
+                op.add_column(
+                    table_name,
+                    sa.Column(name, sa.DateTime(), nullable=True),
+                )
+
+
+def downgrade():
+    # SQLite can't drop columns, so timestamps are kept there
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+
+    for table_name in TABLE_NAMES:
+        column_names = get_column_names(table_name)
+        for name in COLUMN_NAMES:
+            if name in column_names:
+                op.drop_column(table_name, name)
@@ -0,0 +1,42 @@
+"""Add cache versions table
+
+Revision ID: c9e3b8d2a614
+Revises: a2d7c5e8f419
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c9e3b8d2a614'
+down_revision = 'a2d7c5e8f419'
+
+from alembic import op
+from sqlalchemy.sql import column
+from sqlalchemy.sql import table
+import sqlalchemy as sa
+
+TABLE_NAME = 'time_cache_version'
+
+# Names of the versions used by the application
+VERSION_NAMES = (u'visible_projects', )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if TABLE_NAME in inspector.get_table_names():
+        return
+
+    op.create_table(
+        TABLE_NAME,
+        sa.Column('name', sa.Unicode(64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    versions = table(TABLE_NAME, column('name'), column('version'))
+    op.bulk_insert(versions, [
+        {'name': name, 'version': 0} for name in VERSION_NAMES
+    ])
+
+
+def downgrade():
+    op.drop_table(TABLE_NAME)
@@ -0,0 +1,69 @@
+"""Add daily activity totals table
+
+Totals are not computed by this migration. After upgrading run
+`sandglass manage rebuild_rollup` to compute them, or disable
+`report.use_rollup` setting until they are computed.
+
+Revision ID: d41a6f3c9e58
+Revises: 8c5d0e4b7a21
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd41a6f3c9e58'
+down_revision = '8c5d0e4b7a21'
+
+from alembic import op
+import sqlalchemy as sa
+
+TABLE_NAME = 'time_activity_rollup'
+
+ACTIVITY_TYPES = (
+    'unassigned',
+    'working',
+    'break',
+    'trip',
+    'vacation',
+    'holiday',
+    'sick',
+    'onleave',
+    'appointment',
+)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if TABLE_NAME in inspector.get_table_names():
+        return
+
+    op.create_table(
+        TABLE_NAME,
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.Column('task_id', sa.Integer(), nullable=True),
+        sa.Column(
+            'activity_type',
+            sa.Enum(*ACTIVITY_TYPES, native_enum=False),
+            nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('seconds', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['time_user.id']),
+        sa.ForeignKeyConstraint(['project_id'], ['time_project.id']),
+        sa.ForeignKeyConstraint(['task_id'], ['time_task.id']),
+    )
+    op.create_index(
+        'idx_time_activity_rollup_user_day',
+        TABLE_NAME,
+        ['user_id', 'day'],
+    )
+    op.create_index(
+        'idx_time_activity_rollup_project_day',
+        TABLE_NAME,
+        ['project_id', 'day'],
+    )
+
+
+def downgrade():
+    op.drop_table(TABLE_NAME)
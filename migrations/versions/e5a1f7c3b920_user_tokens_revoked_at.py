@@ -0,0 +1,41 @@
+"""Add access token revocation time to users
+
+Revision ID: e5a1f7c3b920
+Revises: c9e3b8d2a614
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1f7c3b920'
+down_revision = 'c9e3b8d2a614'
+
+from alembic import op
+import sqlalchemy as sa
+
+TABLE_NAME = 'time_user'
+
+COLUMN_NAME = 'tokens_revoked_at'
+
+
+def get_column_names():
+    inspector = sa.inspect(op.get_bind())
+    columns = inspector.get_columns(TABLE_NAME)
+    return set(column['name'] for column in columns)
+
+
+def upgrade():
+    if COLUMN_NAME not in get_column_names():
+        op.add_column(
+            TABLE_NAME,
+            sa.Column(COLUMN_NAME, sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade():
+    # SQLite can't drop columns, so revocation times are kept there
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+
+    if COLUMN_NAME in get_column_names():
+        op.drop_column(TABLE_NAME, COLUMN_NAME)
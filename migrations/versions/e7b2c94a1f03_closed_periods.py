@@ -0,0 +1,106 @@
+"""Add closed periods and activity snapshot tables
+
+Revision ID: e7b2c94a1f03
+Revises: d41a6f3c9e58
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c94a1f03'
+down_revision = 'd41a6f3c9e58'
+
+from alembic import op
+import sqlalchemy as sa
+
+ACTIVITY_TYPES = (
+    'unassigned',
+    'working',
+    'break',
+    'trip',
+    'vacation',
+    'holiday',
+    'sick',
+    'onleave',
+    'appointment',
+)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    table_names = inspector.get_table_names()
+    if 'time_period' not in table_names:
+        op.create_table(
+            'time_period',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('created', sa.DateTime(), nullable=True),
+            sa.Column('modified', sa.DateTime(), nullable=True),
+            sa.Column('start', sa.Date(), nullable=False),
+            sa.Column('end', sa.Date(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('group_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['time_user.id']),
+            sa.ForeignKeyConstraint(['group_id'], ['time_group.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(
+            'idx_time_period_start_end',
+            'time_period',
+            ['start', 'end'],
+        )
+
+    if 'time_period_user' not in table_names:
+        op.create_table(
+            'time_period_user',
+            sa.Column('period_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['period_id'], ['time_period.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['time_user.id']),
+            sa.PrimaryKeyConstraint('period_id', 'user_id'),
+        )
+        op.create_index(
+            'idx_time_period_user_user_id',
+            'time_period_user',
+            ['user_id', 'period_id'],
+        )
+
+    if 'time_activity_snapshot' not in table_names:
+        op.create_table(
+            'time_activity_snapshot',
+            sa.Column('period_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('project_id', sa.Integer(), nullable=True),
+            sa.Column('task_id', sa.Integer(), nullable=True),
+            sa.Column(
+                'activity_type',
+                sa.Enum(*ACTIVITY_TYPES, native_enum=False),
+                nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('seconds', sa.Integer(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['period_id'], ['time_period.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['time_user.id']),
+            sa.ForeignKeyConstraint(['project_id'], ['time_project.id']),
+            sa.ForeignKeyConstraint(['task_id'], ['time_task.id']),
+        )
+        op.create_index(
+            'idx_time_activity_snapshot_period_id',
+            'time_activity_snapshot',
+            ['period_id'],
+        )
+        op.create_index(
+            'idx_time_activity_snapshot_user_day',
+            'time_activity_snapshot',
+            ['user_id', 'day'],
+        )
+        op.create_index(
+            'idx_time_activity_snapshot_project_day',
+            'time_activity_snapshot',
+            ['project_id', 'day'],
+        )
+
+
+def downgrade():
+    op.drop_table('time_activity_snapshot')
+    op.drop_table('time_period_user')
+    op.drop_table('time_period')
@@ -0,0 +1,45 @@
+"""Add user time zones and time zone offsets table
+
+Revision ID: f3a8d6b2c147
+Revises: e7b2c94a1f03
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d6b2c147'
+down_revision = 'e7b2c94a1f03'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    user_columns = inspector.get_columns('time_user')
+    if 'timezone' not in [column['name'] for column in user_columns]:
+        op.add_column(
+            'time_user',
+            sa.Column(
+                'timezone',
+                sa.Unicode(64),
+                nullable=False,
+                server_default='UTC'),
+        )
+
+    if 'time_timezone_offset' not in inspector.get_table_names():
+        op.create_table(
+            'time_timezone_offset',
+            sa.Column('timezone', sa.Unicode(64), nullable=False),
+            sa.Column('start', sa.DateTime(), nullable=False),
+            sa.Column('end', sa.DateTime(), nullable=False),
+            sa.Column('offset', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('timezone', 'start'),
+        )
+
+
+def downgrade():
+    op.drop_table('time_timezone_offset')
+    # SQLite can't drop columns, so time zones are kept there
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_column('time_user', 'timezone')
@@ -7,6 +7,7 @@ from pyramid.security import Deny
 from pyramid.security import Everyone
 from zope import interface
 
+from sandglass.time.describe.cache import DESCRIPTIONS
 from sandglass.time.describe.interfaces import IDescribable
 from sandglass.time.security import Administrators
 
@@ -53,6 +54,17 @@ class ApiManager(object):
         """
         return self.registry[version].values()
 
+    def get_resource_version(self, resource):
+        """
+        Get the API version where a `BaseResource` is registered.
+
+        Returns a String or None when resource is not registered.
+
+        """
+        for (version, resources) in self.registry.items():
+            if resources.get(resource.name) is resource:
+                return version
+
     def is_valid_version(self, version):
         """
         Check if an API version is valid.
@@ -93,7 +105,9 @@ class ApiDescribeResource(object):
         self.request = request
 
     def __call__(self):
-        return self.describe()
+        # Descriptions are static, so a precomputed one is used
+        description = DESCRIPTIONS.get_api_description(self.version)
+        return description.get_response(self.request)
 
     @property
     def resources(self):
@@ -14,6 +14,10 @@ CODES = {
     'COLLECTION_NOT_ALLOWED': _(
         "This operation is not allowed for collections"),
     'INVALID_FILTER': _("Filter is not valid"),
+    'INVALID_PAGINATION': _("Pagination arguments are not valid"),
+    'INVALID_REPORT': _("Report arguments are not valid"),
+    'INVALID_PERIOD': _("Period can't be closed"),
+    'PERIOD_CLOSED': _("Activities of closed periods can't be changed"),
 }
 
 
@@ -1,11 +1,27 @@
+import transaction
+
+from sandglass.time import _
 from sandglass.time.api import API
+from sandglass.time.api.error import APIError
 from sandglass.time.models.activity import Activity
 from sandglass.time.models.tag import Tag
+from sandglass.time.reports.cache import invalidate_days_after_commit
+from sandglass.time.reports.cache import REPORT_CACHE
+from sandglass.time.reports.rollup import get_activity_days
+from sandglass.time.reports.rollup import lock_users
+from sandglass.time.reports.rollup import update_rollup
+from sandglass.time.reports.snapshot import get_closed_days
+from sandglass.time.resource.action import collection_action
 from sandglass.time.resource.action import member_action
 from sandglass.time.resource.model import ModelResource
+from sandglass.time.resource.model import use_schema
+from sandglass.time.resource.report import get_activity_report
+from sandglass.time.security import PERMISSION
+from sandglass.time.response import info_response
 from sandglass.time.schemas import IdListSchema
 from sandglass.time.schemas.activity import ActivityListSchema
 from sandglass.time.schemas.activity import ActivitySchema
+from sandglass.time.schemas.activity import ActivityTagsSchema
 
 
 class ActivityResource(ModelResource):
@@ -17,6 +33,139 @@ class ActivityResource(ModelResource):
     model = Activity
     schema = ActivitySchema
     list_schema = ActivityListSchema
+    pagination_keys = ('start', 'id')
+    bulk_create = True
+
+    def __init__(self, request):
+        super(ActivityResource, self).__init__(request)
+        # Users, projects and days of activities before they are changed
+        self.changed_days = set()
+
+    def save_changed_days(self, pk_list):
+        """
+        Save users, projects and days of activities that are going
+        to change.
+
+        Daily totals and cached reports for these days are updated
+        after activities change.
+
+        """
+        session = Activity.new_session()
+        self.changed_days.update(get_activity_days(session, pk_list))
+
+    def notify_changes(self, pk_list=None, related_name=None):
+        # Update daily totals for changed activities in current
+        # transaction. Related objects are not part of the totals.
+        if pk_list and not related_name:
+            session = Activity.new_session()
+            days = self.changed_days | get_activity_days(session, pk_list)
+            self.changed_days = set()
+            # Users are locked for update before closed days are
+            # checked, so concurrent changes for the same users
+            # wait until this transaction ends
+            lock_users(session, [item[0] for item in days])
+            # Activities can't be changed from or into closed periods
+            closed_days = get_closed_days(session, days)
+            if closed_days:
+                transaction.doom()
+                details = sorted(set(
+                    day.isoformat() for (user_id, project_id, day)
+                    in closed_days
+                ))
+                raise APIError('PERIOD_CLOSED', details=details)
+
+            update_rollup(session, days)
+            invalidate_days_after_commit(days)
+
+        super(ActivityResource, self).notify_changes(
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+
+    def put_collection(self):
+        data_list = self.submitted_collection_data
+        self.save_changed_days([data['id'] for data in data_list])
+        return super(ActivityResource, self).put_collection()
+
+    def delete_collection(self):
+        data_list = self.submitted_collection_data
+        self.save_changed_days([data['id'] for data in data_list])
+        return super(ActivityResource, self).delete_collection()
+
+    def put_member(self):
+        self.save_changed_days([self.pk_value])
+        return super(ActivityResource, self).put_member()
+
+    def delete_member(self):
+        self.save_changed_days([self.pk_value])
+        return super(ActivityResource, self).delete_member()
+
+    @use_schema(ActivityTagsSchema)
+    @collection_action(methods=('POST', 'DELETE'))
+    def tag(self):
+        """
+        Add or remove tags for a list of activities.
+
+        JSON request body is an object with a list of activity IDs
+        and a list of tag IDs:
+
+            {"activities": [1, 2, ..], "tags": [4, 5, ..]}
+
+        POST requests add all tags to all activities, and DELETE
+        requests remove them.
+
+        Returns the number of tags that were added or removed.
+
+        """
+        data = self.submitted_member_data
+        session = Activity.new_session()
+        if self.request.method == 'POST':
+            count = Activity.add_tags(
+                data['activities'],
+                data['tags'],
+                session=session,
+            )
+            msg = _("Tags added successfully")
+        else:
+            count = Activity.remove_tags(
+                data['activities'],
+                data['tags'],
+                session=session,
+            )
+            msg = _("Tags removed successfully")
+
+        self.notify_changes(data['activities'], related_name='tags')
+        return info_response(msg, data={'count': count})
+
+    @collection_action(methods='GET')
+    def report(self):
+        """
+        Get total duration of activities.
+
+        Report groups are given as a comma separated `group_by`
+        argument with any of user, project, task, activity_type,
+        tag, and one of day, week or month. Date range is given
+        using `from` and `to` arguments.
+        Activities can be filtered by user and project using comma
+        separated lists of IDs in `users` and `projects` arguments.
+
+        Returns a Dictionary with report columns and rows.
+
+        """
+        return get_activity_report(self)
+
+    @collection_action(
+        methods='GET',
+        permission=PERMISSION.get(Activity, 'report_cache'),
+    )
+    def report_cache(self):
+        """
+        Get report cache statistics.
+
+        Returns a Dictionary.
+
+        """
+        return REPORT_CACHE.stats()
 
     @member_action(methods='POST')
     def add_tags(self):
@@ -29,16 +178,13 @@ class ActivityResource(ModelResource):
         activity = self.object
         id_list_schema = IdListSchema()
         tag_id_list = id_list_schema.deserialize(self.request_data)
-        # Get Tag objects for the given IDs
         session = activity.current_session
+        Activity.add_tags([activity.id], tag_id_list, session=session)
+        self.notify_changes([activity.id], related_name='tags')
+        # Get Tag objects for the given IDs
         query = Tag.query(session=session)
         query = query.filter(Tag.id.in_(tag_id_list))
-        tag_list = query.all()
-        for tag in tag_list:
-            # TODO: Implement it using plain inserts
-            activity.tags.append(tag)
-
-        return tag_list
+        return query.all()
 
     @member_action(methods='DELETE')
     def remove_tags(self):
@@ -54,14 +200,16 @@ class ActivityResource(ModelResource):
         activity = self.object
         id_list_schema = IdListSchema()
         tag_id_list = id_list_schema.deserialize(self.request_data)
-        removed_tag_list = []
-        for tag in list(activity.tags):
-            if tag.id not in tag_id_list:
-                continue
-
-            # TODO: Implement it using plain deletes
-            activity.tags.remove(tag)
-            removed_tag_list.append(tag)
+        # Get the Tags to remove that are assigned to current activity
+        session = activity.current_session
+        query = Tag.query(session=session).with_parent(activity, 'tags')
+        query = query.filter(Tag.id.in_(tag_id_list))
+        removed_tag_list = query.all()
+        if removed_tag_list:
+            removed_id_list = [tag.id for tag in removed_tag_list]
+            Activity.remove_tags([activity.id], removed_id_list,
+                                 session=session)
+            self.notify_changes([activity.id], related_name='tags')
 
         return removed_tag_list
 
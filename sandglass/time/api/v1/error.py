@@ -4,6 +4,7 @@ from sandglass.time.api.error import APIError
 
 # API error codes and messages
 CODES = {
+    'ACCESS_TOKENS_DISABLED': _("Signed access tokens are not enabled"),
     'INVALID_SIGNIN': _("Invalid sign in credentials"),
     'USER_EMAIL_EXISTS': _("A user with the same E-Mail already exists"),
     'USER_NOT_FOUND': _("User not found"),
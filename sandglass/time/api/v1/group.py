@@ -1,5 +1,8 @@
 from sandglass.time.api import API
+from sandglass.time.auth.token import revoke_access_tokens
 from sandglass.time.models.group import Group
+from sandglass.time.models.project import changes_visible_projects
+from sandglass.time.models.project import increment_visible_projects_version
 from sandglass.time.resource.model import ModelResource
 from sandglass.time.schemas.group import GroupListSchema
 from sandglass.time.schemas.group import GroupSchema
@@ -15,5 +18,23 @@ class GroupResource(ModelResource):
     schema = GroupSchema
     list_schema = GroupListSchema
 
+    def notify_changes(self, pk_list=None, related_name=None):
+        # Projects cached by other processes are not visible anymore
+        if changes_visible_projects(self.model, related_name):
+            session = self.model.new_session()
+            increment_visible_projects_version(session)
+
+        # Access tokens with old principals are not valid anymore
+        revoke_access_tokens(
+            self.request,
+            self.model,
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+        super(GroupResource, self).notify_changes(
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+
 
 API.register('v1', GroupResource)
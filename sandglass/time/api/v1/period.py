@@ -0,0 +1,56 @@
+import transaction
+
+from sandglass.time.api import API
+from sandglass.time.api.error import APIError
+from sandglass.time.models.period import Period
+from sandglass.time.reports import PeriodError
+from sandglass.time.reports.snapshot import close_periods
+from sandglass.time.reports.snapshot import open_periods
+from sandglass.time.resource.model import ModelResource
+from sandglass.time.schemas.period import PeriodListSchema
+from sandglass.time.schemas.period import PeriodSchema
+
+
+class PeriodResource(ModelResource):
+    """
+    REST API resource for closed timesheet periods.
+
+    Creating a period closes it, and deleting it opens it again.
+    Updated periods are opened and closed again with the new values.
+
+    """
+    name = 'periods'
+    model = Period
+    schema = PeriodSchema
+    list_schema = PeriodListSchema
+
+    def notify_changes(self, pk_list=None, related_name=None):
+        # Periods are opened and closed again in current transaction
+        # after they are created or updated, so they are not changed
+        # when the request fails. Deleted periods are opened before
+        # they are deleted.
+        if pk_list and not related_name:
+            session = Period.new_session()
+            try:
+                open_periods(session, pk_list)
+                close_periods(session, pk_list)
+            except PeriodError, err:
+                transaction.doom()
+                raise APIError('INVALID_PERIOD', details=err.message)
+
+        super(PeriodResource, self).notify_changes(
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+
+    def delete_collection(self):
+        data_list = self.submitted_collection_data
+        open_periods(Period.new_session(), [data['id'] for data in data_list])
+        return super(PeriodResource, self).delete_collection()
+
+    def delete_member(self):
+        open_periods(Period.new_session(), [self.pk_value])
+        return super(PeriodResource, self).delete_member()
+
+
+API.register('v1', PeriodResource)
@@ -1,4 +1,5 @@
 from sandglass.time.api import API
+from sandglass.time.auth.token import revoke_access_tokens
 from sandglass.time.models.permission import Permission
 from sandglass.time.resource.model import ModelResource
 from sandglass.time.schemas.permission import PermissionListSchema
@@ -15,5 +16,18 @@ class PermissionResource(ModelResource):
     schema = PermissionSchema
     list_schema = PermissionListSchema
 
+    def notify_changes(self, pk_list=None, related_name=None):
+        # Access tokens with old permissions are not valid anymore
+        revoke_access_tokens(
+            self.request,
+            self.model,
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+        super(PermissionResource, self).notify_changes(
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+
 
 API.register('v1', PermissionResource)
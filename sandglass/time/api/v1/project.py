@@ -1,29 +1,31 @@
-from sqlalchemy import or_
+from pyramid.exceptions import NotFound
 
 from sandglass.time.api import API
-from sandglass.time.filters import QueryFilter
+from sandglass.time.filters.project import ByVisibleProject
+from sandglass.time.models.project import changes_visible_projects
+from sandglass.time.models.project import increment_visible_projects_version
 from sandglass.time.models.project import Project
+from sandglass.time.resource.action import member_action
 from sandglass.time.resource.model import ModelResource
+from sandglass.time.resource.report import get_activity_report
 from sandglass.time.schemas.project import ProjectListSchema
 from sandglass.time.schemas.project import ProjectSchema
+from sandglass.time.security import PERMISSION
 
 
-class ByUserOrPublic(QueryFilter):
+class ByUserOrPublic(ByVisibleProject):
     """
-    Filter private projects that are now owned by current user.
+    Filter private projects that are not visible for current user.
+
+    Private projects are visible to their owner and to the
+    members of the groups they are shared with.
 
     """
-    def filter_query(self, query, request, resource):
-        user = request.authenticated_user
-        # When user has view private permission skip filtering
-        if user.has_permission('time.project.view_private'):
-            return query
-
-        filters = or_(
-            Project.user_id == user.id,
-            Project.is_public == True,
-        )
-        return query.filter(filters)
+    project_field_name = 'id'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('filter_nulls', True)
+        super(ByUserOrPublic, self).__init__(*args, **kwargs)
 
 
 class ProjectResource(ModelResource):
@@ -41,5 +43,37 @@ class ProjectResource(ModelResource):
         filters = super(ProjectResource, cls).get_query_filters()
         return filters + (ByUserOrPublic(), )
 
+    def notify_changes(self, pk_list=None, related_name=None):
+        # Projects cached by other processes are not visible anymore
+        if changes_visible_projects(self.model, related_name):
+            session = self.model.new_session()
+            increment_visible_projects_version(session)
+
+        super(ProjectResource, self).notify_changes(
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+
+    @member_action(methods='GET', permission=PERMISSION.get(Project, 'read'))
+    def report(self):
+        """
+        Get total duration of activities for current project.
+
+        Report groups are given as a comma separated `group_by`
+        argument with any of user, project, task, activity_type,
+        tag, and one of day, week or month. Date range is given
+        using `from` and `to` arguments.
+
+        Report can be read by any user that can see the project,
+        so private projects that are not visible are not found.
+
+        Returns a Dictionary with report columns and rows.
+
+        """
+        if not self.is_visible_object:
+            raise NotFound()
+
+        return get_activity_report(self, project_id_list=[self.pk_value])
+
 
 API.register('v1', ProjectResource)
@@ -6,20 +6,30 @@ from pyramid.exceptions import NotFound
 
 from sandglass.time import _
 from sandglass.time.api import API
+from sandglass.time.auth.basic import get_basic_credentials
+from sandglass.time.auth.cache import AUTH_CACHE
+from sandglass.time.auth.token import get_token_signer
+from sandglass.time.auth.token import revoke_access_tokens
+from sandglass.time.auth.token import TOKEN_TYPE
+from sandglass.time.auth.token_filter import TOKEN_FILTER
 from sandglass.time.filters.search import BySearchFields
 from sandglass.time.filters.search import Filter
 from sandglass.time.models.activity import Activity
 from sandglass.time.models.group import Group
+from sandglass.time.models.project import changes_visible_projects
+from sandglass.time.models.project import increment_visible_projects_version
 from sandglass.time.models.user import User
 from sandglass.time.resource.action import collection_action
 from sandglass.time.resource.action import member_action
 from sandglass.time.resource.model import ModelResource
 from sandglass.time.resource.model import use_schema
+from sandglass.time.resource.report import get_activity_report
 from sandglass.time.response import error_response
 from sandglass.time.schemas.user import UserListSchema
 from sandglass.time.schemas.user import UserSigninSchema
 from sandglass.time.schemas.user import UserSignupSchema
 from sandglass.time.schemas.user import UserSchema
+from sandglass.time.security import PERMISSION
 from sandglass.time.security import Users
 from sandglass.time.security import PUBLIC
 
@@ -70,6 +80,24 @@ class UserResource(ModelResource):
         # Allow simple search of users
         return filters + (BySearchFields(User, SEARCH_FILTERS), )
 
+    def notify_changes(self, pk_list=None, related_name=None):
+        # Projects cached by other processes are not visible anymore
+        if changes_visible_projects(self.model, related_name):
+            session = self.model.new_session()
+            increment_visible_projects_version(session)
+
+        # Access tokens with old principals are not valid anymore
+        revoke_access_tokens(
+            self.request,
+            self.model,
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+        super(UserResource, self).notify_changes(
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+
     @use_schema(UserSigninSchema)
     @collection_action(methods='POST', permission=PUBLIC)
     def signin(self):
@@ -118,6 +146,42 @@ class UserResource(ModelResource):
 
         return user
 
+    @collection_action(methods='POST', permission=PUBLIC)
+    def access_token(self):
+        """
+        Get a signed access token for a user.
+
+        User is authenticated with HTTP Basic auth token and key,
+        or with `email` and `password` values like in `@signin`.
+
+        Returns a Dictionary with the access token.
+
+        """
+        signer = get_token_signer(self.request)
+        if not signer:
+            raise APIV1Error('ACCESS_TOKENS_DISABLED')
+
+        credentials = get_basic_credentials(self.request)
+        if credentials:
+            (token, key) = credentials
+            user = User.get_by_token(token)
+            is_valid = (user and user.key == key)
+        else:
+            schema = UserSigninSchema().bind(request=self.request)
+            data = schema.deserialize(self.request_data)
+            user = User.get_by_email(data['email'])
+            is_valid = (user and user.is_valid_password(data['password']))
+
+        if not is_valid:
+            raise APIV1Error('INVALID_SIGNIN')
+
+        principals = [unicode(group) for group in user.groups]
+        return {
+            'access_token': signer.create_token(user.id, principals),
+            'token_type': TOKEN_TYPE,
+            'expires_in': signer.max_age,
+        }
+
     @collection_action(methods='GET')
     def search(self):
         """
@@ -141,6 +205,21 @@ class UserResource(ModelResource):
 
         raise APIV1Error('USER_NOT_FOUND')
 
+    @collection_action(
+        methods='GET',
+        permission=PERMISSION.get(User, 'auth_cache'),
+    )
+    def auth_cache(self):
+        """
+        Get authentication cache and user tokens filter statistics.
+
+        Returns a Dictionary.
+
+        """
+        stats = AUTH_CACHE.stats()
+        stats['token_filter'] = TOKEN_FILTER.stats()
+        return stats
+
     @member_action(methods='GET')
     def activities(self):
         """
@@ -175,5 +254,32 @@ class UserResource(ModelResource):
 
         return query.all()
 
+    @member_action(methods='GET', permission=PERMISSION.get(User, 'read'))
+    def report(self):
+        """
+        Get total duration of activities for current user.
+
+        Report groups are given as a comma separated `group_by`
+        argument with any of user, project, task, activity_type,
+        tag, and one of day, week or month. Date range is given
+        using `from` and `to` arguments.
+
+        Users can only get their own report, unless they are
+        administrators or they have permission to update users.
+
+        Returns a Dictionary with report columns and rows.
+
+        """
+        user = self.request.authenticated_user
+        can_view = (
+            user.id == self.pk_value or
+            user.is_admin or
+            user.has_permission(PERMISSION.get(User, 'update'))
+        )
+        if not can_view or not self.is_visible_object:
+            raise NotFound()
+
+        return get_activity_report(self, user_id_list=[self.pk_value])
+
 
 API.register('v1', UserResource)
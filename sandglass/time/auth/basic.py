@@ -1,9 +1,19 @@
 from pyramid.authentication import BasicAuthAuthenticationPolicy
+from pyramid.events import ApplicationCreated
 from pyramid.httpexceptions import HTTPForbidden
 from pyramid.httpexceptions import HTTPUnauthorized
 from pyramid.security import forget
 
-from sandglass.time.models.user import User
+from sandglass.time.auth.cache import AUTH_CACHE
+from sandglass.time.auth.cache import AuthInfo
+from sandglass.time.auth.cache import configure_auth_cache
+from sandglass.time.auth.cache import get_cache_key
+from sandglass.time.auth.cache import invalidate_auth_cache
+from sandglass.time.auth.token_filter import build_token_filter
+from sandglass.time.auth.token_filter import configure_token_filter
+from sandglass.time.auth.token_filter import TOKEN_FILTER
+from sandglass.time.auth.token_filter import update_token_filter
+from sandglass.time.events import ModelChanged
 
 
 def handle_basic_auth_challenge(request):
@@ -23,6 +33,17 @@ def handle_basic_auth_challenge(request):
     return response
 
 
+def get_basic_credentials(request):
+    """
+    Get HTTP Basic auth credentials from current request.
+
+    Returns a Tuple with token and key, or None.
+
+    """
+    policy = BasicAuthAuthenticationPolicy(None)
+    return policy._get_credentials(request)
+
+
 def auth_callback(username, password, request):
     """
     HTTP standard basic authentication protocol callback.
@@ -30,14 +51,31 @@ def auth_callback(username, password, request):
     Returns None if the user doesn't exist or a sequence of principal
     identifiers (possibly empty) if the user does exist.
 
+    Principals are cached between requests by user token and key.
+
     """
-    user = User.get_by_token(username)
-    authenticated = (user and user.key == password)
-    if not authenticated:
-        return
+    cache_key = get_cache_key(username, password)
+    auth_info = AUTH_CACHE.get(cache_key)
+    if auth_info is None:
+        # Reject unknown tokens without a database query
+        if not TOKEN_FILTER.might_contain(username):
+            return
+
+        # User is loaded once per request, with its groups
+        user = request.token_user
+        authenticated = (user and user.token == username)
+        if not authenticated:
+            TOKEN_FILTER.add_false_positive()
+            return
+        elif user.key != password:
+            return
+
+        # Get user credentials
+        principals = [unicode(group) for group in user.groups]
+        auth_info = AuthInfo(user.id, principals)
+        AUTH_CACHE.set(cache_key, auth_info)
 
-    # Get user credentials
-    return [unicode(group) for group in user.groups]
+    return list(auth_info.principals)
 
 
 def setup_basic_http_auth(config):
@@ -49,3 +87,12 @@ def setup_basic_http_auth(config):
     basic_auth = BasicAuthAuthenticationPolicy(auth_callback, realm=realm)
     config.set_authentication_policy(basic_auth)
     config.add_forbidden_view(handle_basic_auth_challenge)
+
+    # Cache user principals between requests
+    configure_auth_cache(config.registry.settings)
+    config.add_subscriber(invalidate_auth_cache, ModelChanged)
+
+    # Filter unknown user tokens
+    configure_token_filter(config.registry.settings)
+    config.add_subscriber(build_token_filter, ApplicationCreated)
+    config.add_subscriber(update_token_filter, ModelChanged)
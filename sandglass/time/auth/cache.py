@@ -0,0 +1,126 @@
+import hashlib
+
+from sandglass.time.cache import LRUCache
+from sandglass.time.models.group import Group
+from sandglass.time.models.permission import Permission
+from sandglass.time.models.user import User
+
+# Values used when there are no values in the settings
+DEFAULT_CACHE_SIZE = 1000
+DEFAULT_CACHE_TTL = 30
+
+# Relationships that change user principals
+USER_RELATIONSHIPS = ('groups', )
+GROUP_RELATIONSHIPS = ('users', 'permissions')
+
+
+class AuthInfo(object):
+    """
+    Authentication information for a user.
+
+    Only the values needed by the authentication callback are saved.
+
+    """
+    def __init__(self, user_id, principals):
+        self.user_id = user_id
+        self.principals = tuple(principals)
+
+
+# Global cache of AuthInfo by user token and key hash
+AUTH_CACHE = LRUCache(max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL)
+
+
+def get_cache_key(token, key):
+    """
+    Get the auth cache key for a user token and key.
+
+    User key is not saved as is in the cache.
+
+    Returns a Tuple.
+
+    """
+    if isinstance(key, unicode):
+        key = key.encode('utf8')
+
+    return (token, hashlib.sha256(key).hexdigest())
+
+
+def get_setting_value(settings, name, default):
+    try:
+        return max(int(settings.get(name)), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def configure_auth_cache(settings):
+    """
+    Configure auth cache size and TTL.
+
+    Values are getted from `auth.cache_size` and `auth.cache_ttl`
+    settings. Cache is disabled when size is 0.
+
+    """
+    AUTH_CACHE.max_size = get_setting_value(
+        settings,
+        'auth.cache_size',
+        DEFAULT_CACHE_SIZE,
+    )
+    AUTH_CACHE.ttl = get_setting_value(
+        settings,
+        'auth.cache_ttl',
+        DEFAULT_CACHE_TTL,
+    )
+    AUTH_CACHE.clear()
+    AUTH_CACHE.reset_stats()
+
+
+def invalidate_users(user_id_list=None):
+    """
+    Remove cached auth info for a list of users.
+
+    All cached values are removed when no list is given.
+
+    """
+    if user_id_list is None:
+        AUTH_CACHE.clear()
+        return
+
+    user_ids = set(user_id_list)
+    AUTH_CACHE.delete_many(lambda key, info: info.user_id in user_ids)
+
+
+def get_changed_user_ids(event):
+    """
+    Get the users whose credentials or principals changed for an event.
+
+    Changes to groups or permissions affect all users, so for
+    them user ID list is None.
+
+    Returns a Tuple with a Boolean that is True when users changed,
+    and the List of changed user IDs or None.
+
+    """
+    model = event.model
+    related_name = event.related_name
+    if issubclass(model, User):
+        if related_name is None or related_name in USER_RELATIONSHIPS:
+            return (True, event.pk_list)
+    elif issubclass(model, Group):
+        if related_name is None or related_name in GROUP_RELATIONSHIPS:
+            return (True, None)
+    elif issubclass(model, Permission):
+        return (True, None)
+
+    return (False, None)
+
+
+def invalidate_auth_cache(event):
+    """
+    Invalidate cached auth info when users, groups or permissions change.
+
+    Function is a `ModelChanged` event subscriber.
+
+    """
+    (changed, user_id_list) = get_changed_user_ids(event)
+    if changed:
+        invalidate_users(user_id_list)
@@ -0,0 +1,314 @@
+import base64
+import calendar
+import datetime
+import hashlib
+import hmac
+import json
+import math
+import time
+
+from pyramid.authentication import CallbackAuthenticationPolicy
+from pyramid.exceptions import ConfigurationError
+from pyramid.httpexceptions import HTTPForbidden
+from pyramid.httpexceptions import HTTPUnauthorized
+from pyramid.interfaces import IAuthenticationPolicy
+from pyramid.security import authenticated_userid
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from zope import interface
+from zope.sqlalchemy import mark_changed
+
+from sandglass.time.auth.cache import get_changed_user_ids
+from sandglass.time.events import ModelChanged
+from sandglass.time.models.user import User
+
+# Token type used in the "Authorization" header
+TOKEN_TYPE = 'Bearer'
+
+# Seconds that an access token is valid when there is no value in settings
+DEFAULT_TOKEN_MAX_AGE = 300
+
+# Request environ key used to save parsed access token data
+TOKEN_DATA_KEY = 'sandglass.time.access_token'
+
+REALM = "Sandglass API"
+
+
+def b64encode(value):
+    return base64.urlsafe_b64encode(value).rstrip('=')
+
+
+def b64decode(value):
+    value = str(value)
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def to_timestamp(value):
+    return calendar.timegm(value.utctimetuple()) + value.microsecond / 1e6
+
+
+class TokenRevocations(object):
+    """
+    Revocation times for access tokens.
+
+    Access tokens issued before the revocation time of their user
+    are not valid. Revocation times are saved for each user in the
+    database, so revocations apply to all application processes,
+    also after they are restarted. Tokens of users that don't exist
+    anymore are also not valid.
+
+    """
+    def __init__(self, timer=time.time):
+        self.timer = timer
+
+    def revoke(self, user_id_list=None, session=None):
+        """
+        Revoke access tokens issued until now for a list of users.
+
+        Tokens for all users are revoked when no list is given.
+        Revocation is saved in current transaction.
+
+        """
+        if user_id_list is not None and not user_id_list:
+            return
+
+        if not session:
+            session = User.new_session()
+
+        # Databases could save times without fractions of a second
+        revoked_at = datetime.datetime.utcfromtimestamp(
+            math.ceil(self.timer())
+        )
+        table = User.__table__
+        statement = table.update().values(tokens_revoked_at=revoked_at)
+        if user_id_list is not None:
+            statement = statement.where(table.c.id.in_(set(user_id_list)))
+
+        session.execute(statement)
+        mark_changed(session)
+
+    def is_revoked(self, user_id, issued_at, session=None):
+        """
+        Check if an access token is revoked.
+
+        Returns a Boolean.
+
+        """
+        if not session:
+            session = User.new_session()
+
+        table = User.__table__
+        statement = select([table.c.tokens_revoked_at])
+        statement = statement.where(table.c.id == user_id)
+        row = session.execute(statement).first()
+        if row is None:
+            return True
+
+        revoked_at = row[0]
+        return revoked_at is not None and issued_at <= to_timestamp(revoked_at)
+
+
+# Global access token revocations
+REVOCATIONS = TokenRevocations()
+
+
+class TokenSigner(object):
+    """
+    Create and parse HMAC signed access tokens.
+
+    Tokens contain user ID, user principals, issue time and expiration
+    time, so they can be validated without loading the user. Only the
+    revocation time of the user is checked in database.
+
+    """
+    def __init__(self, secret, max_age=DEFAULT_TOKEN_MAX_AGE,
+                 revocations=REVOCATIONS, timer=time.time):
+        if not secret:
+            raise ConfigurationError("Access token secret can't be empty")
+
+        self.secret = secret
+        self.max_age = max_age
+        self.revocations = revocations
+        self.timer = timer
+
+    def get_signature(self, payload):
+        signature = hmac.new(self.secret, payload, hashlib.sha256)
+        return b64encode(signature.digest())
+
+    def create_token(self, user_id, principals):
+        """
+        Create a new access token for a user.
+
+        Returns a String.
+
+        """
+        issued_at = self.timer()
+        data = {
+            'uid': user_id,
+            'p': list(principals),
+            'iat': issued_at,
+            'exp': issued_at + self.max_age,
+        }
+        payload = b64encode(json.dumps(data, separators=(',', ':')))
+        return '{}.{}'.format(payload, self.get_signature(payload))
+
+    def parse_token(self, token):
+        """
+        Get data for a valid access token.
+
+        Returns a Dictionary or None when token is not valid,
+        is expired or was revoked.
+
+        """
+        try:
+            (payload, signature) = str(token).split('.')
+        except (ValueError, UnicodeError):
+            return
+
+        if not hmac.compare_digest(self.get_signature(payload), signature):
+            return
+
+        try:
+            data = json.loads(b64decode(payload))
+        except (TypeError, ValueError):
+            return
+
+        if data['exp'] <= self.timer():
+            return
+        elif self.revocations.is_revoked(data['uid'], data['iat']):
+            return
+
+        return data
+
+
+class SignedTokenAuthenticationPolicy(CallbackAuthenticationPolicy):
+    """
+    Authentication policy for signed access tokens.
+
+    Tokens are given in the "Authorization" HTTP header as
+    "Bearer <token>", and the user ID is used as user identifier.
+
+    """
+    interface.implements(IAuthenticationPolicy)
+
+    def __init__(self, signer, debug=False):
+        self.signer = signer
+        self.debug = debug
+        self.callback = self.get_principals
+
+    def get_token_data(self, request):
+        """
+        Get data for the access token in current request.
+
+        Token is parsed once per request.
+
+        Returns a Dictionary or None.
+
+        """
+        if TOKEN_DATA_KEY in request.environ:
+            return request.environ[TOKEN_DATA_KEY]
+
+        data = None
+        authorization = request.headers.get('Authorization', '')
+        (token_type, separator, token) = authorization.partition(' ')
+        if token_type == TOKEN_TYPE and token:
+            data = self.signer.parse_token(token.strip())
+
+        request.environ[TOKEN_DATA_KEY] = data
+        return data
+
+    def unauthenticated_userid(self, request):
+        data = self.get_token_data(request)
+        if data:
+            return data['uid']
+
+    def get_principals(self, userid, request):
+        data = self.get_token_data(request)
+        if data and data['uid'] == userid:
+            return list(data['p'])
+
+    def get_user(self, request, userid):
+        """
+        Get the user for an authenticated user ID.
+
+        Returns a User or None.
+
+        """
+        query = User.query().filter(User.id == userid)
+        query = query.options(joinedload('groups'))
+        return query.first()
+
+    def remember(self, request, principal, **kw):
+        return []
+
+    def forget(self, request):
+        challenge = '{} realm="{}"'.format(TOKEN_TYPE, REALM)
+        return [('WWW-Authenticate', challenge)]
+
+
+def get_token_signer(request):
+    """
+    Get the access token signer for current application.
+
+    Returns a TokenSigner or None when signed tokens are not enabled.
+
+    """
+    policy = request.registry.queryUtility(IAuthenticationPolicy)
+    return getattr(policy, 'signer', None)
+
+
+def handle_token_auth_challenge(request):
+    """
+    Handle HTTPForbidden errors for signed access tokens.
+
+    Returns a response to challenge client for an access token.
+
+    """
+    if authenticated_userid(request) is not None:
+        return HTTPForbidden()
+
+    response = HTTPUnauthorized()
+    policy = request.registry.queryUtility(IAuthenticationPolicy)
+    response.headers.update(policy.forget(request))
+    return response
+
+
+def revoke_access_tokens(request, model, pk_list=None, related_name=None):
+    """
+    Revoke access tokens when users, groups or permissions change.
+
+    Revocations are saved in current transaction, and only when
+    signed access tokens are enabled.
+
+    """
+    if get_token_signer(request) is None:
+        return
+
+    event = ModelChanged(
+        request,
+        model,
+        pk_list=pk_list,
+        related_name=related_name,
+    )
+    (changed, user_id_list) = get_changed_user_ids(event)
+    if changed:
+        REVOCATIONS.revoke(user_id_list)
+
+
+def setup_signed_token_auth(config):
+    """
+    Initialize signed access tokens authentication.
+
+    Token secret is getted from `auth.token_secret` setting and
+    the number of seconds a token is valid from `auth.token_max_age`.
+
+    """
+    settings = config.registry.settings
+    try:
+        max_age = int(settings.get('auth.token_max_age'))
+    except (TypeError, ValueError):
+        max_age = DEFAULT_TOKEN_MAX_AGE
+
+    signer = TokenSigner(settings.get('auth.token_secret'), max_age=max_age)
+    config.set_authentication_policy(SignedTokenAuthenticationPolicy(signer))
+    config.add_forbidden_view(handle_token_auth_challenge)
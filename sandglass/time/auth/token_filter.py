@@ -0,0 +1,325 @@
+import logging
+import threading
+import time
+
+from pyramid.settings import asbool
+from sqlalchemy.event import listens_for
+
+from sandglass.time.bloom import BloomFilter
+from sandglass.time.models import READONLY_SESSION
+from sandglass.time.models.user import User
+
+LOG = logging.getLogger(__name__)
+
+# Values used when there are no values in the settings
+DEFAULT_REBUILD_INTERVAL = 60
+DEFAULT_ERROR_RATE = 0.01
+
+# Minimum number of tokens a filter is created for
+MIN_CAPACITY = 1000
+
+
+class TokenFilter(object):
+    """
+    Bloom filter with the tokens of all users.
+
+    Filter is used to reject unknown tokens without any database
+    query. Tokens of users created or changed by current process are
+    added to the filter when they are saved, but tokens of users
+    created or changed by other processes are not in the filter, and
+    are rejected, until it is built again.
+
+    Tokens can't be removed from a Bloom filter, so filter is built
+    again from database periodically, and also when it is full or
+    when too many of its tokens are not valid anymore. Filter is
+    built again in a background thread, so requests keep using the
+    current filter while it is built.
+
+    When filter is disabled all tokens are considered valid.
+
+    """
+    def __init__(self, enabled=False,
+                 rebuild_interval=DEFAULT_REBUILD_INTERVAL,
+                 error_rate=DEFAULT_ERROR_RATE, timer=time.time):
+        self.enabled = enabled
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self.timer = timer
+        self.bloom = None
+        self.built_at = 0
+        self.stale_count = 0
+        self.checked = 0
+        self.rejected = 0
+        self.false_positives = 0
+        # Tokens added while filter is built
+        self._pending = None
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+
+    def build(self):
+        """
+        Build the filter with all user tokens in database.
+
+        """
+        with self._pending_lock:
+            self._pending = []
+
+        session = READONLY_SESSION()
+        try:
+            count = session.query(User.id).count()
+            bloom = BloomFilter(
+                max(count * 2, MIN_CAPACITY),
+                error_rate=self.error_rate,
+            )
+            query = session.query(User.token).yield_per(1000)
+            for (token, ) in query:
+                bloom.add(token)
+        except:
+            with self._pending_lock:
+                self._pending = None
+
+            raise
+        finally:
+            session.close()
+
+        self.bloom = bloom
+        self.built_at = self.timer()
+        self.stale_count = 0
+        with self._pending_lock:
+            (pending, self._pending) = (self._pending, None)
+
+        for token in pending:
+            bloom.add(token)
+
+    def rebuild(self):
+        """
+        Build the filter again logging build errors.
+
+        When build fails it is tried again after the rebuild interval.
+
+        """
+        try:
+            self.build()
+        except:
+            LOG.exception("Unable to build user tokens filter")
+            self.built_at = self.timer()
+
+    def start_build(self):
+        """
+        Build the filter again in a background thread.
+
+        Only one build runs at a time.
+
+        Returns the Thread, or None when filter is already being built.
+
+        """
+        if not self._lock.acquire(False):
+            return
+
+        def run_build():
+            try:
+                self.rebuild()
+            finally:
+                self._lock.release()
+
+        thread = threading.Thread(target=run_build)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def needs_build(self):
+        """
+        Check if filter has to be built again.
+
+        Returns a Boolean.
+
+        """
+        bloom = self.bloom
+        if self.timer() - self.built_at >= self.rebuild_interval:
+            return True
+        elif bloom is None:
+            return False
+        elif len(bloom) >= bloom.capacity:
+            return True
+
+        # Stale tokens increase false positives
+        return self.stale_count > bloom.capacity / 10
+
+    def add(self, token):
+        """
+        Add a valid token to the filter.
+
+        """
+        if not token:
+            return
+
+        with self._pending_lock:
+            if self._pending is not None:
+                self._pending.append(token)
+
+        bloom = self.bloom
+        if bloom is not None:
+            bloom.add(token)
+
+    def invalidate(self, stale_count=None):
+        """
+        Mark tokens in the filter as not valid anymore.
+
+        When `stale_count` is not given filter is built again
+        next time it is used.
+
+        """
+        if stale_count is None:
+            self.built_at = 0
+        else:
+            self.stale_count += stale_count
+
+    def might_contain(self, token):
+        """
+        Check if a token might be a valid token.
+
+        Filter is built again in background when it is needed, and
+        all tokens are considered valid until it is built.
+
+        Returns False only when token is not in the filter.
+
+        """
+        if not self.enabled:
+            return True
+
+        if self.needs_build():
+            self.start_build()
+
+        bloom = self.bloom
+        if bloom is None:
+            return True
+
+        self.checked += 1
+        if token in bloom:
+            return True
+
+        self.rejected += 1
+        return False
+
+    def add_false_positive(self):
+        """
+        Count a token that passed the filter but is not valid.
+
+        """
+        if self.enabled:
+            self.false_positives += 1
+
+    def stats(self):
+        """
+        Get filter usage statistics.
+
+        Returns a Dictionary.
+
+        """
+        stats = {
+            'enabled': self.enabled,
+            'checked': self.checked,
+            'rejected': self.rejected,
+            'false_positives': self.false_positives,
+            'false_positive_rate': None,
+            'estimated_false_positive_rate': None,
+            'size': None,
+        }
+        # Ratio of invalid tokens that passed the filter
+        invalid_count = self.rejected + self.false_positives
+        if invalid_count:
+            stats['false_positive_rate'] = (
+                float(self.false_positives) / invalid_count
+            )
+
+        bloom = self.bloom
+        if bloom is not None:
+            stats['size'] = len(bloom)
+            stats['estimated_false_positive_rate'] = (
+                bloom.get_false_positive_rate()
+            )
+
+        return stats
+
+
+# Global filter with user tokens
+TOKEN_FILTER = TokenFilter()
+
+
+def configure_token_filter(settings):
+    """
+    Configure user tokens filter.
+
+    Filter is enabled with `auth.token_filter` setting, and
+    `auth.token_filter_rebuild_interval` is the number of seconds
+    between filter builds. Tokens of users created or changed by
+    other processes are rejected for up to that number of seconds.
+
+    """
+    TOKEN_FILTER.enabled = asbool(settings.get('auth.token_filter'))
+    try:
+        interval = int(settings.get('auth.token_filter_rebuild_interval'))
+    except (TypeError, ValueError):
+        interval = DEFAULT_REBUILD_INTERVAL
+
+    TOKEN_FILTER.rebuild_interval = interval
+    TOKEN_FILTER.bloom = None
+    TOKEN_FILTER.checked = 0
+    TOKEN_FILTER.rejected = 0
+    TOKEN_FILTER.false_positives = 0
+
+
+def build_token_filter(event):
+    """
+    Build user tokens filter when application is created.
+
+    """
+    if TOKEN_FILTER.enabled:
+        TOKEN_FILTER.build()
+
+
+def update_token_filter(event):
+    """
+    Add user tokens when users change through the API.
+
+    Users that don't exist anymore are counted as stale tokens.
+
+    Function is a `ModelChanged` event subscriber.
+
+    """
+    if not TOKEN_FILTER.enabled or not issubclass(event.model, User):
+        return
+    elif event.related_name:
+        return
+    elif event.pk_list is None:
+        TOKEN_FILTER.invalidate()
+        return
+
+    session = READONLY_SESSION()
+    try:
+        query = session.query(User.token)
+        query = query.filter(User.id.in_(event.pk_list))
+        token_list = [token for (token, ) in query]
+    finally:
+        session.close()
+
+    for token in token_list:
+        TOKEN_FILTER.add(token)
+
+    # Changed tokens are also stale but they can't be counted
+    TOKEN_FILTER.invalidate(len(set(event.pk_list)) - len(token_list))
+
+
+@listens_for(User, 'after_insert')
+@listens_for(User, 'after_update')
+def add_user_token(mapper, connection, target):
+    # Add tokens of users created or updated using the ORM
+    if TOKEN_FILTER.enabled:
+        TOKEN_FILTER.add(target.token)
+
+
+@listens_for(User, 'after_delete')
+def remove_user_token(mapper, connection, target):
+    # Tokens of users deleted using the ORM are stale
+    if TOKEN_FILTER.enabled:
+        TOKEN_FILTER.invalidate(1)
@@ -0,0 +1,77 @@
+import hashlib
+import math
+import struct
+
+
+class BloomFilter(object):
+    """
+    Space efficient probabilistic set.
+
+    Checking a value returns False when value was never added, and True
+    when value was probably added. Probability of false positives
+    is `error_rate` while there are less than `capacity` values.
+
+    Values can't be removed from the filter.
+
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optimal number of bits and hash functions for capacity
+        bit_count = -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.bit_count = max(int(math.ceil(bit_count)), 8)
+        hash_count = (float(self.bit_count) / capacity) * math.log(2)
+        self.hash_count = max(int(round(hash_count)), 1)
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, value):
+        bits = self.bits
+        for index in self.get_bit_indexes(value):
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+
+        return True
+
+    def get_bit_indexes(self, value):
+        """
+        Get bit positions for a value.
+
+        Positions are computed using double hashing.
+
+        Returns a Generator of Integers.
+
+        """
+        if isinstance(value, unicode):
+            value = value.encode('utf8')
+
+        digest = hashlib.sha256(value).digest()
+        (hash_1, hash_2) = struct.unpack('<QQ', digest[:16])
+        bit_count = self.bit_count
+        for index in xrange(self.hash_count):
+            yield (hash_1 + index * hash_2) % bit_count
+
+    def add(self, value):
+        """
+        Add a value to the filter.
+
+        """
+        bits = self.bits
+        for index in self.get_bit_indexes(value):
+            bits[index >> 3] |= (1 << (index & 7))
+
+        self.count += 1
+
+    def get_false_positive_rate(self):
+        """
+        Estimate false positive probability using filled bits ratio.
+
+        Returns a Float.
+
+        """
+        filled = sum(bin(byte).count('1') for byte in self.bits)
+        return (float(filled) / self.bit_count) ** self.hash_count
@@ -0,0 +1,180 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread safe in-process cache with LRU eviction and TTL expiration.
+
+    When cache is full the least recently used value is removed.
+    Values older than `ttl` seconds are considered expired.
+    A cache with a `max_size` of 0 doesn't store any value.
+
+    Cache memory can also be limited to `max_memory` bytes, where
+    the size of each value is computed by `get_size(value)`. Values
+    bigger than `max_memory` are not saved. A `max_memory` of 0
+    doesn't limit memory.
+
+    """
+    def __init__(self, max_size=1000, ttl=30, timer=time.time,
+                 max_memory=0, get_size=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self.max_memory = max_memory
+        self.get_size = get_size
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._get_value(key) is not None
+
+    def _get_value(self, key):
+        item = self._values.get(key)
+        if item is None:
+            return
+
+        (expires, value) = item
+        if expires <= self.timer():
+            self._remove(key)
+            return
+
+        return item
+
+    def _remove(self, key):
+        del self._values[key]
+        self.memory -= self._sizes.pop(key, 0)
+
+    def get(self, key, default=None):
+        """
+        Get a cached value.
+
+        Returns the value or `default` when there is no value
+        or cached value is expired.
+
+        """
+        with self._lock:
+            item = self._get_value(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            # Mark value as the most recently used one
+            del self._values[key]
+            self._values[key] = item
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        """
+        Save a value in the cache.
+
+        """
+        if self.max_size <= 0:
+            return
+
+        size = 0
+        if self.max_memory and self.get_size:
+            size = self.get_size(value)
+
+        with self._lock:
+            if key in self._values:
+                self._remove(key)
+
+            if self.max_memory and size > self.max_memory:
+                return
+
+            while self._values and (
+                    len(self._values) >= self.max_size or
+                    (self.max_memory and
+                     self.memory + size > self.max_memory)):
+                # Remove the least recently used value
+                self._remove(next(iter(self._values)))
+
+            self._values[key] = (self.timer() + self.ttl, value)
+            if size:
+                self._sizes[key] = size
+                self.memory += size
+
+    def delete(self, key):
+        """
+        Remove a value from the cache.
+
+        Returns a Boolean.
+
+        """
+        with self._lock:
+            if key not in self._values:
+                return False
+
+            self._remove(key)
+            return True
+
+    def delete_many(self, condition):
+        """
+        Remove all values where `condition(key, value)` is true.
+
+        Returns the number of removed values.
+
+        """
+        with self._lock:
+            key_list = [
+                key for (key, (expires, value)) in self._values.items()
+                if condition(key, value)
+            ]
+            for key in key_list:
+                self._remove(key)
+
+            return len(key_list)
+
+    def clear(self):
+        """
+        Remove all cached values.
+
+        """
+        with self._lock:
+            self._values.clear()
+            self._sizes.clear()
+            self.memory = 0
+
+    def reset_stats(self):
+        """
+        Reset hit and miss counters.
+
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Get cache usage statistics.
+
+        Returns a Dictionary.
+
+        """
+        with self._lock:
+            hit_ratio = None
+            if self.hits or self.misses:
+                hit_ratio = float(self.hits) / (self.hits + self.misses)
+
+            return {
+                'size': len(self._values),
+                'max_size': self.max_size,
+                'memory': self.memory,
+                'max_memory': self.max_memory,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': hit_ratio,
+            }
@@ -10,8 +10,11 @@ from cement.core import handler
 from sandglass.time import _
 from sandglass.time import install
 from sandglass.time.command import database_command
+from sandglass.time.models.activity import Activity
 from sandglass.time.models.user import User
 from sandglass.time.models.group import Group
+from sandglass.time.reports.rollup import REBUILD_CHUNK_SIZE
+from sandglass.time.reports.rollup import rebuild_rollup
 from sandglass.time.security import Administrators
 from sandglass.time.utils import is_valid_email
 
@@ -35,6 +38,11 @@ class ManageController(controller.CementBaseController):
             (['-g', '--group'], dict(
                 help="add user to a group",
             )),
+            (['--chunk-size'], dict(
+                type=int,
+                default=REBUILD_CHUNK_SIZE,
+                help="number of users processed in each chunk",
+            )),
         ]
 
     @controller.expose(help="insert initial application data")
@@ -111,5 +119,23 @@ class ManageController(controller.CementBaseController):
         transaction.commit()
         print('\n', _("User created successfully"))
 
+    @controller.expose(help="compute again daily activity totals")
+    @database_command
+    def rebuild_rollup(self):
+        """
+        Compute again daily activity totals for reports.
+
+        Totals are computed in chunks of users, and each
+        chunk is committed separately.
+
+        """
+        session = Activity.new_session()
+        count = rebuild_rollup(
+            session,
+            chunk_size=self.app.pargs.chunk_size,
+            commit=transaction.commit,
+        )
+        print(_("Daily totals computed for {} users").format(count))
+
 
 handler.register(ManageController)
@@ -1,33 +1,23 @@
-import datetime
-
-import pytz
-
 from pyramid.authorization import ACLAuthorizationPolicy
-from pyramid.renderers import JSONP
+from pyramid.exceptions import ConfigurationError
 from sqlalchemy import engine_from_config
 
 from sandglass.time.api import include_api_versions
 from sandglass.time.auth.basic import setup_basic_http_auth
+from sandglass.time.auth.token import setup_signed_token_auth
+from sandglass.time.events import ModelChanged
 from sandglass.time.models import initialize_database
+from sandglass.time.models.permission import configure_permission_matrix
+from sandglass.time.models.permission import invalidate_permission_matrix
+from sandglass.time.models.permission import PERMISSIONS
+from sandglass.time.models.project import invalidate_visible_projects
+from sandglass.time.models.project import VISIBLE_PROJECTS
+from sandglass.time.renderers import create_json_renderer
+from sandglass.time.reports.cache import configure_report_cache
+from sandglass.time.reports.cache import invalidate_report_cache
 from sandglass.time.request import extend_request_object
 
 
-def json_datetime_adapter(obj, request):
-    """
-    Adapter to properly serialize datetimes to ISO8601.
-
-    Return a String.
-
-    """
-    if obj.tzinfo is None:
-        # We only use UTC datetimes
-        tzinfo = pytz.timezone("UTC")
-        obj = obj.replace(tzinfo=tzinfo)
-
-    # Get a tring representation of the date in ISO 8601 format with TZ
-    return obj.isoformat()
-
-
 def include_resources(config):
     """
     Initialize `sandglass.time` application resources.
@@ -47,15 +37,22 @@ def configure_application(config):
     config.add_translation_dirs('sandglass.time:locales/')
     config.include('sandglass.time.resource')
 
-    json_renderer = JSONP(param_name='callback')
-    json_renderer.add_adapter(datetime.datetime, json_datetime_adapter)
-    config.add_renderer('json', json_renderer)
+    config.add_renderer('json', create_json_renderer())
 
     # Add custom request methods
     extend_request_object(config)
 
     # Scan modules that need to be pre-loaded
     config.scan('sandglass.time.models')
+
+    # Rebuild permission matrix when groups or permissions change
+    configure_permission_matrix(config.registry.settings)
+    config.add_subscriber(invalidate_permission_matrix, ModelChanged)
+    # Clear cached visible projects when projects or groups change
+    config.add_subscriber(invalidate_visible_projects, ModelChanged)
+    # Remove cached reports when activity tags change
+    configure_report_cache(config.registry.settings)
+    config.add_subscriber(invalidate_report_cache, ModelChanged)
     config.scan('sandglass.time.errorhandlers')
 
     # Attach sandglass.time resources to '/time' URL path prefix
@@ -69,8 +66,17 @@ def include_authentication(config):
     """
     acl_auth = ACLAuthorizationPolicy()
     config.set_authorization_policy(acl_auth)
-    # TODO: Get authentication method from settings
-    setup_basic_http_auth(config)
+
+    # Get authentication method from settings
+    settings = config.registry.settings
+    auth_policy = settings.get('auth.policy', 'basic')
+    if auth_policy == 'basic':
+        setup_basic_http_auth(config)
+    elif auth_policy == 'signed':
+        setup_signed_token_auth(config)
+    else:
+        msg = "Invalid authentication policy {}".format(auth_policy)
+        raise ConfigurationError(msg)
 
 
 def include_dependencies(config):
@@ -92,6 +98,9 @@ def configure_database(config):
     settings = config.registry.settings
     engine = engine_from_config(settings, prefix='database.')
     initialize_database(engine)
+    # Permissions and projects could be changed during initialization
+    PERMISSIONS.invalidate()
+    VISIBLE_PROJECTS.clear()
 
 
 def includeme(config):
@@ -1,4 +1,10 @@
+from pyramid.events import ApplicationCreated
+
+
 def includeme(config):
+    from .cache import cache_api_descriptions
     from .directives import add_resource_describe
 
     config.add_directive('add_resource_describe', add_resource_describe)
+    # Descriptions are computed once all resources are configured
+    config.add_subscriber(cache_api_descriptions, ApplicationCreated)
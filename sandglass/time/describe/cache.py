@@ -0,0 +1,165 @@
+import json
+import logging
+
+from sandglass.time.renderers import get_json_default
+from sandglass.time.renderers import JSONP_PARAM_NAME
+from sandglass.time.resource.conditional import conditional_response
+from sandglass.time.resource.conditional import get_etag
+from sandglass.time.response import Response
+
+LOG = logging.getLogger(__name__)
+
+
+class CachedDescription(object):
+    """
+    A precomputed description with its JSON body and ETag.
+
+    Body is serialized the same way the JSON renderer does,
+    using the same adapters for types that JSON does not support.
+
+    """
+    def __init__(self, data):
+        self.data = data
+        self.body = json.dumps(data, default=get_json_default(None))
+        self.etag = get_etag(self.body)
+
+    def get_response(self, request):
+        """
+        Get a response for the description.
+
+        A "304 Not Modified" response is returned when client
+        cached version of the description is still valid.
+
+        JSONP is also supported when a `callback` argument is given
+        in the request, the same way the JSON renderer does.
+
+        Returns a Response.
+
+        """
+        callback = request.GET.get(JSONP_PARAM_NAME)
+        if callback is not None:
+            body = '%s(%s);' % (callback.encode('utf8'), self.body)
+            return Response(body=body, content_type='application/javascript')
+
+        response = conditional_response(request, self.etag)
+        if response:
+            return response
+
+        return Response(body=self.body)
+
+
+class DescriptionCache(object):
+    """
+    Cache for API and API resource descriptions.
+
+    API descriptions don't change after application is configured,
+    so they are computed once and stored by API version.
+
+    """
+    def __init__(self):
+        # API describe resource class by API version
+        self.api_resources = {}
+        # Cached descriptions by API version
+        self.versions = {}
+
+    def register_api(self, version, describe_resource):
+        """
+        Register the resource used to describe an API version.
+
+        """
+        self.api_resources[version] = describe_resource
+
+    def clear(self):
+        """
+        Remove all cached descriptions.
+
+        """
+        self.versions.clear()
+
+    def describe_api(self, version):
+        """
+        Describe an API version.
+
+        Returns a CachedDescription.
+
+        """
+        describe_resource = self.api_resources[version]
+        data = describe_resource(None).describe()
+        return CachedDescription(data)
+
+    def describe_resource(self, resource_cls):
+        """
+        Describe an API resource class.
+
+        Returns a CachedDescription.
+
+        """
+        resource = resource_cls(None)
+        describer = resource.describer_cls(resource)
+        return CachedDescription(describer.describe())
+
+    def get_version_cache(self, version):
+        if version not in self.versions:
+            self.versions[version] = {'api': None, 'resources': {}}
+
+        return self.versions[version]
+
+    def get_api_description(self, version):
+        """
+        Get the description of an API version.
+
+        Description is computed when it is not cached.
+
+        Returns a CachedDescription.
+
+        """
+        version_cache = self.get_version_cache(version)
+        if not version_cache['api']:
+            version_cache['api'] = self.describe_api(version)
+
+        return version_cache['api']
+
+    def get_resource_description(self, version, resource_cls):
+        """
+        Get the description of an API resource class.
+
+        Description is computed when it is not cached.
+
+        Returns a CachedDescription.
+
+        """
+        resources = self.get_version_cache(version)['resources']
+        description = resources.get(resource_cls.name)
+        if not description:
+            description = self.describe_resource(resource_cls)
+            resources[resource_cls.name] = description
+
+        return description
+
+    def update(self, api):
+        """
+        Compute descriptions for all versions of an `ApiManager`.
+
+        """
+        self.clear()
+        for version in api.get_versions():
+            if version in self.api_resources:
+                self.get_api_description(version)
+
+            for resource_cls in api.get_resources(version):
+                self.get_resource_description(version, resource_cls)
+
+
+# Global API descriptions cache
+DESCRIPTIONS = DescriptionCache()
+
+
+def cache_api_descriptions(event):
+    """
+    Compute API descriptions when application is created.
+
+    """
+    from sandglass.time.api import API
+
+    LOG.debug("Computing API descriptions")
+    DESCRIPTIONS.update(API)
@@ -1,3 +1,4 @@
+from sandglass.time.describe.cache import DESCRIPTIONS
 from sandglass.time.security import PERMISSION
 
 
@@ -8,6 +9,7 @@ def add_resource_describe(config, version, resource):
     Describe can be called as `/@describe` in the API root URL.
 
     """
+    DESCRIPTIONS.register_api(version, resource)
     route_name = 'api.{}.describe'.format(version)
     config.add_route(
         route_name,
@@ -0,0 +1,40 @@
+import transaction
+
+
+class ModelChanged(object):
+    """
+    Event notified when model objects are changed through the API.
+
+    Event is notified after request transaction is committed.
+
+    Attribute `pk_list` contains the primary keys of the changed objects,
+    or None when they are unknown. When related objects were added or
+    removed, `related_name` is the name of the changed relationship.
+
+    """
+    def __init__(self, request, model, pk_list=None, related_name=None):
+        self.request = request
+        self.model = model
+        self.pk_list = pk_list
+        self.related_name = related_name
+
+
+def notify_model_changed(request, model, pk_list=None, related_name=None):
+    """
+    Notify a `ModelChanged` event after current transaction is committed.
+
+    No event is notified when transaction fails.
+
+    """
+    event = ModelChanged(
+        request,
+        model,
+        pk_list=pk_list,
+        related_name=related_name,
+    )
+
+    def notify_after_commit(success):
+        if success:
+            request.registry.notify(event)
+
+    transaction.get().addAfterCommitHook(notify_after_commit)
@@ -0,0 +1,67 @@
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.sql import false
+
+from sandglass.time.filters import NULL
+from sandglass.time.filters import QueryFilter
+from sandglass.time.models.project import get_visible_project_ids
+from sandglass.time.models.project import Project
+
+# Maximum number of project IDs used in an `IN` condition.
+# For more IDs a sub query is used instead.
+MAX_PROJECT_IDS = 500
+
+
+class ByVisibleProject(QueryFilter):
+    """
+    Filter query results by projects visible for current user.
+
+    Projects are visible when current user owns them, when they
+    are public, or when they are shared with a group of the user.
+    No filtering is done for users with permission to view
+    private projects.
+
+    By default `project_id` field is used for filtering results.
+
+    By default results without project are not filtered.
+
+    """
+    project_field_name = 'project_id'
+
+    def __init__(self, project_field_name=None, filter_nulls=False,
+                 *args, **kwargs):
+        super(ByVisibleProject, self).__init__(*args, **kwargs)
+        if project_field_name:
+            self.project_field_name = project_field_name
+
+        self.filter_nulls = filter_nulls
+
+    def get_condition(self, field, user):
+        """
+        Get a condition to match visible projects for a field.
+
+        Returns an SQL expression.
+
+        """
+        project_ids = get_visible_project_ids(user)
+        if not project_ids:
+            return false()
+        elif len(project_ids) > MAX_PROJECT_IDS:
+            visible = select([Project.id])
+            visible = visible.where(Project.get_visible_condition(user.id))
+            return field.in_(visible)
+
+        return field.in_(sorted(project_ids))
+
+    def filter_query(self, query, request, resource):
+        user = request.authenticated_user
+        # When user has view private permission skip filtering
+        if user.has_permission('time.project.view_private'):
+            return query
+
+        field = getattr(resource.model, self.project_field_name)
+        filters = self.get_condition(field, user)
+        if not self.filter_nulls:
+            filters = or_(filters, field == NULL)
+
+        return query.filter(filters)
@@ -98,6 +98,7 @@ class PermissionManager(object):
             self.get_permission_list('client', 'ra') +
             self.get_permission_list('user', 'ra') +
             self.get_permission_list('activity', 'cruda') +
+            self.get_permission_list('period', 'ra') +
             # Add non CRUDA permission(s)
             [self.get_permission('api', 'describe')]
         )
@@ -110,6 +111,7 @@ class PermissionManager(object):
             self.get_permission_list('permission', 'ua') +
             self.get_permission_list('client', 'cud') +
             self.get_permission_list('user', 'cud') +
+            self.get_permission_list('period', 'cud') +
             # Add non CRUDA permission(s)
             [self.get_permission('project', 'set_is_public')]
         )
@@ -23,7 +23,6 @@ from sqlalchemy import MetaData
 from sqlalchemy import Sequence
 from sqlalchemy.ext.declarative import as_declarative
 from sqlalchemy.ext.declarative import declared_attr
-from sqlalchemy.orm import object_mapper
 from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.schema import Index
@@ -35,6 +34,7 @@ from sqlalchemy.types import TypeDecorator
 from sqlalchemy.types import VARCHAR
 from zope.sqlalchemy import ZopeTransactionExtension
 
+from sandglass.time.models.serializer import ModelSerializer
 from sandglass.time.security import Administrators
 from sandglass.time.security import PERMISSION
 from sandglass.time.utils import get_app_namespace
@@ -52,9 +52,18 @@ else:
     # When unittests are run use a non scoped session
     DBSESSION = sessionmaker(extension=ZopeTransactionExtension())
 
+# Session factory for read only sessions that are not handled by
+# the transaction manager. These sessions are used to read data
+# after the request transaction is finished, like when a response
+# is streamed, so they MUST be closed after they are used.
+READONLY_SESSION = sessionmaker(autoflush=False)
+
 # Dictionary used to map model class names to class definitions
 MODEL_REGISTRY = weakref.WeakValueDictionary()
 
+# Dictionary used to cache serializers for model classes
+MODEL_SERIALIZERS = {}
+
 # Default ACL rules for all models.
 # Rules allow full access to admin group and deny access
 # to anyone that didn't match a previous acces rule.
@@ -89,6 +98,7 @@ def initialize_database(engine):
     """
     META.bind = engine
     DBSESSION.configure(bind=engine)
+    READONLY_SESSION.configure(bind=engine)
     META.create_all(engine)
 
 
@@ -240,6 +250,23 @@ class BaseModel(object):
         permission_list.extend(cls.get_extra_permission_list())
         return permission_list
 
+    @classmethod
+    def get_serializer(cls):
+        """
+        Get the serializer for current model class.
+
+        Serializer is created the first time it is needed.
+
+        Return a ModelSerializer.
+
+        """
+        serializer = MODEL_SERIALIZERS.get(cls)
+        if serializer is None:
+            serializer = ModelSerializer(cls)
+            MODEL_SERIALIZERS[cls] = serializer
+
+        return serializer
+
     @classmethod
     def has_field(cls, field_name):
         """
@@ -344,13 +371,10 @@ class BaseModel(object):
         return query
 
     def __iter__(self):
-        self._mapper = object_mapper(self)
-        self._col_iter = iter(self._mapper.columns)
-
-        return self
+        return self.get_serializer().iter_items(self)
 
     def __json__(self, request):
-        return dict(self)
+        return self.get_serializer().serialize(self)
 
     @declared_attr
     def __acl__(cls):
@@ -395,21 +419,6 @@ class BaseModel(object):
         """
         return DBSESSION.object_session(self)
 
-    def next(self):
-        # Skip non public properties
-        column = self._col_iter.next()
-        mapper_property = self._mapper.get_property_by_column(column)
-        field_name = mapper_property.key
-
-        while field_name.startswith('_'):
-            column = self._col_iter.next()
-            mapper_property = self._mapper.get_property_by_column(column)
-            field_name = mapper_property.key
-
-        field_value = getattr(self, field_name)
-
-        return (field_name, field_value)
-
 
 class TimestampMixin(object):
     """
@@ -1,8 +1,11 @@
 from datetime import datetime
 from sqlalchemy import Column
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import relationship
 from sqlalchemy.schema import ForeignKey
+from sqlalchemy.schema import Index
 from sqlalchemy.schema import Table
+from sqlalchemy.types import Date
 from sqlalchemy.types import DateTime
 from sqlalchemy.types import Enum
 from sqlalchemy.types import Integer
@@ -10,7 +13,11 @@ from sqlalchemy.types import UnicodeText
 
 from sandglass.time import _
 from sandglass.time.models import BaseModel
+from sandglass.time.models import create_index
 from sandglass.time.models import META
+from sandglass.time.models import TimestampMixin
+from sandglass.time.models.bulk import bulk_relate
+from sandglass.time.models.bulk import bulk_unrelate
 
 
 # TODO: Use Enum instead of globals
@@ -43,12 +50,50 @@ ACTIVITY_TYPES = {
 tag_association_table = Table(
     'time_activity_tag',
     META,
-    Column('activity_id', Integer, ForeignKey('time_activity.id')),
-    Column('tag_id', Integer, ForeignKey('time_tag.id')),
+    Column(
+        'activity_id',
+        Integer,
+        ForeignKey('time_activity.id'),
+        primary_key=True),
+    Column(
+        'tag_id',
+        Integer,
+        ForeignKey('time_tag.id'),
+        primary_key=True),
+    # Index to get the activities for a tag
+    Index('idx_time_activity_tag_tag_id', 'tag_id', 'activity_id'),
+)
+
+# Table definition to store daily totals of activities. Rows are
+# computed from activities by `sandglass.time.reports.rollup`.
+activity_rollup_table = Table(
+    'time_activity_rollup',
+    META,
+    Column('user_id', Integer, ForeignKey('time_user.id'), nullable=False),
+    Column('project_id', Integer, ForeignKey('time_project.id')),
+    Column('task_id', Integer, ForeignKey('time_task.id')),
+    Column(
+        'activity_type',
+        Enum(*ACTIVITY_TYPES.keys(), native_enum=False),
+        nullable=False),
+    Column('day', Date, nullable=False),
+    # Total duration in seconds
+    Column('seconds', Integer, nullable=False),
+    # Number of activities
+    Column('count', Integer, nullable=False),
+    Index('idx_time_activity_rollup_user_day', 'user_id', 'day'),
+    Index('idx_time_activity_rollup_project_day', 'project_id', 'day'),
+    # Totals are unique for each group. Empty project or task values
+    # are not compared by unique indexes, so totals of a user are also
+    # computed with the user row locked.
+    Index(
+        'uq_time_activity_rollup_group',
+        'user_id', 'day', 'project_id', 'task_id', 'activity_type',
+        unique=True),
 )
 
 
-class Activity(BaseModel):
+class Activity(TimestampMixin, BaseModel):
     """
     A record of activity.
 
@@ -85,3 +130,54 @@ class Activity(BaseModel):
     task = relationship("Task", uselist=False, lazy=True)
     user = relationship("User", uselist=False, lazy=True)
     tags = relationship("Tag", secondary=tag_association_table)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            # Activities are mostly queried for a user, project
+            # or task, and ordered or filtered by start date.
+            create_index(cls, 'user_id', 'start', suffix='user_start'),
+            create_index(cls, 'project_id', 'start', suffix='project_start'),
+            create_index(cls, 'task_id'),
+        )
+
+    @classmethod
+    def add_tags(cls, activity_id_list, tag_id_list, session=None):
+        """
+        Add tags to a list of activities.
+
+        Every tag is added to every activity. Tags that are already
+        added to an activity and IDs that don't exist are skipped.
+
+        Returns the number of tags that were added.
+
+        """
+        if not session:
+            session = cls.new_session()
+
+        relationship = cls.__mapper__.relationships['tags']
+        return bulk_relate(
+            session,
+            relationship,
+            activity_id_list,
+            tag_id_list,
+        )
+
+    @classmethod
+    def remove_tags(cls, activity_id_list, tag_id_list, session=None):
+        """
+        Remove tags from a list of activities.
+
+        Returns the number of tags that were removed.
+
+        """
+        if not session:
+            session = cls.new_session()
+
+        relationship = cls.__mapper__.relationships['tags']
+        return bulk_unrelate(
+            session,
+            relationship,
+            activity_id_list,
+            tag_id_list,
+        )
@@ -0,0 +1,474 @@
+"""
+Bulk insertion and update of model objects.
+
+Objects are inserted using multiple row INSERT statements instead of
+a single INSERT for each object, and the IDs of the new rows are
+returned using RETURNING when database supports it.
+
+Objects are updated using a single UPDATE statement for all objects
+that change the same fields.
+
+Related objects are added and removed writing directly to association
+tables (or to related object foreign keys) without loading objects.
+Adding rows that already exist in an association table is ignored.
+
+"""
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import exists
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import select
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.interfaces import MANYTOMANY
+from sqlalchemy.orm.interfaces import ONETOMANY
+from zope.sqlalchemy import mark_changed
+
+from sandglass.time.models import BaseModel
+
+# Maximum number of values in a single statement for SQLite
+SQLITE_MAX_VARIABLES = 999
+
+# Maximum number of rows to insert in a single statement
+BULK_CHUNK_SIZE = 500
+
+# INSERT prefixes to skip rows with existing primary keys
+INSERT_IGNORE_PREFIXES = {
+    'sqlite': 'OR IGNORE',
+    'mysql': 'IGNORE',
+}
+
+
+class BulkOperationError(Exception):
+    """
+    Exception raised when a bulk operation is not supported.
+
+    """
+
+
+class BulkInsertError(BulkOperationError):
+    """
+    Exception raised when objects can't be inserted in bulk.
+
+    """
+
+
+def get_dialect(session, model):
+    return session.get_bind(mapper=class_mapper(model)).dialect
+
+
+def get_column_defaults(model, dialect):
+    """
+    Get default values to insert for model columns.
+
+    Multiple row inserts don't support python side column defaults,
+    so python side default values are added explicitly to each row.
+
+    Python side callable defaults are called for each row, so a
+    function that gets the values for a row is returned.
+
+    Returns a Function.
+
+    """
+    scalar_defaults = {}
+    callable_defaults = {}
+    for column in model.__table__.columns:
+        default = column.default
+        if default is None:
+            if column.server_default is not None:
+                msg = "Server defaults are not supported ({0})"
+                raise BulkInsertError(msg.format(column.name))
+
+            continue
+
+        # Sequences and SQL expressions are added by SQLAlchemy
+        # to each row when columns are not given in row values.
+        if default.is_sequence or default.is_clause_element:
+            continue
+        elif default.is_callable:
+            callable_defaults[column.key] = default.arg
+        else:
+            scalar_defaults[column.key] = default.arg
+
+    def get_row_defaults():
+        row = dict(scalar_defaults)
+        for column_name, default in callable_defaults.items():
+            # Callable defaults receive an execution context
+            row[column_name] = default(None)
+
+        return row
+
+    return get_row_defaults
+
+
+def get_field_columns(model):
+    """
+    Get a dictionary of model field names and column names.
+
+    Returns a Dictionary.
+
+    """
+    mapper = class_mapper(model)
+    return dict(
+        (prop.key, prop.columns[0].key)
+        for prop in mapper.column_attrs
+    )
+
+
+def check_bulk_insert(model, dialect, data_list):
+    """
+    Check that objects data can be inserted in bulk.
+
+    Raises BulkInsertError when objects must be created using ORM.
+
+    """
+    # Models with their own constructor can change object values.
+    # Mapped classes constructor is instrumented, so original is used.
+    constructor = class_mapper(model).class_manager.original_init
+    if constructor.im_func is not BaseModel.__dict__['__init__']:
+        raise BulkInsertError("Model has a custom constructor")
+
+    if not dialect.supports_multivalues_insert:
+        raise BulkInsertError("Dialect doesn't support multiple row INSERT")
+
+    if not (dialect.implicit_returning or dialect.name == 'sqlite'):
+        raise BulkInsertError("Dialect can't return inserted row IDs")
+
+    field_columns = get_field_columns(model)
+    for data in data_list:
+        for field_name in data:
+            if field_name == 'id' or field_name not in field_columns:
+                msg = "Field {0} can't be inserted in bulk"
+                raise BulkInsertError(msg.format(field_name))
+
+
+def get_chunk_size(dialect, column_count):
+    """
+    Get the number of rows to insert in each statement.
+
+    Returns an Integer.
+
+    """
+    if dialect.name == 'sqlite':
+        return max(1, min(BULK_CHUNK_SIZE,
+                          SQLITE_MAX_VARIABLES // column_count))
+
+    return BULK_CHUNK_SIZE
+
+
+def bulk_insert(session, model, data_list):
+    """
+    Insert rows for a list of model objects data.
+
+    Each item in data list is a dictionary of model field values.
+
+    Raises BulkInsertError when objects can't be inserted in bulk.
+
+    Returns a List with the IDs of inserted rows in data list order.
+
+    """
+    dialect = get_dialect(session, model)
+    check_bulk_insert(model, dialect, data_list)
+
+    table = model.__table__
+    field_columns = get_field_columns(model)
+    get_row_defaults = get_column_defaults(model, dialect)
+    rows = []
+    for data in data_list:
+        row = get_row_defaults()
+        for field_name, value in data.items():
+            row[field_columns[field_name]] = value
+
+        rows.append(row)
+
+    # All rows must have the same columns
+    column_names = set()
+    for row in rows:
+        column_names.update(row)
+
+    for row in rows:
+        for column_name in column_names:
+            row.setdefault(column_name, None)
+
+    id_list = []
+    chunk_size = get_chunk_size(dialect, len(column_names))
+    for index in range(0, len(rows), chunk_size):
+        chunk = rows[index:index + chunk_size]
+        statement = table.insert().values(chunk)
+        if dialect.implicit_returning:
+            statement = statement.returning(table.c.id)
+            result = session.execute(statement)
+            id_list.extend(row_id for (row_id, ) in result)
+        else:
+            # SQLite writes are serialized, so rows from a single
+            # INSERT get consecutive IDs ending in the last row ID.
+            result = session.execute(statement)
+            last_id = result.lastrowid
+            id_list.extend(range(last_id - len(chunk) + 1, last_id + 1))
+
+    # Statements executed without ORM must be registered
+    # so transaction manager commits them
+    if id_list:
+        mark_changed(session)
+
+    return id_list
+
+
+def get_update_chunk_size(dialect, column_count):
+    """
+    Get the number of rows to update in each statement.
+
+    Each row uses a value for its ID and two values for each column.
+
+    Returns an Integer.
+
+    """
+    return get_chunk_size(dialect, 1 + column_count * 2)
+
+
+def bulk_update(session, model, data_list):
+    """
+    Update rows for a list of model objects data.
+
+    Each item in data list is a dictionary of model field values
+    that MUST contain an `id` value.
+
+    Items that update the same fields are updated together using
+    a single UPDATE statement, where each field value is selected
+    by ID using a CASE expression.
+
+    Returns the number of updated rows.
+
+    """
+    # Group values by updated fields and then by ID
+    groups = {}
+    for data in data_list:
+        data = dict(data)
+        pk_value = data.pop('id')
+        field_names = tuple(sorted(data))
+        if not field_names:
+            continue
+
+        # When an ID is given more than once last values are used
+        groups.setdefault(field_names, {})[pk_value] = data
+
+    dialect = get_dialect(session, model)
+    query = session.query(model)
+    count = 0
+    for field_names, values_by_id in groups.items():
+        id_list = sorted(values_by_id)
+        chunk_size = get_update_chunk_size(dialect, len(field_names))
+        for index in range(0, len(id_list), chunk_size):
+            chunk_id_list = id_list[index:index + chunk_size]
+            values = {}
+            for field_name in field_names:
+                attr = getattr(model, field_name)
+                whens = [
+                    (pk_value, literal(values_by_id[pk_value][field_name],
+                                       type_=attr.type))
+                    for pk_value in chunk_id_list
+                ]
+                values[attr] = case(whens, value=model.id)
+
+            update_query = query.filter(model.id.in_(chunk_id_list))
+            count += update_query.update(values, synchronize_session=False)
+
+    return count
+
+
+def get_relationship_columns(relationship):
+    """
+    Get the columns that relate objects for a relationship.
+
+    Only relationships that use the parent ID as foreign key value
+    are supported. For many to many relationships the association
+    table columns for parent and related IDs are returned. For one to
+    many relationships the related ID and foreign key are returned.
+
+    Raises BulkOperationError when relationship is not supported.
+
+    Returns a Tuple with two Columns.
+
+    """
+    if len(relationship.synchronize_pairs) != 1:
+        raise BulkOperationError("Relationship uses more than one column")
+
+    (parent_column, foreign_column) = relationship.synchronize_pairs[0]
+    if not parent_column.primary_key:
+        raise BulkOperationError("Relationship doesn't use parent ID")
+
+    if relationship.direction is MANYTOMANY:
+        (related_column, secondary_column) = (
+            relationship.secondary_synchronize_pairs[0])
+        return (foreign_column, secondary_column)
+    elif relationship.direction is ONETOMANY:
+        related_column = relationship.mapper.local_table.c.id
+        return (related_column, foreign_column)
+
+    raise BulkOperationError("Relationship is not a collection")
+
+
+def iter_id_chunks(session, model, id_list, column_count=1):
+    """
+    Iterate a list of IDs in chunks sized for a single statement.
+
+    Returns an Iterator of Lists.
+
+    """
+    dialect = get_dialect(session, model)
+    chunk_size = get_chunk_size(dialect, column_count)
+    id_list = sorted(set(id_list))
+    for index in range(0, len(id_list), chunk_size):
+        yield id_list[index:index + chunk_size]
+
+
+def get_many_to_many_columns(relationship):
+    """
+    Get association table columns for a many to many relationship.
+
+    Raises BulkOperationError when relationship is not supported.
+
+    Returns a Tuple with two Columns.
+
+    """
+    if relationship.direction is not MANYTOMANY:
+        raise BulkOperationError("Relationship is not many to many")
+
+    return get_relationship_columns(relationship)
+
+
+def bulk_relate(session, relationship, pk_list, id_list):
+    """
+    Relate a list of objects with a list of related objects.
+
+    Every object is related to every related object using a single
+    INSERT ... SELECT statement for each chunk of IDs. Objects that
+    are already related, and IDs of objects that don't exist, are
+    skipped. When database supports it, rows inserted at the same
+    time by other transactions are also skipped.
+
+    Only many to many relationships are supported.
+
+    Raises BulkOperationError when relationship is not supported.
+
+    Returns the number of added association rows.
+
+    """
+    (parent_column, related_column) = get_many_to_many_columns(relationship)
+    parent_id = relationship.parent.local_table.c.id
+    related_id = relationship.mapper.local_table.c.id
+    is_related = exists().where(and_(
+        parent_column == parent_id,
+        related_column == related_id,
+    ))
+    model = relationship.parent.class_
+    prefix = INSERT_IGNORE_PREFIXES.get(get_dialect(session, model).name)
+    count = 0
+    for chunk_pk_list in iter_id_chunks(session, model, pk_list, 2):
+        for chunk_id_list in iter_id_chunks(session, model, id_list, 2):
+            query = select([parent_id, related_id])
+            query = query.where(parent_id.in_(chunk_pk_list))
+            query = query.where(related_id.in_(chunk_id_list))
+            query = query.where(~is_related)
+            statement = relationship.secondary.insert().from_select(
+                [parent_column.name, related_column.name],
+                query,
+            )
+            if prefix:
+                statement = statement.prefix_with(prefix)
+
+            count += session.execute(statement).rowcount
+
+    mark_changed(session)
+    return count
+
+
+def bulk_unrelate(session, relationship, pk_list, id_list):
+    """
+    Remove relations between a list of objects and related objects.
+
+    Only many to many relationships are supported.
+
+    Raises BulkOperationError when relationship is not supported.
+
+    Returns the number of removed association rows.
+
+    """
+    (parent_column, related_column) = get_many_to_many_columns(relationship)
+    model = relationship.parent.class_
+    count = 0
+    for chunk_pk_list in iter_id_chunks(session, model, pk_list, 2):
+        for chunk_id_list in iter_id_chunks(session, model, id_list, 2):
+            statement = relationship.secondary.delete()
+            statement = statement.where(parent_column.in_(chunk_pk_list))
+            statement = statement.where(related_column.in_(chunk_id_list))
+            count += session.execute(statement).rowcount
+
+    mark_changed(session)
+    return count
+
+
+def bulk_add_related(session, relationship, pk_value, id_list):
+    """
+    Add related objects to the relationship of an object.
+
+    Objects that are already related are not added again.
+
+    Raises BulkOperationError when relationship is not supported.
+
+    Returns the number of existing objects for the given IDs.
+
+    """
+    if relationship.direction is MANYTOMANY:
+        bulk_relate(session, relationship, [pk_value], id_list)
+        # Count existing objects, not only the ones that were added
+        related_model = relationship.mapper.class_
+        related_id = related_model.__table__.c.id
+        count = 0
+        for chunk_id_list in iter_id_chunks(session, related_model, id_list):
+            count_query = select([func.count()]).where(
+                related_id.in_(chunk_id_list))
+            count += session.execute(count_query).scalar()
+
+        return count
+
+    (related_id, foreign_column) = get_relationship_columns(relationship)
+    related_model = relationship.mapper.class_
+    count = 0
+    for chunk_id_list in iter_id_chunks(session, related_model, id_list):
+        statement = foreign_column.table.update()
+        statement = statement.where(related_id.in_(chunk_id_list))
+        statement = statement.values({foreign_column.name: pk_value})
+        count += session.execute(statement).rowcount
+
+    mark_changed(session)
+    return count
+
+
+def bulk_remove_related(session, relationship, pk_value, id_list):
+    """
+    Remove related objects from the relationship of an object.
+
+    For one to many relationships foreign key of related objects
+    is set to NULL, the same way ORM does.
+
+    Raises BulkOperationError when relationship is not supported.
+
+    Returns the number of removed objects.
+
+    """
+    if relationship.direction is MANYTOMANY:
+        return bulk_unrelate(session, relationship, [pk_value], id_list)
+
+    (related_id, foreign_column) = get_relationship_columns(relationship)
+    related_model = relationship.mapper.class_
+    count = 0
+    for chunk_id_list in iter_id_chunks(session, related_model, id_list):
+        statement = foreign_column.table.update()
+        statement = statement.where(related_id.in_(chunk_id_list))
+        statement = statement.where(foreign_column == pk_value)
+        statement = statement.values({foreign_column.name: None})
+        count += session.execute(statement).rowcount
+
+    mark_changed(session)
+    return count
@@ -3,9 +3,10 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.types import Unicode
 
 from sandglass.time.models import BaseModel
+from sandglass.time.models import TimestampMixin
 
 
-class Client(BaseModel):
+class Client(TimestampMixin, BaseModel):
     """
     Model definition for company clients.
 
@@ -1,6 +1,7 @@
 from sqlalchemy import Column
 from sqlalchemy.orm import relationship
 from sqlalchemy.schema import ForeignKey
+from sqlalchemy.schema import Index
 from sqlalchemy.schema import Table
 from sqlalchemy.types import Integer
 from sqlalchemy.types import Unicode
@@ -8,33 +9,67 @@ from sqlalchemy.types import UnicodeText
 
 from sandglass.time.models import BaseModel
 from sandglass.time.models import META
+from sandglass.time.models import TimestampMixin
+
+# Association tables use both columns as primary key, and have
+# an index with reversed columns to search rows by the second column.
 
 # Table definition to relate groups and users
 user_association_table = Table(
     'time_group_user',
     META,
-    Column('group_id', Integer, ForeignKey('time_group.id')),
-    Column('user_id', Integer, ForeignKey('time_user.id')),
+    Column(
+        'group_id',
+        Integer,
+        ForeignKey('time_group.id'),
+        primary_key=True),
+    Column(
+        'user_id',
+        Integer,
+        ForeignKey('time_user.id'),
+        primary_key=True),
+    Index('idx_time_group_user_user_id', 'user_id', 'group_id'),
 )
 
 # Table definition to relate groups and permissions
 permission_association_table = Table(
     'time_group_permission',
     META,
-    Column('group_id', Integer, ForeignKey('time_group.id')),
-    Column('permission_id', Integer, ForeignKey('time_permission.id')),
+    Column(
+        'group_id',
+        Integer,
+        ForeignKey('time_group.id'),
+        primary_key=True),
+    Column(
+        'permission_id',
+        Integer,
+        ForeignKey('time_permission.id'),
+        primary_key=True),
+    Index(
+        'idx_time_group_permission_permission_id',
+        'permission_id',
+        'group_id'),
 )
 
 # Table definition to relate groups and projects
 project_association_table = Table(
     'time_group_project',
     META,
-    Column('group_id', Integer, ForeignKey('time_group.id')),
-    Column('project_id', Integer, ForeignKey('time_project.id')),
+    Column(
+        'group_id',
+        Integer,
+        ForeignKey('time_group.id'),
+        primary_key=True),
+    Column(
+        'project_id',
+        Integer,
+        ForeignKey('time_project.id'),
+        primary_key=True),
+    Index('idx_time_group_project_project_id', 'project_id', 'group_id'),
 )
 
 
-class Group(BaseModel):
+class Group(TimestampMixin, BaseModel):
     """
     Model definition for groups of users.
 
@@ -0,0 +1,102 @@
+from sqlalchemy import Column
+from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import relationship
+from sqlalchemy.schema import ForeignKey
+from sqlalchemy.schema import Index
+from sqlalchemy.schema import Table
+from sqlalchemy.types import Date
+from sqlalchemy.types import Enum
+from sqlalchemy.types import Integer
+
+from sandglass.time.models import BaseModel
+from sandglass.time.models import create_index
+from sandglass.time.models import META
+from sandglass.time.models import TimestampMixin
+from sandglass.time.models.activity import ACTIVITY_TYPES
+
+# Table definition to store the users of closed periods. Users
+# are saved when period is closed, so users added to a group
+# after its period is closed are not part of the period.
+period_user_table = Table(
+    'time_period_user',
+    META,
+    Column(
+        'period_id',
+        Integer,
+        ForeignKey('time_period.id'),
+        primary_key=True),
+    Column(
+        'user_id',
+        Integer,
+        ForeignKey('time_user.id'),
+        primary_key=True),
+    # Index to get the closed periods of a user
+    Index('idx_time_period_user_user_id', 'user_id', 'period_id'),
+)
+
+# Table definition to store daily totals of activities in closed
+# periods. Rows are computed by `sandglass.time.reports.snapshot`
+# when periods are closed and never change while they are closed.
+activity_snapshot_table = Table(
+    'time_activity_snapshot',
+    META,
+    Column(
+        'period_id',
+        Integer,
+        ForeignKey('time_period.id'),
+        nullable=False),
+    Column('user_id', Integer, ForeignKey('time_user.id'), nullable=False),
+    Column('project_id', Integer, ForeignKey('time_project.id')),
+    Column('task_id', Integer, ForeignKey('time_task.id')),
+    Column(
+        'activity_type',
+        Enum(*ACTIVITY_TYPES.keys(), native_enum=False),
+        nullable=False),
+    Column('day', Date, nullable=False),
+    # Total duration in seconds
+    Column('seconds', Integer, nullable=False),
+    # Number of activities
+    Column('count', Integer, nullable=False),
+    Index('idx_time_activity_snapshot_period_id', 'period_id'),
+    Index('idx_time_activity_snapshot_user_day', 'user_id', 'day'),
+    Index('idx_time_activity_snapshot_project_day', 'project_id', 'day'),
+)
+
+
+class Period(TimestampMixin, BaseModel):
+    """
+    Closed timesheet period.
+
+    Activities that start between `start` and `end` dates (`end`
+    is not included) can't be changed for the users of a period.
+    Period users are the user of the period, the users of its
+    group, or all users when period has no user and no group.
+
+    """
+    start = Column(
+        Date,
+        nullable=False)
+    end = Column(
+        Date,
+        nullable=False)
+    user_id = Column(
+        Integer,
+        ForeignKey('time_user.id'),
+        doc="User whose activities are closed")
+    group_id = Column(
+        Integer,
+        ForeignKey('time_group.id'),
+        doc="Group whose users activities are closed")
+
+    user = relationship(
+        "User",
+        uselist=False)
+    group = relationship(
+        "Group",
+        uselist=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            create_index(cls, 'start', 'end', suffix='start_end'),
+        )
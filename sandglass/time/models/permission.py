@@ -1,10 +1,15 @@
+import threading
+import time
+
 from sqlalchemy import Column
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import Text
 from sqlalchemy.types import UnicodeText
 
 from sandglass.time.models import BaseModel
+from sandglass.time.models import READONLY_SESSION
 from sandglass.time.models.group import permission_association_table
+from sandglass.time.security import Administrators
 
 
 class Permission(BaseModel):
@@ -19,3 +24,210 @@ class Permission(BaseModel):
         "Group",
         secondary=permission_association_table,
         back_populates="permissions")
+
+
+# Bit used in group bitsets for administrator groups
+ADMIN_BIT = 1
+
+# Seconds a matrix is used when there is no value in the settings
+DEFAULT_MATRIX_TTL = 30
+
+
+class PermissionMatrix(object):
+    """
+    Compiled matrix with the permissions of each group.
+
+    Each permission name is mapped to a bit position, and permissions
+    of each group are saved as an integer bitset. This way permissions
+    of a user are the OR of its group bitsets, and checking a permission
+    is a bit test. First bit is used to mark administrator groups.
+
+    Matrix is built when it is first needed, and it is built again
+    after it is invalidated or after `ttl` seconds, so changes made
+    by other application processes are also used (TTL 0 disables
+    expiration). A matrix is not saved when it is invalidated while
+    it is being built, because it could contain the old permissions.
+
+    Matrix is built using a read only session, so it never contains
+    groups or permissions that are not committed by current request.
+
+    """
+    def __init__(self, ttl=DEFAULT_MATRIX_TTL, timer=time.time):
+        self.ttl = ttl
+        self.timer = timer
+        # Number of times matrix was invalidated
+        self.generation = 0
+        # Tuple with permission bits by name and bitsets by group ID
+        self._matrix = None
+        self._expires = None
+        self._lock = threading.Lock()
+        self._generation_lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Remove compiled matrix so it is built again when needed.
+
+        """
+        with self._generation_lock:
+            self.generation += 1
+            self._matrix = None
+
+    def is_valid(self):
+        """
+        Check if there is a compiled matrix that is not expired.
+
+        Returns a Boolean.
+
+        """
+        if self._matrix is None:
+            return False
+        elif self._expires is None:
+            return True
+
+        return self.timer() < self._expires
+
+    def build(self, session=None):
+        """
+        Build the permission matrix from database.
+
+        When no session is given a read only session is used, so
+        only committed groups and permissions are used.
+
+        Returns a Tuple with permission bits by name
+        and group bitsets by group ID.
+
+        """
+        if not session:
+            session = READONLY_SESSION()
+            try:
+                return self.build(session)
+            finally:
+                session.close()
+
+        from sandglass.time.models.group import Group
+
+        bits = {}
+        bits_by_id = {}
+        query = session.query(Permission.id, Permission.name)
+        for (permission_id, name) in query.order_by(Permission.id):
+            if name not in bits:
+                # First bit is reserved for administrator groups
+                bits[name] = 1 << (len(bits) + 1)
+
+            bits_by_id[permission_id] = bits[name]
+
+        group_bitsets = {}
+        for (group_id, name) in session.query(Group.id, Group.name):
+            is_admin = (name == Administrators)
+            group_bitsets[group_id] = (ADMIN_BIT if is_admin else 0)
+
+        table = permission_association_table
+        query = session.query(table.c.group_id, table.c.permission_id)
+        for (group_id, permission_id) in query:
+            if group_id in group_bitsets and permission_id in bits_by_id:
+                group_bitsets[group_id] |= bits_by_id[permission_id]
+
+        return (bits, group_bitsets)
+
+    @property
+    def matrix(self):
+        matrix = self._matrix
+        if matrix is not None and self.is_valid():
+            return matrix
+
+        with self._lock:
+            matrix = self._matrix
+            if matrix is not None and self.is_valid():
+                return matrix
+
+            generation = self.generation
+            matrix = self.build()
+            with self._generation_lock:
+                if generation == self.generation:
+                    self._matrix = matrix
+                    self._expires = None
+                    if self.ttl:
+                        self._expires = self.timer() + self.ttl
+
+        return matrix
+
+    def get_bitset(self, group_ids):
+        """
+        Get a permissions bitset for a list of groups.
+
+        Returns an Integer.
+
+        """
+        group_bitsets = self.matrix[1]
+        bitset = 0
+        for group_id in group_ids:
+            bitset |= group_bitsets.get(group_id, 0)
+
+        return bitset
+
+    def has_permission(self, bitset, permission_name):
+        """
+        Check if a permissions bitset contains a permission.
+
+        Returns a Boolean.
+
+        """
+        bit = self.matrix[0].get(permission_name)
+        return bool(bit and bitset & bit)
+
+    def is_admin(self, bitset):
+        """
+        Check if a permissions bitset belongs to an administrator.
+
+        Returns a Boolean.
+
+        """
+        return bool(bitset & ADMIN_BIT)
+
+    def get_names(self, bitset):
+        """
+        Get permission names for a permissions bitset.
+
+        Returns a Set of String.
+
+        """
+        return {
+            name for (name, bit) in self.matrix[0].iteritems()
+            if bitset & bit
+        }
+
+
+# Global permission matrix
+PERMISSIONS = PermissionMatrix()
+
+
+def configure_permission_matrix(settings):
+    """
+    Configure permission matrix TTL.
+
+    Value is getted from `auth.permissions_ttl` setting.
+
+    """
+    try:
+        ttl = max(int(settings.get('auth.permissions_ttl')), 0)
+    except (TypeError, ValueError):
+        ttl = DEFAULT_MATRIX_TTL
+
+    PERMISSIONS.ttl = ttl
+    PERMISSIONS.invalidate()
+
+
+def invalidate_permission_matrix(event):
+    """
+    Invalidate permission matrix when groups or permissions change.
+
+    Function is a `ModelChanged` event subscriber.
+
+    """
+    from sandglass.time.models.group import Group
+
+    if event.related_name not in (None, 'groups', 'permissions'):
+        return
+
+    if issubclass(event.model, (Group, Permission)):
+        PERMISSIONS.invalidate()
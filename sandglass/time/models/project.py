@@ -1,19 +1,62 @@
 from sqlalchemy import Column
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import backref
 from sqlalchemy.orm import relationship
 from sqlalchemy.schema import ForeignKey
+from sqlalchemy.schema import Table
 from sqlalchemy.types import Boolean
 from sqlalchemy.types import Integer
+from sqlalchemy.types import Unicode
 from sqlalchemy.types import UnicodeText
+from zope.sqlalchemy import mark_changed
 
+from sandglass.time.cache import LRUCache
 from sandglass.time.models import ActivePeriodMixin
 from sandglass.time.models import BaseModel
 from sandglass.time.models import create_index
+from sandglass.time.models import META
+from sandglass.time.models import TimestampMixin
+from sandglass.time.models.group import Group
 from sandglass.time.models.group import project_association_table
+from sandglass.time.models.group import user_association_table
+from sandglass.time.models.user import User
 
+# Values used for the visible projects cache. Cached project IDs
+# are not used after projects or groups are changed through the API
+# by any process, but changes made without the API are only used
+# after TTL seconds.
+VISIBLE_PROJECTS_CACHE_SIZE = 1000
+VISIBLE_PROJECTS_CACHE_TTL = 60
 
-class Project(ActivePeriodMixin, BaseModel):
+# Name of the cache version of visible projects
+VISIBLE_PROJECTS_VERSION = u'visible_projects'
+
+# Relationships that change the projects visible for users
+USER_RELATIONSHIPS = ('groups', 'projects')
+GROUP_RELATIONSHIPS = ('users', 'projects')
+
+
+# Table definition to store versions of values cached by each
+# process. Versions are incremented in the transaction that changes
+# the values, so all processes know when cached values are old.
+cache_version_table = Table(
+    'time_cache_version',
+    META,
+    Column('name', Unicode(64), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+
+@listens_for(cache_version_table, 'after_create')
+def insert_cache_versions(target, connection, **kwargs):
+    connection.execute(target.insert(), name=VISIBLE_PROJECTS_VERSION,
+                       version=0)
+
+
+class Project(TimestampMixin, ActivePeriodMixin, BaseModel):
     """
     Project for a ceratain client or internal (for the company itsself).
 
@@ -86,3 +129,137 @@ class Project(ActivePeriodMixin, BaseModel):
 
         """
         return self.client is None
+
+    @classmethod
+    def get_visible_condition(cls, user_id):
+        """
+        Get a condition to match projects visible for a user.
+
+        Projects are visible when user owns them, when they are
+        public, or when they are shared with a group of the user.
+
+        Returns an SQL expression.
+
+        """
+        user_groups = select([user_association_table.c.group_id])
+        user_groups = user_groups.where(
+            user_association_table.c.user_id == user_id
+        )
+        shared = select([project_association_table.c.project_id])
+        shared = shared.where(
+            project_association_table.c.group_id.in_(user_groups)
+        )
+        return or_(
+            cls.user_id == user_id,
+            cls.is_public == True,
+            cls.id.in_(shared),
+        )
+
+    @classmethod
+    def get_visible_ids(cls, user_id, session=None):
+        """
+        Get the IDs of the projects visible for a user.
+
+        Returns a Frozenset.
+
+        """
+        query = cls.query(session=session).with_entities(cls.id)
+        query = query.filter(cls.get_visible_condition(user_id))
+        return frozenset(project_id for (project_id, ) in query)
+
+
+# Global cache of visible project IDs by user ID
+VISIBLE_PROJECTS = LRUCache(
+    max_size=VISIBLE_PROJECTS_CACHE_SIZE,
+    ttl=VISIBLE_PROJECTS_CACHE_TTL,
+)
+
+
+def get_visible_projects_version(session):
+    """
+    Get the version of the visible projects of all users.
+
+    Returns an Integer.
+
+    """
+    table = cache_version_table
+    statement = select([table.c.version])
+    statement = statement.where(table.c.name == VISIBLE_PROJECTS_VERSION)
+    return session.execute(statement).scalar() or 0
+
+
+def increment_visible_projects_version(session):
+    """
+    Increment the version of the visible projects of all users, so
+    cached project IDs are not used by any process after current
+    transaction is committed.
+
+    """
+    table = cache_version_table
+    statement = table.update().values(version=table.c.version + 1)
+    statement = statement.where(table.c.name == VISIBLE_PROJECTS_VERSION)
+    if not session.execute(statement).rowcount:
+        session.execute(table.insert().values(
+            name=VISIBLE_PROJECTS_VERSION,
+            version=1,
+        ))
+
+    mark_changed(session)
+
+
+def changes_visible_projects(model, related_name=None):
+    """
+    Check if changes to a model, or to one of its relationships,
+    change the projects visible for users.
+
+    Returns a Boolean.
+
+    """
+    if issubclass(model, Project):
+        return True
+    elif issubclass(model, Group):
+        return related_name is None or related_name in GROUP_RELATIONSHIPS
+    elif issubclass(model, User):
+        return related_name is None or related_name in USER_RELATIONSHIPS
+
+    return False
+
+
+def get_visible_project_ids(user):
+    """
+    Get the IDs of the projects visible for a user.
+
+    Project IDs are cached until projects, or the groups of
+    the user, are changed through the API. The version of the
+    cached IDs is checked in database, so changes made by other
+    processes are also used.
+
+    Returns a Frozenset.
+
+    """
+    session = Project.new_session()
+    version = get_visible_projects_version(session)
+    item = VISIBLE_PROJECTS.get(user.id)
+    if item is not None and item[0] == version:
+        return item[1]
+
+    project_ids = Project.get_visible_ids(user.id, session=session)
+    VISIBLE_PROJECTS.set(user.id, (version, project_ids))
+    return project_ids
+
+
+def invalidate_visible_projects(event):
+    """
+    Invalidate cached visible projects when projects,
+    groups or user groups change.
+
+    Function is a `ModelChanged` event subscriber.
+
+    """
+    if not changes_visible_projects(event.model, event.related_name):
+        return
+    elif issubclass(event.model, User) and event.pk_list is not None:
+        for user_id in event.pk_list:
+            VISIBLE_PROJECTS.delete(user_id)
+    else:
+        VISIBLE_PROJECTS.clear()
@@ -0,0 +1,97 @@
+from operator import attrgetter
+from operator import itemgetter
+
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.attributes import instance_state
+
+
+class ModelSerializer(object):
+    """
+    Serializer for the public column fields of a model class.
+
+    Public field names and their attribute getters are computed once
+    when the serializer is created, so serializing an object doesn't
+    need to inspect the model mapper again.
+
+    When all fields are loaded, values are read at once from object
+    `__dict__`, otherwise each field is read using its attribute.
+
+    Values are not converted. Values that JSON does not support
+    (like datetimes) are converted by the JSON renderer adapters.
+
+    """
+    def __init__(self, model):
+        self.model = model
+        self.field_names = self.get_field_names(model)
+        self.getters = tuple(
+            (name, attrgetter(name))
+            for name in self.field_names
+        )
+        # Getter for all field values of an object `__dict__`
+        if len(self.field_names) == 1:
+            getter = itemgetter(*self.field_names)
+            self.values_getter = lambda values: (getter(values), )
+        else:
+            self.values_getter = itemgetter(*self.field_names)
+
+    @staticmethod
+    def get_field_names(model):
+        """
+        Get names of the public column fields of a model.
+
+        Names are sorted in the same order as mapper columns.
+
+        Returns a Tuple of Strings.
+
+        """
+        mapper = class_mapper(model)
+        field_names = []
+        for column in mapper.columns:
+            field_name = mapper.get_property_by_column(column).key
+            # Skip non public properties
+            if field_name.startswith('_') or field_name in field_names:
+                continue
+
+            field_names.append(field_name)
+
+        return tuple(field_names)
+
+    def serialize(self, obj):
+        """
+        Get public field values of a model object.
+
+        Fields deferred during object loading are not serialized.
+
+        Returns a Dictionary.
+
+        """
+        try:
+            values = self.values_getter(obj.__dict__)
+        except KeyError:
+            # Some fields are not loaded
+            pass
+        else:
+            return dict(zip(self.field_names, values))
+
+        state = instance_state(obj)
+        callables = state.callables
+        data = {}
+        for (name, getter) in self.getters:
+            # Expired fields use the object state as loader,
+            # any other loader is used for deferred fields
+            loader = callables.get(name)
+            if loader is not None and loader is not state:
+                continue
+
+            data[name] = getter(obj)
+
+        return data
+
+    def iter_items(self, obj):
+        """
+        Iterate field names and values of a model object.
+
+        Returns an Iterator of Tuples.
+
+        """
+        return self.serialize(obj).iteritems()
@@ -15,6 +15,7 @@ from sqlalchemy.types import UnicodeText
 
 from sandglass.time.models import BaseModel
 from sandglass.time.models import create_index
+from sandglass.time.models import TimestampMixin
 
 
 class TAG(Enum):
@@ -29,7 +30,7 @@ class TAG(Enum):
 TAG_TYPES = [item.value for item in TAG]
 
 
-class Tag(BaseModel):
+class Tag(TimestampMixin, BaseModel):
     """
     Model definition for tags.
 
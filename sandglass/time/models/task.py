@@ -8,9 +8,10 @@ from sqlalchemy.types import UnicodeText
 
 from sandglass.time.models import BaseModel
 from sandglass.time.models import create_index
+from sandglass.time.models import TimestampMixin
 
 
-class Task(BaseModel):
+class Task(TimestampMixin, BaseModel):
     """
     Main activity categorization for projects.
 
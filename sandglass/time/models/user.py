@@ -6,15 +6,37 @@ from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import synonym
 from sqlalchemy.orm.util import has_identity
+from sqlalchemy.schema import Table
+from sqlalchemy.types import DateTime
+from sqlalchemy.types import Integer
 from sqlalchemy.types import Text
+from sqlalchemy.types import Unicode
 from sqlalchemy.types import UnicodeText
 
 from sandglass.time import utils
 from sandglass.time.models import BaseModel
 from sandglass.time.models import JSON
+from sandglass.time.models import META
 from sandglass.time.models import TimestampMixin
 from sandglass.time.models.group import user_association_table
-from sandglass.time.security import Administrators
+from sandglass.time.models.permission import PERMISSIONS
+
+# Time zone used when users have no time zone
+DEFAULT_TIMEZONE = u'UTC'
+
+# Table definition to store UTC offsets of time zones. Each row is
+# the offset of a time zone between UTC `start` and `end` datetimes
+# (`end` is not included). Rows are computed from the time zone
+# database by `sandglass.time.reports.timezone` when they are needed.
+timezone_offset_table = Table(
+    'time_timezone_offset',
+    META,
+    Column('timezone', Unicode(64), primary_key=True),
+    Column('start', DateTime, primary_key=True),
+    Column('end', DateTime, nullable=False),
+    # Offset from UTC in seconds
+    Column('offset', Integer, nullable=False),
+)
 
 
 class User(TimestampMixin, BaseModel):
@@ -29,8 +51,15 @@ class User(TimestampMixin, BaseModel):
     key = Column(Text(64), nullable=False)
     salt = Column(Text(40), nullable=False)
     _password = Column('password', Text(255), nullable=False)
+    # Access tokens issued until this UTC time are not valid
+    _tokens_revoked_at = Column('tokens_revoked_at', DateTime)
     # JSON field to support saving extra user data
     data = Column(JSON(255))
+    # Name of the time zone used for user dates, like "Europe/Vienna"
+    timezone = Column(
+        Unicode(64),
+        nullable=False,
+        default=DEFAULT_TIMEZONE)
 
     tags = relationship(
         "Tag",
@@ -55,7 +84,9 @@ class User(TimestampMixin, BaseModel):
     def __json__(self, request):
         data = super(User, self).__json__(request)
         # Add an email hash (can be used for example to get user Gravatar)
-        data['email_md5'] = hashlib.md5(self.email).hexdigest()
+        # when email is loaded (it is not when only some fields are loaded)
+        if 'email' in data:
+            data['email_md5'] = hashlib.md5(self.email).hexdigest()
         # Remove salt and password from serialized data
         data.pop('salt', None)
         data.pop('password', None)
@@ -82,21 +113,38 @@ class User(TimestampMixin, BaseModel):
         descriptor = property(cls.get_password, cls.set_password)
         return synonym('_password', descriptor=descriptor)
 
+    @reify
+    def permission_bits(self):
+        """
+        Get a bitset with the permissions of current user groups.
+
+        Bits are defined by the global permission matrix.
+
+        Returns an Integer.
+
+        """
+        if 'groups' in self.__dict__:
+            group_ids = [group.id for group in self.groups]
+        else:
+            # Get group IDs without loading the groups
+            field_user_id = user_association_table.c.user_id
+            query = self.current_session.query(
+                user_association_table.c.group_id
+            )
+            query = query.filter(field_user_id == self.id)
+            group_ids = [result.group_id for result in query]
+
+        return PERMISSIONS.get_bitset(group_ids)
+
     @reify
     def is_admin(self):
         """
         Check if user is an administrator.
 
-        Note: Groups will be loaded from database if they are not loaded.
-
         Returns a Boolean.
 
         """
-        for group in self.groups:
-            if group.name == Administrators:
-                return True
-
-        return False
+        return PERMISSIONS.is_admin(self.permission_bits)
 
     @classmethod
     def get_by_email(cls, email):
@@ -148,19 +196,7 @@ class User(TimestampMixin, BaseModel):
         Returns a Set of String.
 
         """
-        from sandglass.time.models import group
-        from sandglass.time.models.permission import Permission
-
-        field_user_id = group.user_association_table.c.user_id
-
-        # Create a query to get permission names for current user
-        query = self.current_session.query(Permission.name)
-        query = query.join(group.permission_association_table)
-        query = query.join(group.Group)
-        query = query.join(group.user_association_table)
-        query = query.filter(field_user_id == self.id)
-
-        return {result.name for result in query.all()}
+        return PERMISSIONS.get_names(self.permission_bits)
 
     def has_permission(self, permission_name):
         """
@@ -171,4 +207,7 @@ class User(TimestampMixin, BaseModel):
         Returns a boolean.
 
         """
-        return (permission_name in self.permissions)
+        return PERMISSIONS.has_permission(
+            self.permission_bits,
+            permission_name,
+        )
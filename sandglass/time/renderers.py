@@ -0,0 +1,133 @@
+import datetime
+import json
+
+from itertools import chain
+
+import pytz
+
+from pyramid.renderers import JSONP
+
+from sandglass.time.response import Response
+
+# Name of the request argument used for JSONP callback names
+JSONP_PARAM_NAME = 'callback'
+
+
+def json_datetime_adapter(obj, request):
+    """
+    Adapter to properly serialize datetimes to ISO8601.
+
+    Return a String.
+
+    """
+    if obj.tzinfo is None:
+        # We only use UTC datetimes
+        tzinfo = pytz.timezone("UTC")
+        obj = obj.replace(tzinfo=tzinfo)
+
+    # Get a tring representation of the date in ISO 8601 format with TZ
+    return obj.isoformat()
+
+
+def json_date_adapter(obj, request):
+    """
+    Adapter to serialize dates to ISO8601.
+
+    Return a String.
+
+    """
+    return obj.isoformat()
+
+
+# Adapters to serialize python types that are not supported by JSON.
+# Datetimes are also dates, so they must be first.
+JSON_ADAPTERS = (
+    (datetime.datetime, json_datetime_adapter),
+    (datetime.date, json_date_adapter),
+)
+
+
+def create_json_renderer():
+    """
+    Create a JSON renderer with support for JSONP and sandglass types.
+
+    Returns a JSONP renderer.
+
+    """
+    json_renderer = JSONP(param_name=JSONP_PARAM_NAME)
+    for (type_or_iface, adapter) in JSON_ADAPTERS:
+        json_renderer.add_adapter(type_or_iface, adapter)
+
+    return json_renderer
+
+
+def get_json_default(request):
+    """
+    Get a function to serialize objects that JSON does not support.
+
+    Objects are serialized the same way JSON renderer does, using
+    object's `__json__` method or the adapters in `JSON_ADAPTERS`.
+
+    Returns a Function.
+
+    """
+    def json_default(obj):
+        if hasattr(obj, '__json__'):
+            return obj.__json__(request)
+
+        for (type_or_iface, adapter) in JSON_ADAPTERS:
+            if isinstance(obj, type_or_iface):
+                return adapter(obj, request)
+
+        raise TypeError('%r is not JSON serializable' % (obj, ))
+
+    return json_default
+
+
+def iter_json_array(items, request, chunk_size=100):
+    """
+    Serialize an iterable as a JSON array in chunks of items.
+
+    This is used to write big collections to a response without
+    keeping the whole collection nor its JSON string in memory.
+
+    Returns a Generator of Strings.
+
+    """
+    default = get_json_default(request)
+    chunk = ['[']
+    count = 0
+    for item in items:
+        if count:
+            chunk.append(',')
+
+        chunk.append(json.dumps(item, default=default))
+        count += 1
+        if count % chunk_size == 0:
+            yield ''.join(chunk)
+            chunk = []
+
+    chunk.append(']')
+    yield ''.join(chunk)
+
+
+def stream_json_response(items, request, chunk_size=100):
+    """
+    Create a response that streams an iterable as a JSON array.
+
+    JSONP is also supported when a `callback` argument is given
+    in the request, the same way the JSON renderer does.
+
+    Returns a Response.
+
+    """
+    app_iter = iter_json_array(items, request, chunk_size=chunk_size)
+    callback = request.GET.get(JSONP_PARAM_NAME)
+    if callback is None:
+        content_type = 'application/json'
+    else:
+        content_type = 'application/javascript'
+        prefix = '%s(' % callback.encode('utf8')
+        app_iter = chain([prefix], app_iter, [');'])
+
+    return Response(app_iter=app_iter, content_type=content_type)
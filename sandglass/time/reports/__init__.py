@@ -0,0 +1,26 @@
+"""
+Activity reports.
+
+Reports compute the total duration of activities grouped by one
+or more fields in the database, so activity rows are not loaded.
+
+"""
+
+
+class ReportError(Exception):
+    """
+    Exception raised when report arguments are not valid.
+
+    """
+    def __init__(self, message):
+        self.message = message
+
+
+class PeriodError(Exception):
+    """
+    Exception raised when a period can't be closed or activities
+    of a closed period are changed.
+
+    """
+    def __init__(self, message):
+        self.message = message
@@ -0,0 +1,471 @@
+import datetime
+
+from sqlalchemy import func
+from sqlalchemy import not_
+from sqlalchemy import select
+from sqlalchemy import union_all
+
+from sandglass.time.filters import NULL
+from sandglass.time.models.activity import Activity
+from sandglass.time.models.activity import activity_rollup_table
+from sandglass.time.models.activity import tag_association_table
+from sandglass.time.models.period import activity_snapshot_table
+from sandglass.time.reports import analytics
+from sandglass.time.reports import ReportError
+from sandglass.time.reports.snapshot import get_closed_condition
+from sandglass.time.reports.sql import date_bucket
+from sandglass.time.reports.sql import DATE_GRANULARITIES
+from sandglass.time.reports.sql import duration_seconds
+from sandglass.time.reports.timezone import get_local_datetime
+from sandglass.time.reports.timezone import get_offset_column
+from sandglass.time.reports.timezone import has_local_timezones
+from sandglass.time.reports.timezone import join_timezone_offsets
+from sandglass.time.reports.timezone import MAX_UTC_OFFSET
+
+# Report column names for each group name
+GROUP_COLUMNS = {
+    'user': 'user_id',
+    'project': 'project_id',
+    'task': 'task_id',
+    'activity_type': 'activity_type',
+    'tag': 'tag_id',
+    'day': 'day',
+    'week': 'week',
+    'month': 'month',
+}
+
+# Names of the columns with the totals for each group
+TOTAL_COLUMNS = ('seconds', 'count')
+
+# Engines that can be used to compute reports
+REPORT_ENGINES = ('sql', 'numpy')
+
+
+class ActivityReport(object):
+    """
+    Report with the total duration of activities.
+
+    Activities are grouped by any of user, project, task, activity
+    type, tag and one date granularity (day, week or month), and
+    for each group total seconds and number of activities are
+    computed in the database.
+
+    Activities are filtered by start date, where `to_date` is not
+    included, and optionally by user and project. Activities
+    that are not finished are not included.
+
+    When grouping by tag activities without tags are grouped
+    with a NULL tag, and activities with many tags are counted
+    once for each tag.
+
+    When `use_rollup` is True, totals are computed from daily totals
+    of activities when report is not grouped by tag and its dates
+    start at midnight.
+
+    When `use_snapshots` is True, totals for days of closed periods
+    are getted from frozen totals, and only days that are not closed
+    are computed from activities or daily totals. Snapshots are used
+    for the same reports than daily totals.
+
+    When `engine` is "numpy" activities are loaded as column arrays
+    and totals are computed by `sandglass.time.reports.analytics`.
+    SQL is used when report is grouped by tag or NumPy is not
+    installed.
+
+    When `use_local_dates` is True and report users have a time zone
+    different than UTC, activities are filtered and grouped by the
+    dates of their start in the time zone of their user, and report
+    dates are local dates. Local datetimes are computed in the
+    database, so daily totals and snapshots are not used for them.
+
+    """
+    def __init__(self, group_by=(), from_date=None, to_date=None,
+                 user_id_list=None, project_id_list=None, use_rollup=False,
+                 use_snapshots=False, engine='sql', use_local_dates=False):
+        if engine not in REPORT_ENGINES:
+            raise ReportError("Invalid report engine {}".format(engine))
+
+        self.group_by = []
+        for name in group_by:
+            if name not in GROUP_COLUMNS:
+                raise ReportError("Invalid group {}".format(name))
+            elif name not in self.group_by:
+                self.group_by.append(name)
+
+        date_groups = [
+            name for name in self.group_by
+            if name in DATE_GRANULARITIES
+        ]
+        if len(date_groups) > 1:
+            raise ReportError("Only one date group can be used")
+
+        if from_date and to_date and from_date > to_date:
+            raise ReportError("Start date is after end date")
+
+        self.from_date = from_date
+        self.to_date = to_date
+        self.user_id_list = user_id_list
+        self.project_id_list = project_id_list
+        self.use_rollup = use_rollup
+        self.use_snapshots = use_snapshots
+        self.engine = engine
+        self.use_local_dates = use_local_dates
+        # True when report uses local dates of some user
+        self.local_dates = False
+
+    @property
+    def columns(self):
+        """
+        Get report column names.
+
+        Returns a List.
+
+        """
+        columns = [GROUP_COLUMNS[name] for name in self.group_by]
+        return columns + list(TOTAL_COLUMNS)
+
+    @property
+    def signature(self):
+        """
+        Get a value that is the same for reports with the same results.
+
+        Returns a Tuple.
+
+        """
+        id_lists = []
+        for id_list in (self.user_id_list, self.project_id_list):
+            if id_list is not None:
+                id_list = tuple(sorted(set(id_list)))
+
+            id_lists.append(id_list)
+
+        return (
+            'activity',
+            tuple(self.group_by),
+            self.from_date,
+            self.to_date,
+        ) + tuple(id_lists)
+
+    @property
+    def is_daily_report(self):
+        """
+        Check if report can be computed from daily totals.
+
+        Returns a Boolean.
+
+        """
+        if 'tag' in self.group_by or self.local_dates:
+            return False
+
+        for value in (self.from_date, self.to_date):
+            if value and value.time() != datetime.time():
+                return False
+
+        return True
+
+    @property
+    def is_rollup_report(self):
+        """
+        Check if report is computed from daily totals.
+
+        Returns a Boolean.
+
+        """
+        return self.use_rollup and self.is_daily_report
+
+    @property
+    def is_snapshot_report(self):
+        """
+        Check if report uses frozen totals of closed periods.
+
+        Returns a Boolean.
+
+        """
+        return self.use_snapshots and self.is_daily_report
+
+    @property
+    def is_analytics_report(self):
+        """
+        Check if report is computed using NumPy column arrays.
+
+        Returns a Boolean.
+
+        """
+        if self.engine != 'numpy' or 'tag' in self.group_by:
+            return False
+
+        return analytics.is_available()
+
+    def get_group_column(self, name, table):
+        """
+        Get the SQL expression for a report group.
+
+        Returns an SQL expression.
+
+        """
+        if name in DATE_GRANULARITIES:
+            if table is not Activity.__table__:
+                # Daily totals are already grouped by day
+                column = table.c.day
+                if name != 'day':
+                    column = date_bucket(name, column)
+            else:
+                column = date_bucket(name, self.get_start_column())
+        elif name == 'tag':
+            column = tag_association_table.c.tag_id
+        else:
+            column = table.c[GROUP_COLUMNS[name]]
+
+        return column.label(GROUP_COLUMNS[name])
+
+    def get_start_column(self):
+        """
+        Get the SQL expression for the start of the activities
+        used to filter and group them.
+
+        Returns an SQL expression.
+
+        """
+        start = Activity.__table__.c.start
+        if self.local_dates:
+            return get_local_datetime(start)
+
+        return start
+
+    def get_activities_from(self):
+        """
+        Get the FROM clause for statements that get activities.
+
+        Returns a FromClause.
+
+        """
+        table = Activity.__table__
+        from_obj = table
+        if self.local_dates:
+            from_obj = join_timezone_offsets(
+                from_obj,
+                table.c.user_id,
+                table.c.start,
+            )
+        if 'tag' in self.group_by:
+            from_obj = from_obj.outerjoin(
+                tag_association_table,
+                tag_association_table.c.activity_id == table.c.id,
+            )
+
+        return from_obj
+
+    def filter_statement(self, statement, table):
+        """
+        Filter a report statement by user and project.
+
+        Returns a Select.
+
+        """
+        if self.user_id_list is not None:
+            statement = statement.where(
+                table.c.user_id.in_(self.user_id_list or [NULL])
+            )
+        if self.project_id_list is not None:
+            statement = statement.where(
+                table.c.project_id.in_(self.project_id_list or [NULL])
+            )
+
+        return statement
+
+    def filter_activities(self, statement):
+        """
+        Filter a statement to get finished activities for current report.
+
+        Returns a Select.
+
+        """
+        table = Activity.__table__
+        statement = statement.select_from(self.get_activities_from())
+        statement = statement.where(table.c.end != NULL)
+        if self.local_dates:
+            # Filter by UTC start first, so start index can be used
+            if self.from_date:
+                statement = statement.where(
+                    table.c.start >= self.from_date - MAX_UTC_OFFSET
+                )
+            if self.to_date:
+                statement = statement.where(
+                    table.c.start < self.to_date + MAX_UTC_OFFSET
+                )
+
+        start = self.get_start_column()
+        if self.from_date:
+            statement = statement.where(start >= self.from_date)
+        if self.to_date:
+            statement = statement.where(start < self.to_date)
+
+        return self.filter_statement(statement, table)
+
+    def get_rollup_statement(self, table=activity_rollup_table):
+        """
+        Get the SQL statement to get report rows from daily totals.
+
+        Table can be the daily totals or the snapshots table.
+        Rows are not sorted.
+
+        Returns a Select.
+
+        """
+        group_columns = [
+            self.get_group_column(name, table)
+            for name in self.group_by
+        ]
+        statement = select(group_columns + [
+            func.sum(table.c.seconds).label('seconds'),
+            func.coalesce(func.sum(table.c.count), 0).label('count'),
+        ])
+        if self.from_date:
+            statement = statement.where(table.c.day >= self.from_date.date())
+        if self.to_date:
+            statement = statement.where(table.c.day < self.to_date.date())
+
+        statement = self.filter_statement(statement, table)
+        if group_columns:
+            statement = statement.group_by(*group_columns)
+
+        return statement
+
+    def get_activities_statement(self):
+        """
+        Get the SQL statement to get report rows from activities.
+
+        Rows are not sorted.
+
+        Returns a Select.
+
+        """
+        table = Activity.__table__
+        group_columns = [
+            self.get_group_column(name, table)
+            for name in self.group_by
+        ]
+        duration = duration_seconds(table.c.start, table.c.end)
+        statement = select(group_columns + [
+            func.sum(duration).label('seconds'),
+            func.count().label('count'),
+        ])
+        statement = self.filter_activities(statement)
+        if group_columns:
+            statement = statement.group_by(*group_columns)
+
+        return statement
+
+    def get_snapshot_statement(self, statement, table):
+        """
+        Merge a report statement with the frozen totals of closed periods.
+
+        Rows of closed days are removed from `statement`, where
+        `table` is the activities or daily totals table.
+
+        Returns a Select.
+
+        """
+        if table is Activity.__table__:
+            day = table.c.start
+        else:
+            day = table.c.day
+
+        statement = statement.where(
+            not_(get_closed_condition(table.c.user_id, day))
+        )
+        snapshot = self.get_rollup_statement(activity_snapshot_table)
+        totals = union_all(statement, snapshot).alias('totals')
+        group_columns = [
+            totals.c[GROUP_COLUMNS[name]]
+            for name in self.group_by
+        ]
+        statement = select(group_columns + [
+            func.sum(totals.c.seconds).label('seconds'),
+            func.sum(totals.c.count).label('count'),
+        ])
+        if group_columns:
+            statement = statement.group_by(*group_columns)
+
+        return statement
+
+    def get_statement(self):
+        """
+        Get the SQL statement to get report rows.
+
+        Returns a Select.
+
+        """
+        if self.is_rollup_report:
+            table = activity_rollup_table
+            statement = self.get_rollup_statement(table)
+        else:
+            table = Activity.__table__
+            statement = self.get_activities_statement()
+
+        if self.is_snapshot_report:
+            statement = self.get_snapshot_statement(statement, table)
+
+        # Sort rows by the group columns
+        group_columns = list(statement.inner_columns)[:len(self.group_by)]
+        if group_columns:
+            statement = statement.order_by(*group_columns)
+
+        return statement
+
+    def get_rows(self, session):
+        """
+        Get report rows.
+
+        Each row is a List with the values for report columns.
+
+        Returns a List of Lists.
+
+        """
+        if self.use_local_dates:
+            self.local_dates = has_local_timezones(session, self.user_id_list)
+
+        if self.is_analytics_report:
+            offset_column = None
+            if self.local_dates:
+                offset_column = get_offset_column()
+
+            columns = analytics.ActivityColumns.load(
+                session,
+                self.filter_activities,
+                offset_column=offset_column,
+            )
+            return analytics.get_report_rows(columns, self.group_by)
+
+        rows = []
+        for row in session.execute(self.get_statement()):
+            row = list(row)
+            for (index, value) in enumerate(row):
+                # Dates are returned as strings by some databases
+                if isinstance(value, (datetime.date, datetime.datetime)):
+                    row[index] = value.strftime('%Y-%m-%d')
+
+            # Sum is NULL when there are no activities
+            row[-2] = int(row[-2] or 0)
+            row[-1] = int(row[-1])
+            rows.append(row)
+
+        return rows
+
+    def get_data(self, session):
+        """
+        Get report data.
+
+        Data contains the report column names and the rows
+        with the values for each column:
+
+            {"columns": ["user_id", "day", "seconds", "count"],
+             "rows": [[1, "2014-03-01", 28800, 3], ..]}
+
+        Returns a Dictionary.
+
+        """
+        return {
+            'columns': self.columns,
+            'rows': self.get_rows(session),
+        }
@@ -0,0 +1,331 @@
+"""
+Activity analytics computed using NumPy arrays.
+
+Activities are loaded once as typed column arrays, and durations,
+group totals, pivots and percentiles are computed using vectorized
+operations instead of Python loops.
+
+NumPy is an optional dependency. Use `is_available()` to check
+if analytics can be used.
+
+"""
+import datetime
+
+from sqlalchemy import case
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import select
+
+from sandglass.time.models.activity import Activity
+from sandglass.time.models.activity import ACTIVITY_TYPES
+from sandglass.time.reports import ReportError
+from sandglass.time.reports.sql import DATE_GRANULARITIES
+from sandglass.time.reports.sql import epoch_seconds
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Categories for activity type codes
+ACTIVITY_TYPE_CATEGORIES = tuple(sorted(ACTIVITY_TYPES))
+
+# Names of the columns that can be used to group activities
+GROUP_NAMES = ('user', 'project', 'task', 'activity_type') + DATE_GRANULARITIES
+
+# Value used for NULL IDs and unknown categories
+NULL_CODE = -1
+
+# Number of rows fetched from database at once
+FETCH_SIZE = 10000
+
+SECONDS_PER_DAY = 86400
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
+
+
+def is_available():
+    """
+    Check if NumPy is installed.
+
+    Returns a Boolean.
+
+    """
+    return numpy is not None
+
+
+def get_load_statement(filter_statement=None, offset_column=None):
+    """
+    Get the SQL statement to load activity columns.
+
+    IDs are returned as integers where NULL is -1, datetimes
+    as epoch seconds and activity types as category codes.
+    Last column is the UTC offset in seconds of activity start,
+    which is 0 when no offset column is given.
+
+    Returns a Select.
+
+    """
+    table = Activity.__table__
+    type_code = case(
+        [
+            (table.c.activity_type == name, code)
+            for (code, name) in enumerate(ACTIVITY_TYPE_CATEGORIES)
+        ],
+        else_=NULL_CODE,
+    )
+    statement = select([
+        epoch_seconds(table.c.start),
+        epoch_seconds(table.c.end),
+        func.coalesce(table.c.user_id, NULL_CODE),
+        func.coalesce(table.c.project_id, NULL_CODE),
+        func.coalesce(table.c.task_id, NULL_CODE),
+        type_code,
+        literal(0) if offset_column is None else offset_column,
+    ])
+    if filter_statement:
+        statement = filter_statement(statement)
+
+    return statement
+
+
+class ActivityColumns(object):
+    """
+    Activity values saved as NumPy column arrays.
+
+    Start and end are epoch seconds, IDs are int32 arrays where
+    NULL values are -1, and activity type is an array of codes
+    for `ACTIVITY_TYPE_CATEGORIES`.
+
+    Dates are local dates of activity start, where `offset` contains
+    the UTC offset in seconds of each activity. By default offsets
+    are 0, so dates are UTC dates.
+
+    """
+    def __init__(self, start, end, user_id, project_id, task_id,
+                 activity_type, offset=None):
+        self.start = numpy.asarray(start, dtype=numpy.int64)
+        self.end = numpy.asarray(end, dtype=numpy.int64)
+        self.user_id = numpy.asarray(user_id, dtype=numpy.int32)
+        self.project_id = numpy.asarray(project_id, dtype=numpy.int32)
+        self.task_id = numpy.asarray(task_id, dtype=numpy.int32)
+        self.activity_type = numpy.asarray(activity_type, dtype=numpy.int8)
+        if offset is None:
+            self.offset = numpy.zeros(len(self.start), dtype=numpy.int64)
+        else:
+            self.offset = numpy.asarray(offset, dtype=numpy.int64)
+
+    def __len__(self):
+        return len(self.start)
+
+    @classmethod
+    def load(cls, session, filter_statement=None, offset_column=None):
+        """
+        Load activity columns from database.
+
+        Argument `filter_statement` is a function that gets the load
+        statement and returns it filtered. Activities without end
+        must be filtered out. When `offset_column` is given it is
+        the SQL expression for the UTC offset of each activity.
+
+        Returns an ActivityColumns.
+
+        """
+        statement = get_load_statement(filter_statement, offset_column)
+        result = session.execute(statement)
+        chunks = []
+        while True:
+            rows = result.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+
+            chunks.append(numpy.array(rows, dtype=numpy.int64))
+
+        if chunks:
+            values = numpy.concatenate(chunks)
+        else:
+            values = numpy.empty((0, 7), dtype=numpy.int64)
+
+        return cls(*values.T)
+
+    @property
+    def durations(self):
+        """
+        Get the duration of each activity in seconds.
+
+        Returns an Array.
+
+        """
+        return self.end - self.start
+
+    def get_column(self, name):
+        """
+        Get the values of a group column.
+
+        Date columns contain the number of days since 1970-01-01
+        for the first date of the day, week or month.
+
+        Returns an Array.
+
+        """
+        if name not in GROUP_NAMES:
+            raise ReportError("Invalid group {}".format(name))
+
+        if name not in DATE_GRANULARITIES:
+            if name == 'activity_type':
+                return self.activity_type
+
+            return getattr(self, name + '_id')
+
+        days = (self.start + self.offset) // SECONDS_PER_DAY
+        if name == 'week':
+            # 1970-01-01 is a Thursday, so Mondays are 3 days before
+            days = days - (days + 3) % 7
+        elif name == 'month':
+            months = days.astype('datetime64[D]').astype('datetime64[M]')
+            days = months.astype('datetime64[D]').astype(numpy.int64)
+
+        return days
+
+    def get_groups(self, names):
+        """
+        Get the groups of activities for a list of group names.
+
+        Groups are sorted by their values.
+
+        Returns a Tuple with an Array with the values of each group
+        and an Array with the group index of each activity.
+
+        """
+        if not names:
+            return (
+                numpy.empty((1, 0), dtype=numpy.int64),
+                numpy.zeros(len(self), dtype=numpy.intp),
+            )
+
+        keys = numpy.column_stack([
+            self.get_column(name).astype(numpy.int64)
+            for name in names
+        ])
+        if not len(keys):
+            return (keys, numpy.zeros(0, dtype=numpy.intp))
+
+        return numpy.unique(keys, axis=0, return_inverse=True)
+
+    def group_sum(self, names):
+        """
+        Get total seconds and number of activities for each group.
+
+        Without group names there is a single group.
+
+        Returns a Tuple with an Array with the values of each group,
+        an Array with total seconds and an Array with counts.
+
+        """
+        (keys, inverse) = self.get_groups(names)
+        seconds = numpy.bincount(
+            inverse,
+            weights=self.durations,
+            minlength=len(keys),
+        )
+        counts = numpy.bincount(inverse, minlength=len(keys))
+        return (keys, seconds.astype(numpy.int64), counts)
+
+    def pivot(self, row_name, column_name):
+        """
+        Get total seconds for each pair of row and column values.
+
+        Returns a Tuple with an Array of row values, an Array of
+        column values and a 2D Array with total seconds.
+
+        """
+        (rows, row_index) = numpy.unique(
+            self.get_column(row_name),
+            return_inverse=True,
+        )
+        (columns, column_index) = numpy.unique(
+            self.get_column(column_name),
+            return_inverse=True,
+        )
+        totals = numpy.zeros((len(rows), len(columns)), dtype=numpy.int64)
+        numpy.add.at(totals, (row_index, column_index), self.durations)
+        return (rows, columns, totals)
+
+    def percentiles(self, percents, names=()):
+        """
+        Get percentiles of activity durations for each group.
+
+        Percentiles are computed using linear interpolation, like
+        `numpy.percentile` does.
+
+        Returns a Tuple with an Array with the values of each group
+        and a 2D Array with a row of percentiles for each group.
+
+        """
+        percents = numpy.asarray(percents, dtype=numpy.float64)
+        if ((percents < 0) | (percents > 100)).any():
+            raise ReportError("Percentiles must be between 0 and 100")
+
+        (keys, inverse) = self.get_groups(names)
+        if not len(self):
+            return (keys[:0], numpy.zeros((0, len(percents))))
+
+        # Sort durations by group, so each group is a contiguous slice
+        durations = self.durations
+        order = numpy.lexsort((durations, inverse))
+        durations = durations[order].astype(numpy.float64)
+        counts = numpy.bincount(inverse, minlength=len(keys))
+        starts = numpy.cumsum(counts) - counts
+
+        positions = (
+            starts[:, numpy.newaxis] +
+            (counts[:, numpy.newaxis] - 1) * (percents / 100.0)
+        )
+        lower = numpy.floor(positions).astype(numpy.intp)
+        upper = numpy.ceil(positions).astype(numpy.intp)
+        fraction = positions - lower
+        values = (
+            durations[lower] +
+            (durations[upper] - durations[lower]) * fraction
+        )
+        return (keys, values)
+
+
+def decode_value(name, value):
+    """
+    Get the report value for a group column value.
+
+    Returns an Integer, a String or None.
+
+    """
+    value = int(value)
+    if name in DATE_GRANULARITIES:
+        date = EPOCH_DATE + datetime.timedelta(days=value)
+        return date.strftime('%Y-%m-%d')
+    elif value == NULL_CODE:
+        return
+    elif name == 'activity_type':
+        return ACTIVITY_TYPE_CATEGORIES[value]
+
+    return value
+
+
+def get_report_rows(columns, names):
+    """
+    Get report rows with group totals for activity columns.
+
+    Rows contain the values for each group name, total seconds
+    and number of activities, like the rows of SQL reports.
+
+    Returns a List of Lists.
+
+    """
+    (keys, seconds, counts) = columns.group_sum(names)
+    rows = []
+    for (index, key) in enumerate(keys.tolist()):
+        row = [decode_value(name, value) for (name, value) in zip(names, key)]
+        row.append(int(seconds[index]))
+        row.append(int(counts[index]))
+        rows.append(row)
+
+    return rows
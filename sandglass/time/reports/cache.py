@@ -0,0 +1,251 @@
+"""
+Cache of report results.
+
+Reports are cached by a normalized signature of their arguments,
+and cached reports are removed when activities of the users and
+projects included in a report change for any day in report
+date range, or when the time zone of its users change.
+
+"""
+import datetime
+import sys
+
+import transaction
+
+from sandglass.time.cache import LRUCache
+from sandglass.time.models.activity import Activity
+from sandglass.time.models.tag import Tag
+from sandglass.time.models.user import User
+
+# Values used when there are no values in the settings
+DEFAULT_CACHE_SIZE = 1000
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_MEMORY = 16 * 1024 * 1024
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class CachedReport(object):
+    """
+    Report data with the arguments used to compute it.
+
+    """
+    def __init__(self, report, data):
+        self.data = data
+        self.group_by = tuple(report.group_by)
+        self.from_date = report.from_date
+        self.to_date = report.to_date
+        self.local_dates = report.local_dates
+        self.user_ids = None
+        if report.user_id_list is not None:
+            self.user_ids = frozenset(report.user_id_list)
+
+        self.project_ids = None
+        if report.project_id_list is not None:
+            self.project_ids = frozenset(report.project_id_list)
+
+    def includes_day(self, day):
+        """
+        Check if a day is part of report date range.
+
+        Day is a UTC day, so when report uses local dates the days
+        before and after report dates are also included.
+
+        Returns a Boolean.
+
+        """
+        start = datetime.datetime.combine(day, datetime.time())
+        end = start + ONE_DAY
+        if self.local_dates:
+            (start, end) = (start - ONE_DAY, end + ONE_DAY)
+
+        if self.from_date and end <= self.from_date:
+            return False
+        elif self.to_date and start >= self.to_date:
+            return False
+
+        return True
+
+    def is_affected(self, days):
+        """
+        Check if report changes for a list of user, project and day.
+
+        Returns a Boolean.
+
+        """
+        for (user_id, project_id, day) in days:
+            if self.user_ids is not None and user_id not in self.user_ids:
+                continue
+            elif (self.project_ids is not None and
+                    project_id not in self.project_ids):
+                continue
+            elif self.includes_day(day):
+                return True
+
+        return False
+
+
+def get_report_size(cached_report):
+    """
+    Estimate memory used by a cached report in bytes.
+
+    Returns an Integer.
+
+    """
+    rows = cached_report.data['rows']
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        size += sum(sys.getsizeof(value) for value in row)
+
+    return size
+
+
+class ReportCache(LRUCache):
+    """
+    LRU cache of report data by report signature.
+
+    Reports computed while cache is invalidated are not saved,
+    because they could have been computed before the changes
+    were committed.
+
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('get_size', get_report_size)
+        super(ReportCache, self).__init__(**kwargs)
+        self.generation = 0
+
+    def get_report_data(self, report, session):
+        """
+        Get data for a report from cache or compute it.
+
+        Returns a Dictionary.
+
+        """
+        signature = report.signature
+        cached_report = self.get(signature)
+        if cached_report is not None:
+            return cached_report.data
+
+        generation = self.generation
+        data = report.get_data(session)
+        if generation == self.generation:
+            self.set(signature, CachedReport(report, data))
+
+        return data
+
+    def invalidate(self, condition=None):
+        """
+        Remove cached reports where `condition(cached_report)` is true.
+
+        All reports are removed when no condition is given.
+
+        """
+        with self._lock:
+            self.generation += 1
+
+        if condition is None:
+            self.clear()
+        else:
+            self.delete_many(lambda key, cached: condition(cached))
+
+    def invalidate_users(self, user_id_list=None):
+        """
+        Remove cached reports that include any user of a list.
+
+        All reports are removed when no list is given.
+
+        """
+        if user_id_list is None:
+            self.invalidate()
+            return
+
+        user_ids = frozenset(user_id_list)
+        self.invalidate(lambda cached: (
+            cached.user_ids is None or
+            not cached.user_ids.isdisjoint(user_ids)
+        ))
+
+    def invalidate_days(self, days):
+        """
+        Remove cached reports for a list of user, project and day.
+
+        """
+        self.invalidate(lambda cached: cached.is_affected(days))
+
+
+# Global cache of report data
+REPORT_CACHE = ReportCache(
+    max_size=DEFAULT_CACHE_SIZE,
+    ttl=DEFAULT_CACHE_TTL,
+    max_memory=DEFAULT_CACHE_MEMORY,
+)
+
+
+def get_setting_value(settings, name, default):
+    try:
+        return max(int(settings.get(name)), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def configure_report_cache(settings):
+    """
+    Configure report cache size, TTL and memory.
+
+    Values are getted from `report.cache_size`, `report.cache_ttl`
+    and `report.cache_memory` settings, where memory is a number of
+    bytes. Cache is disabled when size is 0.
+
+    """
+    REPORT_CACHE.max_size = get_setting_value(
+        settings,
+        'report.cache_size',
+        DEFAULT_CACHE_SIZE,
+    )
+    REPORT_CACHE.ttl = get_setting_value(
+        settings,
+        'report.cache_ttl',
+        DEFAULT_CACHE_TTL,
+    )
+    REPORT_CACHE.max_memory = get_setting_value(
+        settings,
+        'report.cache_memory',
+        DEFAULT_CACHE_MEMORY,
+    )
+    REPORT_CACHE.clear()
+    REPORT_CACHE.reset_stats()
+
+
+def invalidate_days_after_commit(days):
+    """
+    Remove cached reports for a list of user, project and day
+    after current transaction is committed.
+
+    """
+    def invalidate_after_commit(success):
+        if success:
+            REPORT_CACHE.invalidate_days(days)
+
+    if days:
+        transaction.get().addAfterCommitHook(invalidate_after_commit)
+
+
+def invalidate_report_cache(event):
+    """
+    Remove cached reports when activity tags change, when
+    changed activities are unknown, or when users change, because
+    their time zone could have changed.
+
+    Function is a `ModelChanged` event subscriber.
+
+    """
+    if issubclass(event.model, Activity):
+        if event.related_name:
+            REPORT_CACHE.invalidate(lambda cached: 'tag' in cached.group_by)
+        elif event.pk_list is None:
+            REPORT_CACHE.invalidate()
+    elif issubclass(event.model, Tag):
+        REPORT_CACHE.invalidate(lambda cached: 'tag' in cached.group_by)
+    elif issubclass(event.model, User) and not event.related_name:
+        REPORT_CACHE.invalidate_users(event.pk_list)
@@ -0,0 +1,215 @@
+"""
+Daily activity totals.
+
+Total seconds and number of activities are saved for each user,
+project, task, activity type and day, so reports with a granularity
+of one day or more don't have to read all activities.
+
+Totals are not incremented. When activities change all totals for
+the changed users and days are computed again from activities, so
+they are always the same as the ones computed from activities.
+
+Rows of the users whose totals are computed are locked for update,
+so totals of a user are not computed by two transactions at once.
+
+"""
+import datetime
+
+from sqlalchemy import and_
+from sqlalchemy import distinct
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import select
+from zope.sqlalchemy import mark_changed
+
+from sandglass.time.filters import NULL
+from sandglass.time.models.activity import Activity
+from sandglass.time.models.activity import activity_rollup_table
+from sandglass.time.models.user import User
+from sandglass.time.reports.sql import date_bucket
+from sandglass.time.reports.sql import duration_seconds
+
+# Rollup columns used to group activities
+GROUP_COLUMNS = ('user_id', 'project_id', 'task_id', 'activity_type', 'day')
+
+# Maximum number of IDs or days used in a single statement
+CHUNK_SIZE = 200
+
+# Default number of users whose totals are rebuilt in each chunk
+REBUILD_CHUNK_SIZE = 100
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def to_date(value):
+    """
+    Convert a date value returned by the database to a date.
+
+    Returns a Date.
+
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    elif isinstance(value, datetime.date):
+        return value
+
+    return datetime.datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def iter_chunks(values, chunk_size=CHUNK_SIZE):
+    values = sorted(values)
+    for index in range(0, len(values), chunk_size):
+        yield values[index:index + chunk_size]
+
+
+def get_lock_users_statement(user_id_list, read=False):
+    """
+    Get the SQL statement to lock the rows of a list of users.
+
+    Rows are locked for update, or for share when `read` is True.
+    Databases without row locks, like SQLite, don't lock rows.
+
+    Returns a Select.
+
+    """
+    table = User.__table__
+    statement = select([table.c.id])
+    statement = statement.where(table.c.id.in_(user_id_list))
+    return statement.order_by(table.c.id).with_for_update(read=read)
+
+
+def lock_users(session, user_id_list, read=False):
+    """
+    Lock the rows of a list of users until current transaction ends.
+
+    """
+    for chunk_user_id_list in iter_chunks(set(user_id_list)):
+        statement = get_lock_users_statement(chunk_user_id_list, read=read)
+        session.execute(statement).fetchall()
+
+
+def get_rollup_select(condition):
+    """
+    Get a select to compute daily totals for activities.
+
+    Returns a Select.
+
+    """
+    table = Activity.__table__
+    day = date_bucket('day', table.c.start)
+    group_columns = [
+        table.c.user_id,
+        table.c.project_id,
+        table.c.task_id,
+        table.c.activity_type,
+        day,
+    ]
+    statement = select(group_columns + [
+        func.sum(duration_seconds(table.c.start, table.c.end)),
+        func.count(),
+    ])
+    statement = statement.where(table.c.end != NULL)
+    statement = statement.where(condition)
+    return statement.group_by(*group_columns)
+
+
+def insert_totals(session, condition):
+    """
+    Insert daily totals for the activities matching a condition.
+
+    """
+    statement = activity_rollup_table.insert().from_select(
+        list(GROUP_COLUMNS) + ['seconds', 'count'],
+        get_rollup_select(condition),
+    )
+    session.execute(statement)
+
+
+def get_activity_days(session, id_list):
+    """
+    Get user, project and day of start for a list of activities.
+
+    Returns a Set of Tuples.
+
+    """
+    table = Activity.__table__
+    day = date_bucket('day', table.c.start)
+    days = set()
+    for chunk_id_list in iter_chunks(set(id_list)):
+        statement = select([table.c.user_id, table.c.project_id, day])
+        statement = statement.distinct()
+        statement = statement.where(table.c.id.in_(chunk_id_list))
+        for (user_id, project_id, value) in session.execute(statement):
+            days.add((user_id, project_id, to_date(value)))
+
+    return days
+
+
+def update_rollup(session, days):
+    """
+    Compute again daily totals for a list of user, project and day.
+
+    Totals are computed for all projects of each user and day.
+
+    Users are locked for update until current transaction ends.
+
+    """
+    days_by_user = {}
+    for (user_id, project_id, day) in days:
+        days_by_user.setdefault(user_id, set()).add(day)
+
+    lock_users(session, days_by_user)
+
+    table = Activity.__table__
+    rollup = activity_rollup_table
+    for (user_id, user_days) in days_by_user.items():
+        for day_list in iter_chunks(user_days):
+            statement = rollup.delete()
+            statement = statement.where(rollup.c.user_id == user_id)
+            statement = statement.where(rollup.c.day.in_(day_list))
+            session.execute(statement)
+            # Activities are matched using start ranges to use indexes
+            day_ranges = or_(*[
+                and_(table.c.start >= day, table.c.start < day + ONE_DAY)
+                for day in day_list
+            ])
+            insert_totals(session, and_(table.c.user_id == user_id,
+                                        day_ranges))
+
+    if days:
+        mark_changed(session)
+
+
+def rebuild_rollup(session, chunk_size=REBUILD_CHUNK_SIZE, commit=None):
+    """
+    Compute again all daily totals.
+
+    Totals are deleted and computed again in chunks of users, and
+    users of each chunk are locked for update while their totals
+    are computed. When `commit` is given, it is called after each
+    chunk to commit the changes, otherwise all changes are made in
+    current transaction.
+
+    Returns the number of users.
+
+    """
+    table = Activity.__table__
+    rollup = activity_rollup_table
+    # Users without activities can still have totals to delete
+    statement = select([distinct(table.c.user_id)]).union(
+        select([distinct(rollup.c.user_id)])
+    )
+    user_id_list = [user_id for (user_id, ) in session.execute(statement)]
+    for chunk_user_id_list in iter_chunks(user_id_list, chunk_size):
+        lock_users(session, chunk_user_id_list)
+        statement = rollup.delete()
+        statement = statement.where(rollup.c.user_id.in_(chunk_user_id_list))
+        session.execute(statement)
+        insert_totals(session, table.c.user_id.in_(chunk_user_id_list))
+        # Statements executed without ORM must be registered
+        # so transaction manager commits them
+        mark_changed(session)
+        if commit:
+            commit()
+
+    return len(user_id_list)
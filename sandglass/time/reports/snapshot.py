@@ -0,0 +1,262 @@
+"""
+Closed timesheet periods.
+
+When a period is closed its users are saved, and daily totals of
+their activities in the period are frozen in a snapshot table.
+Activities of closed periods can't be changed, so reports use
+snapshot totals for closed days and compute only the open days
+from activities.
+
+Closing a period and changing activities lock the rows of their
+users, so activities can't be changed while a snapshot is taken,
+and a period can't be closed while activities of its users are
+being changed.
+
+"""
+import datetime
+
+from sqlalchemy import and_
+from sqlalchemy import exists
+from sqlalchemy import literal
+from sqlalchemy import select
+from zope.sqlalchemy import mark_changed
+
+from sandglass.time.models.activity import Activity
+from sandglass.time.models.group import user_association_table
+from sandglass.time.models.period import activity_snapshot_table
+from sandglass.time.models.period import Period
+from sandglass.time.models.period import period_user_table
+from sandglass.time.models.user import User
+from sandglass.time.reports import PeriodError
+from sandglass.time.reports.rollup import get_rollup_select
+from sandglass.time.reports.rollup import GROUP_COLUMNS
+from sandglass.time.reports.rollup import iter_chunks
+from sandglass.time.reports.rollup import lock_users
+from sandglass.time.reports.rollup import to_date
+
+
+def to_datetime(value):
+    return datetime.datetime.combine(value, datetime.time())
+
+
+def get_periods_statement(user_id_list):
+    """
+    Get the SQL statement to get closed periods of a list of users.
+
+    Statement returns user ID, start and end of each period.
+
+    Returns a Select.
+
+    """
+    table = Period.__table__
+    users = period_user_table
+    statement = select([users.c.user_id, table.c.start, table.c.end])
+    statement = statement.select_from(
+        users.join(table, table.c.id == users.c.period_id)
+    )
+    return statement.where(users.c.user_id.in_(user_id_list))
+
+
+def get_closed_condition(user_id_column, start_column):
+    """
+    Get an SQL condition that is true when a user and datetime
+    or date are part of a closed period.
+
+    Returns an SQL expression.
+
+    """
+    table = Period.__table__
+    users = period_user_table
+    statement = select([users.c.period_id])
+    statement = statement.select_from(
+        users.join(table, table.c.id == users.c.period_id)
+    )
+    statement = statement.where(users.c.user_id == user_id_column)
+    statement = statement.where(table.c.start <= start_column)
+    statement = statement.where(table.c.end > start_column)
+    return exists(statement)
+
+
+def get_closed_days(session, days):
+    """
+    Get the items of a list of user, project and day that are
+    part of a closed period.
+
+    Users are locked for share, so their periods can't be closed
+    until current transaction ends.
+
+    Returns a Set of Tuples.
+
+    """
+    days_by_user = {}
+    for item in days:
+        days_by_user.setdefault(item[0], set()).add(item)
+
+    closed_days = set()
+    if not days_by_user:
+        return closed_days
+
+    lock_users(session, days_by_user, read=True)
+
+    table = Period.__table__
+    first_day = min(item[2] for item in days)
+    last_day = max(item[2] for item in days)
+    for user_id_list in iter_chunks(days_by_user):
+        statement = get_periods_statement(user_id_list)
+        statement = statement.where(table.c.start <= last_day)
+        statement = statement.where(table.c.end > first_day)
+        for (user_id, start, end) in session.execute(statement):
+            (start, end) = (to_date(start), to_date(end))
+            for item in days_by_user[user_id]:
+                if start <= item[2] < end:
+                    closed_days.add(item)
+
+    return closed_days
+
+
+def is_closed_range(session, user_id_list, start, end):
+    """
+    Check if all days between two datetimes are closed for a list
+    of users. End datetime is not included.
+
+    Returns a Boolean.
+
+    """
+    if not user_id_list or not start or not end:
+        return False
+
+    (first_day, last_day) = (start.date(), end.date())
+    if end.time() != datetime.time():
+        last_day += datetime.timedelta(days=1)
+
+    ranges_by_user = {}
+    table = Period.__table__
+    for chunk_user_id_list in iter_chunks(set(user_id_list)):
+        statement = get_periods_statement(chunk_user_id_list)
+        statement = statement.where(table.c.start < last_day)
+        statement = statement.where(table.c.end > first_day)
+        for (user_id, start, end) in session.execute(statement):
+            ranges = ranges_by_user.setdefault(user_id, [])
+            ranges.append((to_date(start), to_date(end)))
+
+    for user_id in set(user_id_list):
+        # Closed periods must cover the range without gaps
+        day = first_day
+        for (period_start, period_end) in sorted(
+                ranges_by_user.get(user_id, ())):
+            if period_start > day:
+                break
+
+            day = max(day, period_end)
+
+        if day < last_day:
+            return False
+
+    return True
+
+
+def get_period_user_ids(session, period):
+    """
+    Get the IDs of the users of a period.
+
+    Returns a List of Integers.
+
+    """
+    if period.user_id:
+        return [period.user_id]
+    elif period.group_id:
+        table = user_association_table
+        statement = select([table.c.user_id])
+        statement = statement.where(table.c.group_id == period.group_id)
+    else:
+        statement = select([User.__table__.c.id])
+
+    return [user_id for (user_id, ) in session.execute(statement)]
+
+
+def close_period(session, period):
+    """
+    Save users and freeze daily activity totals of a period.
+
+    Period users are locked until current transaction ends, so their
+    activities can't be changed while their totals are computed.
+
+    Raises PeriodError when period dates are not valid, or when
+    period overlaps another closed period of its users.
+
+    """
+    if period.start >= period.end:
+        raise PeriodError("Period end must be after period start")
+
+    user_id_list = get_period_user_ids(session, period)
+    lock_users(session, user_id_list)
+    table = Period.__table__
+    overlapping = set()
+    for chunk_user_id_list in iter_chunks(user_id_list):
+        statement = get_periods_statement(chunk_user_id_list)
+        statement = statement.where(table.c.id != period.id)
+        statement = statement.where(table.c.start < period.end)
+        statement = statement.where(table.c.end > period.start)
+        for (user_id, start, end) in session.execute(statement):
+            overlapping.add(user_id)
+
+    if overlapping:
+        raise PeriodError(
+            "Period overlaps closed periods of users {}".format(
+                ', '.join(str(user_id) for user_id in sorted(overlapping))
+            )
+        )
+
+    if user_id_list:
+        session.execute(period_user_table.insert(), [
+            {'period_id': period.id, 'user_id': user_id}
+            for user_id in user_id_list
+        ])
+
+    activities = Activity.__table__
+    start = to_datetime(period.start)
+    end = to_datetime(period.end)
+    for chunk_user_id_list in iter_chunks(user_id_list):
+        totals = get_rollup_select(and_(
+            activities.c.user_id.in_(chunk_user_id_list),
+            activities.c.start >= start,
+            activities.c.start < end,
+        ))
+        statement = activity_snapshot_table.insert().from_select(
+            list(GROUP_COLUMNS) + ['seconds', 'count', 'period_id'],
+            totals.column(literal(period.id)),
+        )
+        session.execute(statement)
+
+    mark_changed(session)
+
+
+def close_periods(session, period_id_list):
+    """
+    Close a list of periods.
+
+    Raises PeriodError when a period can't be closed.
+
+    """
+    query = session.query(Period).filter(Period.id.in_(period_id_list))
+    for period in query.order_by(Period.id):
+        close_period(session, period)
+
+
+def open_periods(session, period_id_list):
+    """
+    Remove users and frozen totals of a list of periods.
+
+    Activities of periods can be changed after they are opened.
+
+    """
+    for chunk_period_id_list in iter_chunks(period_id_list):
+        for table in (activity_snapshot_table, period_user_table):
+            statement = table.delete()
+            statement = statement.where(
+                table.c.period_id.in_(chunk_period_id_list)
+            )
+            session.execute(statement)
+
+    if period_id_list:
+        mark_changed(session)
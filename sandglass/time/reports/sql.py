@@ -0,0 +1,160 @@
+"""
+SQL expressions for reports that are compiled for each database.
+
+"""
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import DateTime
+from sqlalchemy.types import Integer
+from sqlalchemy.types import String
+
+# Date granularities supported by `date_bucket`
+DATE_GRANULARITIES = ('day', 'week', 'month')
+
+
+class duration_seconds(FunctionElement):
+    """
+    Number of seconds between a start and an end datetime.
+
+    """
+    name = 'duration_seconds'
+    type = Integer()
+
+
+class epoch_seconds(FunctionElement):
+    """
+    Number of seconds since 1970-01-01 for a datetime.
+
+    Datetimes are considered to be UTC.
+
+    """
+    name = 'epoch_seconds'
+    type = Integer()
+
+
+class add_seconds(FunctionElement):
+    """
+    Datetime plus a number of seconds.
+
+    SQLite datetimes are returned in the same format SQLAlchemy
+    saves them, so they can be compared with datetime columns.
+
+    """
+    name = 'add_seconds'
+    type = DateTime()
+
+
+class date_bucket(FunctionElement):
+    """
+    First date of the day, week or month for a datetime.
+
+    Weeks start on Monday. Databases return dates or ISO
+    date strings depending on the dialect.
+
+    """
+    name = 'date_bucket'
+    type = String()
+
+    def __init__(self, granularity, *clauses, **kwargs):
+        if granularity not in DATE_GRANULARITIES:
+            raise ValueError("Invalid granularity {}".format(granularity))
+
+        self.granularity = granularity
+        super(date_bucket, self).__init__(*clauses, **kwargs)
+
+
+def get_arguments(element, compiler, **kw):
+    return [compiler.process(clause, **kw) for clause in element.clauses]
+
+
+@compiles(duration_seconds)
+def compile_duration_seconds(element, compiler, **kw):
+    (start, end) = get_arguments(element, compiler, **kw)
+    return 'CAST(EXTRACT(EPOCH FROM ({} - {})) AS INTEGER)'.format(end, start)
+
+
+@compiles(duration_seconds, 'sqlite')
+def compile_sqlite_duration_seconds(element, compiler, **kw):
+    (start, end) = get_arguments(element, compiler, **kw)
+    days = 'julianday({}) - julianday({})'.format(end, start)
+    return 'CAST(ROUND(({}) * 86400) AS INTEGER)'.format(days)
+
+
+@compiles(duration_seconds, 'mysql')
+def compile_mysql_duration_seconds(element, compiler, **kw):
+    (start, end) = get_arguments(element, compiler, **kw)
+    return 'TIMESTAMPDIFF(SECOND, {}, {})'.format(start, end)
+
+
+@compiles(epoch_seconds)
+def compile_epoch_seconds(element, compiler, **kw):
+    (value, ) = get_arguments(element, compiler, **kw)
+    return 'CAST(EXTRACT(EPOCH FROM {}) AS BIGINT)'.format(value)
+
+
+@compiles(epoch_seconds, 'sqlite')
+def compile_sqlite_epoch_seconds(element, compiler, **kw):
+    (value, ) = get_arguments(element, compiler, **kw)
+    return "CAST(strftime('%s', {}) AS INTEGER)".format(value)
+
+
+@compiles(epoch_seconds, 'mysql')
+def compile_mysql_epoch_seconds(element, compiler, **kw):
+    # UNIX_TIMESTAMP() would use the session time zone
+    (value, ) = get_arguments(element, compiler, **kw)
+    return "TIMESTAMPDIFF(SECOND, '1970-01-01', {})".format(value)
+
+
+@compiles(add_seconds)
+def compile_add_seconds(element, compiler, **kw):
+    (value, seconds) = get_arguments(element, compiler, **kw)
+    return "({} + {} * INTERVAL '1 second')".format(value, seconds)
+
+
+@compiles(add_seconds, 'sqlite')
+def compile_sqlite_add_seconds(element, compiler, **kw):
+    (value, seconds) = get_arguments(element, compiler, **kw)
+    return "strftime('%Y-%m-%d %H:%M:%f000', {}, {} || ' seconds')".format(
+        value,
+        seconds,
+    )
+
+
+@compiles(add_seconds, 'mysql')
+def compile_mysql_add_seconds(element, compiler, **kw):
+    (value, seconds) = get_arguments(element, compiler, **kw)
+    return 'DATE_ADD({}, INTERVAL {} SECOND)'.format(value, seconds)
+
+
+@compiles(date_bucket)
+def compile_date_bucket(element, compiler, **kw):
+    (value, ) = get_arguments(element, compiler, **kw)
+    return "CAST(date_trunc('{}', {}) AS DATE)".format(
+        element.granularity,
+        value,
+    )
+
+
+@compiles(date_bucket, 'sqlite')
+def compile_sqlite_date_bucket(element, compiler, **kw):
+    (value, ) = get_arguments(element, compiler, **kw)
+    if element.granularity == 'day':
+        return 'date({})'.format(value)
+    elif element.granularity == 'week':
+        # Move to next Sunday (or same day) and then back to Monday
+        return "date({}, 'weekday 0', '-6 days')".format(value)
+
+    return "date({}, 'start of month')".format(value)
+
+
+@compiles(date_bucket, 'mysql')
+def compile_mysql_date_bucket(element, compiler, **kw):
+    (value, ) = get_arguments(element, compiler, **kw)
+    if element.granularity == 'day':
+        return 'DATE({})'.format(value)
+    elif element.granularity == 'week':
+        return 'DATE_SUB(DATE({0}), INTERVAL WEEKDAY({0}) DAY)'.format(value)
+
+    return 'DATE_SUB(DATE({0}), INTERVAL DAYOFMONTH({0}) - 1 DAY)'.format(
+        value,
+    )
@@ -0,0 +1,196 @@
+"""
+Local dates for reports.
+
+Activity datetimes are saved as UTC datetimes. To group activities
+by the local day, week or month of their users, UTC offsets of user
+time zones are saved in a table, so they can be joined with
+activities and local datetimes are computed in the database.
+
+"""
+import datetime
+
+import pytz
+
+from sqlalchemy import and_
+from sqlalchemy import distinct
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from zope.sqlalchemy import mark_changed
+
+from sandglass.time.models.bulk import INSERT_IGNORE_PREFIXES
+from sandglass.time.models.user import DEFAULT_TIMEZONE
+from sandglass.time.models.user import timezone_offset_table
+from sandglass.time.models.user import User
+from sandglass.time.reports.sql import add_seconds
+
+# Datetimes used as limits of the first and last offsets
+MIN_DATETIME = datetime.datetime(1900, 1, 1)
+MAX_DATETIME = datetime.datetime(9999, 12, 31)
+
+# Maximum difference between a local datetime and UTC
+MAX_UTC_OFFSET = datetime.timedelta(hours=14)
+
+
+def get_timezone_offsets(name):
+    """
+    Get the UTC offsets of a time zone.
+
+    Unknown time zones are considered to be UTC.
+
+    Returns a List of Tuples with UTC start and end datetimes
+    and the offset in seconds.
+
+    """
+    try:
+        timezone = pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        timezone = pytz.utc
+
+    transition_times = getattr(timezone, '_utc_transition_times', None)
+    if not transition_times:
+        offset = timezone.utcoffset(MIN_DATETIME)
+        return [(MIN_DATETIME, MAX_DATETIME, int(offset.total_seconds()))]
+
+    offsets = []
+    end_times = transition_times[1:] + [MAX_DATETIME]
+    for (start, end, info) in zip(transition_times, end_times,
+                                  timezone._transition_info):
+        if end <= MIN_DATETIME:
+            continue
+
+        offset = int(info[0].total_seconds())
+        offsets.append((max(start, MIN_DATETIME), end, offset))
+
+    return offsets
+
+
+def get_user_timezones(session, user_id_list=None):
+    """
+    Get the time zone names of a list of users.
+
+    Time zones of all users are returned when no list is given.
+
+    Returns a Set of Strings.
+
+    """
+    table = User.__table__
+    statement = select([distinct(table.c.timezone)])
+    if user_id_list is not None:
+        if not user_id_list:
+            return set()
+
+        statement = statement.where(table.c.id.in_(set(user_id_list)))
+
+    return set(name for (name, ) in session.execute(statement))
+
+
+def get_saved_timezones(session, timezones):
+    """
+    Get the names of the time zones that have saved UTC offsets.
+
+    Returns a Set of Strings.
+
+    """
+    table = timezone_offset_table
+    statement = select([distinct(table.c.timezone)])
+    statement = statement.where(table.c.timezone.in_(timezones))
+    return set(name for (name, ) in session.execute(statement))
+
+
+def save_timezone_offsets(session, timezones):
+    """
+    Save UTC offsets for time zones that have no saved offsets.
+
+    Offsets could be saved at the same time by another request, so
+    rows that already exist are ignored. When database can't ignore
+    them, offsets of each time zone are inserted in a savepoint that
+    is rolled back when they already exist.
+
+    """
+    missing = set(timezones) - get_saved_timezones(session, timezones)
+    if not missing:
+        return
+
+    dialect = session.get_bind(mapper=User.__mapper__).dialect
+    statement = timezone_offset_table.insert()
+    prefix = INSERT_IGNORE_PREFIXES.get(dialect.name)
+    if prefix:
+        statement = statement.prefix_with(prefix)
+
+    for name in sorted(missing):
+        rows = [
+            {'timezone': name, 'start': start, 'end': end, 'offset': offset}
+            for (start, end, offset) in get_timezone_offsets(name)
+        ]
+        if prefix:
+            session.execute(statement, rows)
+            continue
+
+        savepoint = session.begin_nested()
+        try:
+            session.execute(statement, rows)
+        except IntegrityError:
+            savepoint.rollback()
+        else:
+            savepoint.commit()
+
+    mark_changed(session)
+
+
+def has_local_timezones(session, user_id_list=None):
+    """
+    Check if a list of users have time zones different than UTC.
+
+    UTC offsets for user time zones are saved when they are not UTC,
+    so they can be used to compute local datetimes.
+
+    Returns a Boolean.
+
+    """
+    timezones = get_user_timezones(session, user_id_list)
+    if not (timezones - set([DEFAULT_TIMEZONE])):
+        return False
+
+    save_timezone_offsets(session, timezones)
+    return True
+
+
+def join_timezone_offsets(from_obj, user_id_column, datetime_column):
+    """
+    Join a table with the UTC offsets of its users time zones
+    for the values of a UTC datetime column.
+
+    Returns a Join.
+
+    """
+    users = User.__table__
+    offsets = timezone_offset_table
+    from_obj = from_obj.join(users, users.c.id == user_id_column)
+    return from_obj.outerjoin(offsets, and_(
+        offsets.c.timezone == users.c.timezone,
+        offsets.c.start <= datetime_column,
+        offsets.c.end > datetime_column,
+    ))
+
+
+def get_local_datetime(datetime_column):
+    """
+    Get the SQL expression for the local datetime of a UTC datetime
+    column in a statement joined with `join_timezone_offsets()`.
+
+    Returns an SQL expression.
+
+    """
+    return add_seconds(datetime_column, get_offset_column())
+
+
+def get_offset_column():
+    """
+    Get the SQL expression for the UTC offset in seconds in
+    a statement joined with `join_timezone_offsets()`.
+
+    Returns an SQL expression.
+
+    """
+    return func.coalesce(timezone_offset_table.c.offset, 0)
@@ -7,7 +7,9 @@ Extending the request objects with utility functions.
 import logging
 
 from pyramid.events import NewRequest
+from pyramid.interfaces import IAuthenticationPolicy
 from pyramid.security import authenticated_userid
+from pyramid.security import unauthenticated_userid
 from sqlalchemy.orm import joinedload
 
 from sandglass.time.models.user import User
@@ -64,27 +66,57 @@ def rest_collection_mode(request):
     return mode
 
 
-def authenticated_user(request):
+def token_user(request):
     """
-    Get authenticated user object.
+    Get the user for the token given in the request credentials.
+
+    User is loaded once per request together with its groups, so
+    authentication and permission checks don't need more queries
+    (permissions are checked using the permission matrix).
+
+    Credentials are not checked, so `authenticated_user`
+    should be used to get the current user instead.
 
-    Returns a User.
+    Returns a User or None.
 
     """
+    token = unauthenticated_userid(request)
+    if not token:
+        return
+
     user = None
-    token = authenticated_userid(request)
     query = User.query().filter(User.token == token)
-    query = query.options(
-        joinedload('groups').joinedload('permissions')
-    )
+    query = query.options(joinedload('groups'))
     try:
         user = query.first()
     except:
-        LOG.exception("Unable to get authenticated user")
+        LOG.exception("Unable to get user for request token")
 
     return user
 
 
+def authenticated_user(request):
+    """
+    Get authenticated user object.
+
+    When authentication policy has a `get_user` method it is used
+    to get the user, otherwise user is getted by request token.
+
+    Returns a User or None.
+
+    """
+    userid = authenticated_userid(request)
+    if userid is None:
+        return
+
+    policy = request.registry.queryUtility(IAuthenticationPolicy)
+    get_user = getattr(policy, 'get_user', None)
+    if get_user:
+        return get_user(request, userid)
+
+    return request.token_user
+
+
 def add_cors_headers_response_callback(event):
     """
     Event callback to add C.O.R.S. HTTP headers to each response.
@@ -119,4 +151,5 @@ def extend_request_object(config):
     config.add_request_method(callable=is_member, reify=True)
     config.add_request_method(callable=is_collection, reify=True)
     config.add_request_method(callable=rest_collection_mode, reify=True)
+    config.add_request_method(callable=token_user, reify=True)
     config.add_request_method(callable=authenticated_user, reify=True)
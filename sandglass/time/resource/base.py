@@ -6,6 +6,8 @@ from datetime import datetime
 from pyramid.decorator import reify
 from zope import interface
 
+from sandglass.time.api import API
+from sandglass.time.describe.cache import DESCRIPTIONS
 from sandglass.time.describe.interfaces import IDescribable
 from sandglass.time.describe.resource import ResourceDescriber
 from sandglass.time.security import PERMISSION
@@ -262,5 +264,14 @@ class BaseResource(object):
         Get an API resource description.
 
         """
-        describer = self.describer_cls(self)
-        return describer
+        # Use a precomputed description for registered resources
+        resource_cls = self.__class__
+        version = API.get_resource_version(resource_cls)
+        if not version:
+            return self.describer_cls(self)
+
+        description = DESCRIPTIONS.get_resource_description(
+            version,
+            resource_cls,
+        )
+        return description.get_response(self.request)
@@ -0,0 +1,136 @@
+import hashlib
+
+from pyramid.httpexceptions import HTTPNotModified
+from webob.datetime_utils import UTC
+
+from sandglass.time.utils import get_settings
+
+# Max age used when there is no value in the settings
+DEFAULT_CACHE_MAX_AGE = 0
+
+
+def get_cache_max_age():
+    """
+    Get the number of seconds a cached response is considered fresh.
+
+    Value is getted from `response.cache_max_age` setting.
+
+    Returns an Integer.
+
+    """
+    settings = get_settings()
+    value = settings.get('response.cache_max_age')
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return DEFAULT_CACHE_MAX_AGE
+
+
+def get_etag(*values):
+    """
+    Get an entity tag for a list of values.
+
+    Tag is a hash of the string representation of all values,
+    so any value change gives a different tag.
+
+    Returns a String.
+
+    """
+    tag = hashlib.sha1()
+    for value in values:
+        if isinstance(value, unicode):
+            value = value.encode('utf8')
+
+        tag.update(str(value))
+        tag.update('\0')
+
+    return tag.hexdigest()
+
+
+def to_utc(value):
+    """
+    Convert a datetime to UTC truncating microseconds.
+
+    Naive datetimes are considered to be UTC datetimes.
+    Microseconds are removed because HTTP dates have second resolution.
+
+    Returns a datetime.
+
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    else:
+        value = value.astimezone(UTC)
+
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """
+    Check if a client cached version of a resource is still valid.
+
+    When request has an `If-None-Match` header `If-Modified-Since`
+    header is ignored.
+
+    Returns a Boolean.
+
+    """
+    if 'If-None-Match' in request.headers:
+        return etag in request.if_none_match
+
+    if last_modified is None:
+        return False
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since is None:
+        return False
+
+    return to_utc(last_modified) <= to_utc(if_modified_since)
+
+
+def set_cache_headers(response, etag, last_modified=None, max_age=None):
+    """
+    Add HTTP cache validation headers to a response.
+
+    Responses can be stored by browsers and reverse proxies, but they
+    must be revalidated after `max_age` seconds, which by default
+    is `response.cache_max_age` setting.
+    Responses vary by authorization because API data depends on
+    the user that makes the request.
+
+    """
+    if max_age is None:
+        max_age = get_cache_max_age()
+
+    response.etag = etag
+    if last_modified is not None:
+        response.last_modified = to_utc(last_modified)
+
+    response.cache_control = 'max-age={}, must-revalidate'.format(max_age)
+    vary = set(response.vary or ())
+    vary.add('Authorization')
+    response.vary = sorted(vary)
+
+
+def conditional_response(request, etag, last_modified=None, max_age=None):
+    """
+    Handle a conditional GET request.
+
+    Cache headers are added to the response of current request,
+    where `max_age` is the number of seconds response is fresh.
+
+    Returns an HTTPNotModified response when client cached
+    version is still valid, otherwise None.
+
+    """
+    if is_not_modified(request, etag, last_modified):
+        response = HTTPNotModified()
+        set_cache_headers(response, etag, last_modified, max_age=max_age)
+        return response
+
+    def cache_headers_callback(request, response):
+        # Skip headers for error responses
+        if response.status_int == 200:
+            set_cache_headers(response, etag, last_modified, max_age=max_age)
+
+    request.add_response_callback(cache_headers_callback)
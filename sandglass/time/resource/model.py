@@ -7,16 +7,36 @@ import transaction
 
 from pyramid.decorator import reify
 from pyramid.exceptions import NotFound
+from pyramid.security import authenticated_userid
+from pyramid.settings import asbool
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import load_only
 
 from sandglass.time import _
 from sandglass.time.api.error import APIError
 from sandglass.time.filters import QueryFilterError
 from sandglass.time.filters.model import CollectionByPrimaryKey
 from sandglass.time.describe.resource import ModelResourceDescriber
+from sandglass.time.events import notify_model_changed
 from sandglass.time.models import BaseModel
+from sandglass.time.models import READONLY_SESSION
+from sandglass.time.models import TimestampMixin
 from sandglass.time.models import transactional
+from sandglass.time.models.bulk import bulk_add_related
+from sandglass.time.models.bulk import BULK_CHUNK_SIZE
+from sandglass.time.models.bulk import bulk_insert
+from sandglass.time.models.bulk import bulk_remove_related
+from sandglass.time.models.bulk import bulk_update
+from sandglass.time.models.bulk import BulkInsertError
+from sandglass.time.models.bulk import BulkOperationError
+from sandglass.time.renderers import stream_json_response
 from sandglass.time.resource.base import BaseResource
+from sandglass.time.resource.conditional import conditional_response
+from sandglass.time.resource.conditional import get_etag
+from sandglass.time.resource.pagination import get_max_page_size
+from sandglass.time.resource.pagination import KeysetPaginator
+from sandglass.time.resource.pagination import PaginationError
 from sandglass.time.response import error_response
 from sandglass.time.response import info_response
 
@@ -77,7 +97,7 @@ class ResourceSerializerProxy(object):
             if mode == 'pk':
                 return value.id
             else:
-                return dict(value)
+                return value.get_serializer().serialize(value)
         elif isinstance(value, list):
             return [self.parse_value(item, mode, field_name) for item in value]
         else:
@@ -155,6 +175,23 @@ class ModelResource(BaseResource):
     # Modes used to load related member data
     related_query_modes = ('pk', 'full')
 
+    # Model fields used to sort collection pages.
+    # Last field must be unique and all of them must be indexed.
+    pagination_keys = ('id', )
+
+    # Number of objects to read and write at once
+    # when a collection is streamed to the response
+    stream_chunk_size = 500
+
+    # Return "304 Not Modified" for GET requests when client
+    # cached version of a member or collection is still valid
+    conditional_get = True
+
+    # Create new objects using multiple row INSERT statements.
+    # This can also be enabled or disabled for a single request
+    # using the `X-Bulk-Create` HTTP header.
+    bulk_create = False
+
     @classmethod
     def _get_model_relationships(cls):
         return cls.model.__mapper__.relationships
@@ -240,6 +277,18 @@ class ModelResource(BaseResource):
         query = query.filter(self.model.id == self.pk_value)
         return query.count() == 1
 
+    @reify
+    def is_visible_object(self):
+        """
+        Check if an object exists for current pk value and it is
+        not filtered by resource query filters for current user.
+
+        Return a Boolean.
+
+        """
+        query = self.get_filtered_model_query()
+        return query.enable_eagerloads(False).count() == 1
+
     @reify
     def relationships(self):
         """
@@ -282,6 +331,53 @@ class ModelResource(BaseResource):
 
         return fields
 
+    @reify
+    def page_limit(self):
+        """
+        Get the maximum number of objects to return for collection pages.
+
+        Pagination is enabled by giving a `limit` argument in the request.
+        The `request.max_page_size` setting is used when limit is bigger.
+
+        Return an Integer or None when pagination is not enabled.
+
+        """
+        limit = self.request.GET.get('limit')
+        if not limit:
+            return
+
+        try:
+            return KeysetPaginator.parse_limit(limit, get_max_page_size())
+        except PaginationError, err:
+            raise APIError('INVALID_PAGINATION', details=err.message)
+
+    @reify
+    def is_bulk_create(self):
+        """
+        Check if new objects must be created in bulk.
+
+        Return a Boolean.
+
+        """
+        value = self.request.headers.get('X-Bulk-Create')
+        if value is None:
+            return self.bulk_create
+
+        return asbool(value)
+
+    @reify
+    def is_stream_request(self):
+        """
+        Check if current collection must be streamed to the response.
+
+        Streaming is enabled by giving a true `stream` argument
+        in the request.
+
+        Return a Boolean.
+
+        """
+        return asbool(self.request.GET.get('stream'))
+
     @reify
     def related_query_mode(self):
         """
@@ -368,6 +464,55 @@ class ModelResource(BaseResource):
 
         return query
 
+    def get_load_only_fields(self, model):
+        """
+        Get the model field names to load from database.
+
+        Only the fields returned for GET requests that give a `fields`
+        argument are loaded, so unused column values are not read.
+        All fields are loaded when a returned field is not a column
+        (for example a value computed during serialization).
+
+        Return a List or None when all fields must be loaded.
+
+        """
+        if self.request.method != 'GET' or not self.return_fields:
+            return
+
+        mapper = model.__mapper__
+        column_names = mapper.column_attrs.keys()
+        field_names = []
+        for field_name in self.return_fields:
+            if field_name in column_names:
+                field_names.append(field_name)
+            elif field_name not in mapper.relationships:
+                return
+
+        return field_names
+
+    def get_filtered_model_query(self, session=None):
+        """
+        Get a query for current model with model query filters applied.
+
+        When request is a member request, query filter results for current
+        member PK value.
+
+        Returns a Query.
+
+        """
+        query = self.model.query(session=session)
+        if self.is_member_request:
+            query = query.filter_by(id=self.pk_value)
+
+        query_filters = self.get_query_filters()
+        if query_filters:
+            try:
+                query = self.apply_model_query_filters(query_filters, query)
+            except QueryFilterError, err:
+                raise APIError('INVALID_FILTER', details=err.message)
+
+        return query
+
     def get_model_query(self, session=None):
         """
         Get a query for current model.
@@ -399,20 +544,25 @@ class ModelResource(BaseResource):
         # add a joinedload for that field to avoid another query
         if self.related_name:
             load_mode = joinedload(self.related_name)
+            # Returned fields are related object fields
+            related_model = self.relationships[self.related_name].mapper
+            field_names = self.get_load_only_fields(related_model.class_)
+            if field_names:
+                load_mode = load_mode.load_only(*field_names)
+
             load_options.append(load_mode)
+        else:
+            field_names = self.get_load_only_fields(self.model)
+            if field_names:
+                # Pagination keys are needed to get page cursors
+                if not self.is_member_request:
+                    for field_name in self.pagination_keys:
+                        if field_name not in field_names:
+                            field_names.append(field_name)
 
-        # Create the base model query
-        query = self.model.query(session=session)
-        if self.is_member_request:
-            query = query.filter_by(id=self.pk_value)
+                load_options.append(load_only(*field_names))
 
-        # Apply model query filters
-        query_filters = self.get_query_filters()
-        if query_filters:
-            try:
-                query = self.apply_model_query_filters(query_filters, query)
-            except QueryFilterError, err:
-                raise APIError('INVALID_FILTER', details=err.message)
+        query = self.get_filtered_model_query(session=session)
 
         # Add load options
         if load_options:
@@ -420,6 +570,131 @@ class ModelResource(BaseResource):
 
         return query
 
+    def get_member_version(self):
+        """
+        Get version values for current member object.
+
+        Values are read without loading the object.
+
+        Return a Tuple with an ETag and the last modification datetime,
+        or None when object does not exist.
+
+        """
+        model = self.model
+        modified = func.coalesce(model.modified, model.created)
+        query = self.get_filtered_model_query()
+        result = query.with_entities(model.id, modified).first()
+        if not result:
+            return
+
+        (pk_value, last_modified) = result
+        etag = get_etag(
+            model.__name__,
+            pk_value,
+            last_modified,
+            self.request.query_string,
+        )
+        return (etag, last_modified)
+
+    def get_collection_version(self):
+        """
+        Get version values for current collection.
+
+        Values are computed from an aggregate of collection objects.
+        Deleting an object doesn't change the last modification date
+        of a collection, so only an ETag is used for collections.
+
+        Return a Tuple with an ETag and None.
+
+        """
+        model = self.model
+        query = self.get_filtered_model_query()
+        query = query.with_entities(
+            func.count(model.id),
+            func.max(model.id),
+            func.max(func.coalesce(model.modified, model.created)),
+        )
+        etag = get_etag(
+            model.__name__,
+            # Collections can be filtered by authenticated user
+            authenticated_userid(self.request),
+            self.request.query_string,
+            *query.one()
+        )
+        return (etag, None)
+
+    def get_not_modified_response(self):
+        """
+        Handle conditional GET requests for current member or collection.
+
+        When client cached version is still valid a "304 Not Modified"
+        response is returned, so query and serialization are skipped.
+
+        Conditional requests are only supported by models with timestamp
+        fields, and when no related objects are included in the response.
+        Collection pages and streamed collections are not conditional,
+        because collection version is computed from all its objects.
+
+        Return a Response or None.
+
+        """
+        if not self.conditional_get or self.request.method != 'GET':
+            return
+        elif not issubclass(self.model, TimestampMixin):
+            return
+        elif self.related_query_mode or self.is_related_request:
+            return
+        elif not self.is_member_request and (
+                self.page_limit or self.is_stream_request):
+            return
+
+        if self.is_member_request:
+            version = self.get_member_version()
+        else:
+            version = self.get_collection_version()
+
+        if not version:
+            return
+
+        (etag, last_modified) = version
+        return conditional_response(self.request, etag, last_modified)
+
+    def notify_changes(self, pk_list=None, related_name=None):
+        """
+        Notify that objects of current model were changed.
+
+        A `ModelChanged` event is notified after request
+        transaction is committed.
+
+        """
+        notify_model_changed(
+            self.request,
+            self.model,
+            pk_list=pk_list,
+            related_name=related_name,
+        )
+
+    def bulk_create_objects(self, session, data_list):
+        """
+        Create new objects using multiple row INSERT statements.
+
+        Raises BulkInsertError when objects can't be created in bulk.
+
+        Returns a List of objects.
+
+        """
+        id_list = bulk_insert(session, self.model, data_list)
+        self.notify_changes(id_list)
+        # Get created objects to return them as response
+        object_dict = {}
+        for index in range(0, len(id_list), BULK_CHUNK_SIZE):
+            chunk_id_list = id_list[index:index + BULK_CHUNK_SIZE]
+            query = self.model.query(session=session)
+            query = query.filter(self.model.id.in_(chunk_id_list))
+            object_dict.update((obj.id, obj) for obj in query)
+
+        return [object_dict[pk_value] for pk_value in id_list]
+
     @handle_collection_rest_modes
     @transactional
     def post_collection(self, session):
@@ -429,8 +704,22 @@ class ModelResource(BaseResource):
         Request body can be a JSON object or a list of objects.
 
         """
+        data_list = self.submitted_collection_data
+        if self.is_bulk_create:
+            try:
+                return self.bulk_create_objects(session, data_list)
+            except BulkInsertError, err:
+                LOG.debug("Objects are not created in bulk: %s", err)
+            except APIError:
+                raise
+            except:
+                msg = "Unable to insert POST collection data for /%s"
+                LOG.exception(msg, self.get_route_prefix())
+                transaction.doom()
+                return error_response(_("Error creating object(s)"))
+
         obj_list = []
-        for data in self.submitted_collection_data:
+        for data in data_list:
             obj = self.model(**data)
             session.add(obj)
             obj_list.append(obj)
@@ -443,6 +732,7 @@ class ModelResource(BaseResource):
             LOG.exception(msg, self.get_route_prefix())
             return error_response(_("Error creating object(s)"))
 
+        self.notify_changes([obj.id for obj in obj_list])
         return obj_list
 
     @transactional
@@ -455,14 +745,8 @@ class ModelResource(BaseResource):
         """
         data_list = self.submitted_collection_data
         # Update all members in data list
-        count = 0
-        query = session.query(self.model)
         try:
-            for data in data_list:
-                pk_value = data.pop('id')
-                update_query = query.filter(self.model.id == pk_value)
-                update_query.update(data)
-                count += 1
+            count = bulk_update(session, self.model, data_list)
         except:
             LOG.exception('Error updating object(s) during PUT request')
             transaction.doom()
@@ -471,36 +755,171 @@ class ModelResource(BaseResource):
         if not count:
             return error_response(_("No object(s) updated"))
 
+        self.notify_changes([data['id'] for data in data_list])
         msg = _("Object(s) updated successfully")
-        # TODO: Check support for rowcount
-        # http://docs.sqlalchemy.org/en/latest/core/connections.html
-        # sqlalchemy.engine.ResultProxy.rowcount
         return info_response(msg, data={'count': count})
 
+    def serialize_member(self, obj):
+        """
+        Get a serialized model object.
+
+        When fields to return are given in the request only
+        these fields are serialized.
+
+        Return a Dictionary or a serializer.
+
+        """
+        serializer = self.serializer_cls(self, obj)
+        if not self.return_fields:
+            return serializer
+
+        member = serializer.serialize()
+        # Remove fields that are not needed from member
+        for field_name in member.keys():
+            if field_name not in self.return_fields:
+                del member[field_name]
+
+        return member
+
+    def iter_serialized_collection(self, object_list):
+        """
+        Iterate serialized model objects.
+
+        Returns a Generator.
+
+        """
+        for obj in object_list:
+            yield self.serialize_member(obj)
+
+    def serialize_collection(self, object_list):
+        """
+        Get a serialized list of model objects.
+
+        Return a List.
+
+        """
+        return list(self.iter_serialized_collection(object_list))
+
+    def get_collection_page(self, query):
+        """
+        Get a page of model objects.
+
+        Page starts after the object pointed by the `after` request
+        argument, which is the `next` cursor from the previous page.
+
+        Return a Dictionary with page items and the next page cursor.
+
+        """
+        paginator = KeysetPaginator(self.model, self.pagination_keys)
+        cursor = self.request.GET.get('after')
+        try:
+            (object_list, next_cursor) = paginator.get_page(
+                query,
+                self.page_limit,
+                cursor=cursor,
+            )
+        except PaginationError, err:
+            raise APIError('INVALID_PAGINATION', details=err.message)
+
+        return {
+            'items': self.serialize_collection(object_list),
+            'next': next_cursor,
+        }
+
+    def iter_collection_stream(self, query):
+        """
+        Iterate all objects for a query reading them in chunks.
+
+        When related objects are included in the query, objects are
+        read in keyset pages because joined eager loading can't be
+        used to load objects in chunks using `yield_per`.
+
+        Returns a Generator.
+
+        """
+        chunk_size = self.stream_chunk_size
+        if not self.related_query_mode:
+            # Use server side cursors when database supports them
+            query = query.execution_options(stream_results=True)
+            for obj in query.yield_per(chunk_size):
+                yield obj
+
+            return
+
+        paginator = KeysetPaginator(self.model, self.pagination_keys)
+        cursor = None
+        while True:
+            (object_list, cursor) = paginator.get_page(
+                query,
+                chunk_size,
+                cursor=cursor,
+            )
+            for obj in object_list:
+                yield obj
+
+            if not cursor:
+                break
+
+            # Remove previous page objects from session
+            query.session.expunge_all()
+
+    def get_collection_stream(self):
+        """
+        Get a response that streams all model objects.
+
+        Objects are read from database and written to the response in
+        chunks, so big collections can be returned without loading all
+        objects into memory at once.
+
+        Return a Response.
+
+        """
+        # Response is streamed after request transaction is finished,
+        # so a session that is not handled by transaction manager is
+        # used to read collection objects.
+        session = READONLY_SESSION()
+        try:
+            query = self.get_model_query(session=session)
+        except:
+            session.close()
+            raise
+
+        def iter_collection():
+            try:
+                object_list = self.iter_collection_stream(query)
+                for member in self.iter_serialized_collection(object_list):
+                    yield member
+            finally:
+                session.close()
+
+        return stream_json_response(
+            iter_collection(),
+            self.request,
+            chunk_size=self.stream_chunk_size,
+        )
+
     def get_collection(self):
         """
         Get all model objects.
 
+        When a `limit` is given in the request a single page of
+        objects is returned.
+
+        When `stream` argument is true objects are streamed
+        to the response instead.
+
         """
-        collection = []
-        query = self.get_model_query()
-        object_list = query.all()
-        if self.return_fields:
-            for obj in object_list:
-                serializer = self.serializer_cls(self, obj)
-                member = serializer.serialize()
-                # Remove fields that are not needed from member
-                for field_name in member.keys():
-                    if field_name not in self.return_fields:
-                        del member[field_name]
-
-                collection.append(member)
-        else:
-            for obj in object_list:
-                serializer = self.serializer_cls(self, obj)
-                collection.append(serializer)
+        response = self.get_not_modified_response()
+        if response:
+            return response
+
+        if self.page_limit:
+            return self.get_collection_page(self.get_model_query())
+        elif self.is_stream_request:
+            return self.get_collection_stream()
 
-        return collection
+        query = self.get_model_query()
+        return self.serialize_collection(query.all())
 
     def delete_collection(self):
         """
@@ -514,6 +933,7 @@ class ModelResource(BaseResource):
         if not count:
             msg = _("No objects were deleted")
         else:
+            self.notify_changes(id_list)
             msg = _("Object(s) deleted successfully")
 
         return info_response(msg, data={'count': count})
@@ -523,19 +943,11 @@ class ModelResource(BaseResource):
         Get object for current request.
 
         """
-        obj = self.object
-        if self.return_fields:
-            serializer = self.serializer_cls(self, obj)
-            member = serializer.serialize()
-            # Remove fields that are not needed from member
-            for field_name in member.keys():
-                if field_name not in self.return_fields:
-                    del member[field_name]
+        response = self.get_not_modified_response()
+        if response:
+            return response
 
-            # Return a dictionary only with requested fields
-            return member
-        else:
-            return self.serializer_cls(self, obj)
+        return self.serialize_member(self.object)
 
     def put_member(self):
         """
@@ -555,6 +967,7 @@ class ModelResource(BaseResource):
         if not count:
             return error_response(_("No object was updated"))
 
+        self.notify_changes([self.pk_value])
         return self.object
 
     def delete_member(self):
@@ -568,6 +981,7 @@ class ModelResource(BaseResource):
         if not count:
             return error_response(_('No object was deleted'))
         else:
+            self.notify_changes([self.pk_value])
             # Return the deleted object
             return serialized_object
 
@@ -581,15 +995,10 @@ class ModelResource(BaseResource):
             return
         elif not isinstance(related, list):
             # Return a single object
-            return self.serializer_cls(self, related)
+            return self.serialize_member(related)
 
         # When related is a list serialize each object
-        collection = []
-        for obj in related:
-            serializer = self.serializer_cls(self, obj)
-            collection.append(serializer)
-
-        return collection
+        return self.serialize_collection(related)
 
     def _get_submitted_related_id_list(self):
         # Get IDs for the related members to remove
@@ -620,6 +1029,17 @@ class ModelResource(BaseResource):
 
         return id_list
 
+    def check_related_parent(self, session):
+        """
+        Check that current object exists without loading it.
+
+        Raises NotFound when object does not exist or is not visible.
+
+        """
+        query = self.get_model_query(session=session)
+        if not query.enable_eagerloads(False).count():
+            raise NotFound()
+
     def put_related(self):
         """
         Update related object collection.
@@ -637,26 +1057,55 @@ class ModelResource(BaseResource):
 
             [1, 99, ..]
 
+        Objects are related using bulk statements without loading them.
+
         """
-        related = getattr(self.object, self.related_name)
         relationship = self.relationships[self.related_name]
         # Check that relationship is using a list and not a single object
         if not relationship.uselist:
             raise APIError('OBJECT_NOT_ALLOWED')
 
-        # Create a query to get related objects to be appended
         update_id_list = self._get_submitted_related_id_list()
+        session = self.model.new_session()
+        self.check_related_parent(session)
+        try:
+            count = bulk_add_related(
+                session,
+                relationship,
+                self.pk_value,
+                update_id_list,
+            )
+        except BulkOperationError, err:
+            LOG.debug("Related objects are not added in bulk: %s", err)
+            count = self.add_related_objects(relationship, update_id_list)
+
+        self.notify_changes([self.pk_value], related_name=self.related_name)
+        msg = _("Object(s) added successfully")
+        return info_response(msg, data={'count': count})
+
+    def add_related_objects(self, relationship, id_list):
+        """
+        Add related objects to current object using ORM.
+
+        Objects that are already related are not added again.
+
+        Returns the number of existing objects for the given IDs.
+
+        """
+        related = getattr(self.object, self.related_name)
+        # Create a query to get related objects to be appended
         related_class = relationship.mapper.class_
         query = related_class.query(session=self.object.current_session)
-        query = query.filter(related_class.id.in_(update_id_list))
+        query = query.filter(related_class.id.in_(id_list))
         # Add related objects to current member
         count = 0
         for obj in query.all():
-            related.append(obj)
+            if obj not in related:
+                related.append(obj)
+
             count += 1
 
-        msg = _("Object(s) added successfully")
-        return info_response(msg, data={'count': count})
+        return count
 
     def delete_related(self):
         """
@@ -675,21 +1124,46 @@ class ModelResource(BaseResource):
 
             [1, 99, ..]
 
+        Objects are removed using bulk statements without loading them.
+
         """
-        related = getattr(self.object, self.related_name, None)
-        if not related:
-            return info_response(_("Nothing to delete"), data={'count': 0})
-        elif not isinstance(related, list):
+        relationship = self.relationships[self.related_name]
+        if not relationship.uselist:
             raise APIError('OBJECT_NOT_ALLOWED')
-        else:
-            # Related is a collection of objects
-            related_list = related
-            remove_id_list = self._get_submitted_related_id_list()
-            count = 0
-            for obj in related_list[:]:
-                if obj.id in remove_id_list:
-                    related_list.remove(obj)
-                    count += 1
 
-            msg = _("Object(s) deleted successfully")
-            return info_response(msg, data={'count': count})
+        remove_id_list = self._get_submitted_related_id_list()
+        session = self.model.new_session()
+        self.check_related_parent(session)
+        try:
+            count = bulk_remove_related(
+                session,
+                relationship,
+                self.pk_value,
+                remove_id_list,
+            )
+        except BulkOperationError, err:
+            LOG.debug("Related objects are not removed in bulk: %s", err)
+            count = self.remove_related_objects(remove_id_list)
+
+        if not count:
+            return info_response(_("Nothing to delete"), data={'count': 0})
+
+        self.notify_changes([self.pk_value], related_name=self.related_name)
+        msg = _("Object(s) deleted successfully")
+        return info_response(msg, data={'count': count})
+
+    def remove_related_objects(self, id_list):
+        """
+        Remove related objects from current object using ORM.
+
+        Returns the number of removed objects.
+
+        """
+        related_list = getattr(self.object, self.related_name, None) or []
+        count = 0
+        for obj in related_list[:]:
+            if obj.id in id_list:
+                related_list.remove(obj)
+                count += 1
+
+        return count
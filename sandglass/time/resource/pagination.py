@@ -0,0 +1,200 @@
+import base64
+import json
+
+from datetime import datetime
+
+from sqlalchemy import and_
+from sqlalchemy import or_
+from sqlalchemy.types import DateTime
+from sqlalchemy.types import Integer
+
+from sandglass.time import _
+from sandglass.time.utils import get_settings
+from sandglass.time.utils import ISO_DATE_FORMAT
+
+# ISO date format with microseconds
+ISO_DATE_FORMAT_MS = ISO_DATE_FORMAT + '.%f'
+
+# Page size limit used when there is no limit in the settings
+DEFAULT_MAX_PAGE_SIZE = 1000
+
+
+class PaginationError(Exception):
+    """
+    Exception raised for invalid pagination arguments.
+
+    """
+    def __init__(self, message):
+        super(PaginationError, self).__init__(message)
+        self.message = message
+
+
+def get_max_page_size():
+    """
+    Get the maximum number of objects allowed in a single page.
+
+    Value is getted from `request.max_page_size` setting.
+
+    Returns an Integer.
+
+    """
+    settings = get_settings()
+    value = settings.get('request.max_page_size')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_PAGE_SIZE
+
+
+class KeysetPaginator(object):
+    """
+    Paginate model queries using keyset (a.k.a. cursor) pagination.
+
+    Query results are sorted by a list of model fields, and each page
+    starts right after the keys of the last object of previous page.
+    This way pages are selected using an index instead of counting and
+    skipping rows with OFFSET.
+
+    Last key field must be unique and all key fields must be not null.
+
+    """
+    def __init__(self, model, keys=('id', )):
+        self.model = model
+        self.keys = keys
+
+    @property
+    def columns(self):
+        return [getattr(self.model, name) for name in self.keys]
+
+    @staticmethod
+    def parse_limit(value, max_limit):
+        """
+        Get the number of objects for a page.
+
+        When limit is bigger than the maximum allowed limit
+        the maximum limit is used.
+
+        Returns an Integer.
+
+        """
+        try:
+            limit = int(value)
+        except (TypeError, ValueError):
+            raise PaginationError(_(u"Invalid page limit value"))
+
+        if limit < 1:
+            raise PaginationError(_(u"Page limit must be greater than 0"))
+
+        return min(limit, max_limit)
+
+    def encode_cursor(self, obj):
+        """
+        Get a cursor that points to the page after given object.
+
+        Returns a String.
+
+        """
+        values = []
+        for name in self.keys:
+            value = getattr(obj, name)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+
+            values.append(value)
+
+        cursor = base64.urlsafe_b64encode(json.dumps(values))
+        return cursor.rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Get key values for a cursor.
+
+        Returns a List.
+
+        """
+        # Restore base64 padding characters
+        padding = '=' * (-len(cursor) % 4)
+        try:
+            values = json.loads(base64.urlsafe_b64decode(str(cursor + padding)))
+        except (TypeError, ValueError):
+            raise PaginationError(_(u"Invalid page cursor"))
+
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise PaginationError(_(u"Invalid page cursor"))
+
+        try:
+            return [
+                self.parse_key_value(column, value)
+                for (column, value) in zip(self.columns, values)
+            ]
+        except (TypeError, ValueError):
+            raise PaginationError(_(u"Invalid page cursor"))
+
+    @staticmethod
+    def parse_key_value(column, value):
+        """
+        Convert a cursor value to a python value for a column.
+
+        """
+        if isinstance(column.type, DateTime):
+            date_format = (ISO_DATE_FORMAT_MS if '.' in value
+                           else ISO_DATE_FORMAT)
+            return datetime.strptime(value, date_format)
+        elif isinstance(column.type, Integer):
+            return int(value)
+
+        return value
+
+    def get_cursor_filter(self, values):
+        """
+        Get a filter condition to select objects after some key values.
+
+        For keys (a, b) filter is: a > :a OR (a = :a AND b > :b)
+
+        Returns a filter condition.
+
+        """
+        conditions = []
+        columns = self.columns
+        for index, column in enumerate(columns):
+            condition = [
+                columns[prev_index] == values[prev_index]
+                for prev_index in range(index)
+            ]
+            condition.append(column > values[index])
+            conditions.append(and_(*condition))
+
+        return or_(*conditions)
+
+    def paginate(self, query, limit, cursor=None):
+        """
+        Get a query to select a page of objects.
+
+        An extra object is selected to know if there is a next page.
+
+        Returns a Query.
+
+        """
+        if cursor:
+            values = self.decode_cursor(cursor)
+            query = query.filter(self.get_cursor_filter(values))
+
+        query = query.order_by(*self.columns)
+        return query.limit(limit + 1)
+
+    def get_page(self, query, limit, cursor=None):
+        """
+        Get objects for a page and the cursor for the next page.
+
+        When there are no more pages next cursor is None.
+
+        Returns a Tuple with a List of objects and a String.
+
+        """
+        object_list = self.paginate(query, limit, cursor=cursor).all()
+        next_cursor = None
+        if len(object_list) > limit:
+            object_list = object_list[:limit]
+            next_cursor = self.encode_cursor(object_list[-1])
+
+        return (object_list, next_cursor)
@@ -0,0 +1,125 @@
+from pyramid.settings import asbool
+
+from sandglass.time import _
+from sandglass.time.api.error import APIError
+from sandglass.time.models.activity import Activity
+from sandglass.time.reports import ReportError
+from sandglass.time.reports.activity import ActivityReport
+from sandglass.time.reports.cache import REPORT_CACHE
+from sandglass.time.reports.snapshot import is_closed_range
+from sandglass.time.resource.conditional import conditional_response
+from sandglass.time.resource.conditional import get_etag
+from sandglass.time.utils import get_settings
+
+
+# Seconds that closed reports are fresh when there is no value in settings
+DEFAULT_CLOSED_CACHE_MAX_AGE = 86400
+
+
+def get_closed_cache_max_age(settings):
+    """
+    Get the number of seconds a closed report response is fresh.
+
+    Value is getted from `report.closed_cache_max_age` setting.
+
+    Returns an Integer.
+
+    """
+    try:
+        return max(int(settings.get('report.closed_cache_max_age')), 0)
+    except (TypeError, ValueError):
+        return DEFAULT_CLOSED_CACHE_MAX_AGE
+
+
+def get_id_list_argument(request, name):
+    """
+    Get a list of IDs from a comma separated request argument.
+
+    Raises ReportError when IDs are not valid.
+
+    Returns a List of Integers, or None when argument is not given.
+
+    """
+    value = request.params.get(name)
+    if not value:
+        return
+
+    try:
+        return [int(item) for item in value.split(',')]
+    except ValueError:
+        raise ReportError("Invalid {} argument".format(name))
+
+
+def get_activity_report(resource, user_id_list=None, project_id_list=None):
+    """
+    Get activity report data for a resource request.
+
+    Report groups are given as a comma separated `group_by`
+    request argument, and date range using `from` and `to`
+    arguments. When user or project ID lists are not given,
+    they are getted from `users` and `projects` arguments.
+
+    Daily activity totals are used when `report.use_rollup`
+    setting is enabled, and `report.engine` setting is the
+    engine used to compute totals. Report data is cached until
+    activities included in the report change. When
+    `report.use_local_dates` setting is enabled, report dates are
+    local dates in the time zone of each user.
+
+    When `report.use_snapshots` setting is enabled, totals of closed
+    periods are getted from their snapshots. Responses for reports
+    of users whose periods are closed for all report dates can be
+    cached by clients for `report.closed_cache_max_age` seconds.
+
+    Raises APIError when report arguments are not valid.
+
+    Returns a Dictionary.
+
+    """
+    request = resource.request
+    try:
+        (from_date, to_date) = resource.get_filter_from_to()
+    except (TypeError, ValueError):
+        raise APIError('INVALID_REPORT', details=_('Invalid date format'))
+
+    group_by = request.params.get('group_by', '').split(',')
+    settings = get_settings()
+    try:
+        if user_id_list is None:
+            user_id_list = get_id_list_argument(request, 'users')
+        if project_id_list is None:
+            project_id_list = get_id_list_argument(request, 'projects')
+
+        report = ActivityReport(
+            group_by=[name.strip() for name in group_by if name.strip()],
+            from_date=from_date,
+            to_date=to_date,
+            user_id_list=user_id_list,
+            project_id_list=project_id_list,
+            use_rollup=asbool(settings.get('report.use_rollup')),
+            use_snapshots=asbool(settings.get('report.use_snapshots')),
+            engine=settings.get('report.engine') or 'sql',
+            use_local_dates=asbool(settings.get('report.use_local_dates')),
+        )
+    except ReportError, err:
+        raise APIError('INVALID_REPORT', details=err.message)
+
+    session = Activity.new_session()
+    data = REPORT_CACHE.get_report_data(report, session)
+    # Periods are closed for UTC days, so local dates are not used
+    closed_report = report.use_snapshots and not report.local_dates
+    if closed_report and is_closed_range(
+            session,
+            report.user_id_list,
+            report.from_date,
+            report.to_date):
+        # Closed reports don't change while their periods are closed
+        response = conditional_response(
+            request,
+            get_etag(*report.signature + (data, )),
+            max_age=get_closed_cache_max_age(settings),
+        )
+        if response:
+            return response
+
+    return data
@@ -113,7 +113,8 @@ class RequirePermissions(object):
                 return
 
             # Check that user user has right permissions for this field
-            if self.permissions.issubset(user.permissions):
+            has_permission = user.has_permission
+            if all(has_permission(name) for name in self.permissions):
                 return
 
         raise Invalid(node, error_message)
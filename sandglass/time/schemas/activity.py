@@ -1,4 +1,5 @@
 from colander import DateTime
+from colander import MappingSchema
 from colander import drop
 from colander import Integer
 from colander import OneOf
@@ -7,6 +8,7 @@ from colander import String
 from colander import SequenceSchema
 
 from sandglass.time.schemas import BaseModelSchema
+from sandglass.time.schemas import IdListSchema
 from sandglass.time.models.activity import ACTIVITY_TYPES
 from sandglass.time.models.activity import ACTIVITY_UNASSIGNED
 
@@ -44,3 +46,12 @@ class ActivityListSchema(SequenceSchema):
     Schema definition for a list of activities.
     """
     activity = ActivitySchema()
+
+
+class ActivityTagsSchema(MappingSchema):
+    """
+    Schema definition to add or remove tags for a list of activities.
+
+    """
+    activities = IdListSchema()
+    tags = IdListSchema()
@@ -0,0 +1,28 @@
+from colander import Date
+from colander import drop
+from colander import Integer
+from colander import SchemaNode
+from colander import SequenceSchema
+
+from sandglass.time.schemas import BaseModelSchema
+
+
+class PeriodSchema(BaseModelSchema):
+    """
+    Schema definition for Period model.
+
+    """
+    start = SchemaNode(
+        Date())
+    end = SchemaNode(
+        Date())
+    user_id = SchemaNode(
+        Integer(),
+        missing=drop)
+    group_id = SchemaNode(
+        Integer(),
+        missing=drop)
+
+
+class PeriodListSchema(SequenceSchema):
+    period = PeriodSchema()
@@ -1,10 +1,14 @@
+import pytz
+
 from colander import Email
+from colander import Function
 from colander import Length
 from colander import SchemaNode
 from colander import String
 from colander import drop
 from colander import SequenceSchema
 
+from sandglass.time import _
 from sandglass.time.schemas import BaseModelSchema
 from sandglass.time.schemas import Dictionary
 
@@ -30,6 +34,13 @@ class UserSchema(BaseModelSchema):
     data = SchemaNode(
         Dictionary(),
         missing=drop)
+    timezone = SchemaNode(
+        String(),
+        validator=Function(
+            lambda value: value in pytz.all_timezones_set,
+            msg=_("Invalid time zone"),
+        ),
+        missing=drop)
 
 
 class UserListSchema(SequenceSchema):
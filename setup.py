@@ -33,6 +33,11 @@ setup(
         'cement',
         'PasteScript',
     ],
+    extras_require={
+        # Vectorized activity analytics. NumPy 1.13 adds `unique` axis
+        # argument, and 1.16 is the last version for Python 2.7.
+        'analytics': ['numpy>=1.13,<1.17'],
+    },
     entry_points={
         'paste.app_factory': [
             'main = sandglass.time.main:make_wsgi_app',
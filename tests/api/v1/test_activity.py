@@ -1,6 +1,19 @@
+from datetime import datetime
+from datetime import timedelta
+
+from sqlalchemy import event
+
 from sandglass.time.api.v1.activity import ActivityResource
+from sandglass.time.api.v1.project import ProjectResource
 from sandglass.time.api.v1.tag import TagResource
+from sandglass.time.api.v1.user import UserResource
+from sandglass.time.models import META
+from sandglass.time.models.activity import activity_rollup_table
 from sandglass.time.models.tag import TAG
+from sandglass.time.reports import analytics
+from sandglass.time.reports.activity import ActivityReport
+from sandglass.time.reports.cache import REPORT_CACHE
+from sandglass.time.reports.rollup import rebuild_rollup
 
 
 def test_activity_add_and_delete_tags(request_helper, default_data, session):
@@ -80,3 +93,629 @@ def test_activity_add_and_delete_tags(request_helper, default_data, session):
     assert response.status == '200 OK'
     assert isinstance(response.json, list)
     assert len(response.json) == 1
+
+
+def test_activity_pages(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    session.add_all([project, user])
+
+    # Create activities with the same start date to check that
+    # pages are sorted using start date and ID values.
+    start = datetime(2014, 3, 1, 8, 0)
+    activity_data = []
+    for index in range(5):
+        activity_data.append({
+            'description': u"Activity {}".format(index),
+            'project_id': project.id,
+            'user_id': user.id,
+            'start': (start + timedelta(hours=index % 2)).isoformat(),
+        })
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, activity_data)
+    assert response.status_int == 200
+
+    # Get activities using pages with 2 activities
+    page_list = []
+    params = {'limit': 2}
+    while True:
+        response = request_helper.get_json(url, params=params)
+        assert response.status_int == 200
+        page_list.extend(response.json['items'])
+        if not response.json['next']:
+            break
+
+        params['after'] = response.json['next']
+
+    assert len(page_list) == len(activity_data)
+    page_keys = [(item['start'], item['id']) for item in page_list]
+    assert page_keys == sorted(page_keys)
+
+
+def test_activity_fields_query(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    session.add_all([project, user])
+
+    activity_data = {
+        'description': u"Activity with a long description",
+        'project_id': project.id,
+        'user_id': user.id,
+    }
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, [activity_data])
+    assert response.status_int == 200
+    activity_id = response.json[0]['id']
+
+    # Save all SQL statements executed during requests
+    statements = []
+
+    def save_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = META.bind
+    event.listen(engine, 'before_cursor_execute', save_statement)
+    try:
+        params = {'fields': 'start,end'}
+        response = request_helper.get_json(url, params=params)
+        assert response.status_int == 200
+        for item in response.json:
+            assert sorted(item.keys()) == ['end', 'id', 'start']
+
+        # Fields should also be used for member requests
+        member_url = ActivityResource.get_member_path(activity_id)
+        response = request_helper.get_json(member_url, params=params)
+        assert response.status_int == 200
+        assert sorted(response.json.keys()) == ['end', 'id', 'start']
+    finally:
+        event.remove(engine, 'before_cursor_execute', save_statement)
+
+    # Description column should not be selected from database
+    # (conditional GET version queries are skipped)
+    activity_statements = [
+        statement for statement in statements
+        if 'FROM time_activity' in statement and 'coalesce' not in statement
+    ]
+    assert len(activity_statements) == 2
+    for statement in activity_statements:
+        assert 'time_activity.start' in statement
+        assert 'time_activity.description' not in statement
+
+    # When a field is not a column all fields are loaded
+    params = {'fields': 'description,unknown'}
+    response = request_helper.get_json(member_url, params=params)
+    assert response.status_int == 200
+    assert response.json == {
+        'id': activity_id,
+        'description': activity_data['description'],
+    }
+
+
+def test_activity_bulk_create(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    session.add_all([project, user])
+
+    activity_data = []
+    for index in range(300):
+        activity_data.append({
+            'description': u"Bulk activity {}".format(index),
+            'project_id': project.id,
+            'user_id': user.id,
+        })
+
+    # Save all INSERT statements executed during requests
+    statements = []
+
+    def save_statement(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO time_activity'):
+            statements.append(statement)
+
+    url = ActivityResource.get_collection_path()
+    engine = META.bind
+    event.listen(engine, 'before_cursor_execute', save_statement)
+    try:
+        response = request_helper.post_json(url, activity_data)
+    finally:
+        event.remove(engine, 'before_cursor_execute', save_statement)
+
+    assert response.status_int == 200
+    # Activities should be inserted using a few statements
+    assert 0 < len(statements) < 10
+    # Created activities should be returned in the same order
+    assert len(response.json) == len(activity_data)
+    id_list = [item['id'] for item in response.json]
+    assert len(set(id_list)) == len(id_list)
+    for (item, data) in zip(response.json, activity_data):
+        assert item['description'] == data['description']
+        # Column default values should be inserted
+        assert item['start']
+        assert item['activity_type'] == 'unassigned'
+
+    # Bulk creation can be disabled using an HTTP header
+    headers = {'X-Bulk-Create': 'false'}
+    response = request_helper.post_json(
+        url,
+        activity_data[:2],
+        headers=headers,
+    )
+    assert response.status_int == 200
+    assert len(response.json) == 2
+    assert response.json[0]['id'] > max(id_list)
+
+
+def test_activity_bulk_update(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    session.add_all([project, user])
+
+    activity_data = []
+    for index in range(100):
+        activity_data.append({
+            'description': u"Activity {}".format(index),
+            'project_id': project.id,
+            'user_id': user.id,
+        })
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, activity_data)
+    assert response.status_int == 200
+    id_list = [item['id'] for item in response.json]
+
+    # Update descriptions for all activities, and type for some of them
+    update_data = []
+    for pk_value in id_list:
+        data = {
+            'id': pk_value,
+            'description': u"New {}".format(pk_value),
+            'user_id': user.id,
+        }
+        if pk_value % 2:
+            data['activity_type'] = 'working'
+
+        update_data.append(data)
+
+    # Add an activity that does not exist
+    update_data.append({
+        'id': max(id_list) + 1000,
+        'description': u"None",
+        'user_id': user.id,
+    })
+
+    # Save all UPDATE statements executed during requests
+    statements = []
+
+    def save_statement(conn, cursor, statement, *args):
+        if statement.startswith('UPDATE time_activity'):
+            statements.append(statement)
+
+    engine = META.bind
+    event.listen(engine, 'before_cursor_execute', save_statement)
+    try:
+        response = request_helper.put_json(url, update_data)
+    finally:
+        event.remove(engine, 'before_cursor_execute', save_statement)
+
+    assert response.status_int == 200
+    # Count should be the number of updated rows
+    assert response.json['info']['count'] == len(id_list)
+    # Activities that update the same fields are updated together
+    assert 2 <= len(statements) < 10
+
+    params = {'id': id_list}
+    response = request_helper.get_json(url, params=params)
+    assert response.status_int == 200
+    assert len(response.json) == len(id_list)
+    for item in response.json:
+        assert item['description'] == u"New {}".format(item['id'])
+        if item['id'] % 2:
+            assert item['activity_type'] == 'working'
+        else:
+            assert item['activity_type'] == 'unassigned'
+
+
+def test_activity_tag_action(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    session.add_all([project, user])
+
+    activity_data = []
+    for index in range(5):
+        activity_data.append({
+            'description': u"Tagged activity {}".format(index),
+            'project_id': project.id,
+            'user_id': user.id,
+        })
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, activity_data)
+    assert response.status_int == 200
+    activity_ids = [item['id'] for item in response.json]
+
+    tags_data = [
+        {'name': u"Bulk 1", 'tag_type': TAG.activity.value, 'user_id': user.id},
+        {'name': u"Bulk 2", 'tag_type': TAG.activity.value, 'user_id': user.id},
+    ]
+    response = request_helper.post_json(
+        TagResource.get_collection_path(),
+        tags_data,
+    )
+    assert response.status_int == 200
+    tag_ids = [tag['id'] for tag in response.json]
+
+    # Add first tag to first activity before adding all tags
+    member_url = ActivityResource.get_member_path(activity_ids[0])
+    response = request_helper.post_json(member_url + '@add-tags', tag_ids[:1])
+    assert response.status_int == 200
+
+    # Add all tags to all activities
+    tag_url = url + '@tag'
+    data = {'activities': activity_ids, 'tags': tag_ids + [9999]}
+    response = request_helper.post_json(tag_url, data)
+    assert response.status_int == 200
+    # Tags that activities already have should not be added
+    count = len(activity_ids) * len(tag_ids) - 1
+    assert response.json['info']['count'] == count
+    # Adding tags again should not add anything
+    response = request_helper.post_json(tag_url, data)
+    assert response.status_int == 200
+    assert response.json['info']['count'] == 0
+
+    for activity_id in activity_ids:
+        related_url = ActivityResource.get_related_path(activity_id, 'tags')
+        response = request_helper.get_json(related_url)
+        assert response.status_int == 200
+        assert sorted(tag['id'] for tag in response.json) == tag_ids
+
+    # Remove first tag from all activities
+    data = {'activities': activity_ids, 'tags': tag_ids[:1]}
+    response = request_helper.delete_json(tag_url, data)
+    assert response.status_int == 200
+    assert response.json['info']['count'] == len(activity_ids)
+    related_url = ActivityResource.get_related_path(activity_ids[0], 'tags')
+    response = request_helper.get_json(related_url)
+    assert [tag['id'] for tag in response.json] == tag_ids[1:]
+
+    # Invalid data should not be accepted
+    response = request_helper.post_json(tag_url, {'activities': 1})
+    assert response.status_int == 400
+
+
+def test_activity_report(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    task = default_data.tasks.backend
+    user = default_data.users.dr_who
+    other_user = default_data.users.rick_castle
+    session.add_all([project, task, user, other_user])
+
+    # Create activities in two weeks of March and one in April
+    activity_data = []
+    for (user_id, start, hours) in (
+            (user.id, datetime(2014, 3, 3, 8, 0), 2),
+            (user.id, datetime(2014, 3, 3, 14, 0), 1),
+            (user.id, datetime(2014, 3, 11, 9, 0), 4),
+            (other_user.id, datetime(2014, 3, 9, 23, 0), 3),
+            (user.id, datetime(2014, 4, 1, 8, 0), 8)):
+        activity_data.append({
+            'description': u"Report activity",
+            'project_id': project.id,
+            'task_id': task.id,
+            'user_id': user_id,
+            'start': start.isoformat(),
+            'end': (start + timedelta(hours=hours)).isoformat(),
+        })
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, activity_data)
+    assert response.status_int == 200
+
+    # Without groups report has a single row with totals
+    report_url = url + '@report'
+    params = {'from': '2014-03-01T00:00:00', 'to': '2014-04-01T00:00:00'}
+    response = request_helper.get_json(report_url, params=params)
+    assert response.status_int == 200
+    assert response.json == {
+        'columns': ['seconds', 'count'],
+        'rows': [[10 * 3600, 4]],
+    }
+
+    params['group_by'] = 'user,week'
+    response = request_helper.get_json(report_url, params=params)
+    assert response.status_int == 200
+    assert response.json['columns'] == ['user_id', 'week', 'seconds', 'count']
+    assert response.json['rows'] == sorted([
+        [user.id, '2014-03-03', 3 * 3600, 2],
+        [user.id, '2014-03-10', 4 * 3600, 1],
+        [other_user.id, '2014-03-03', 3 * 3600, 1],
+    ])
+
+    # Activities can be filtered by user
+    params['group_by'] = 'month'
+    params['users'] = str(user.id)
+    del params['to']
+    response = request_helper.get_json(report_url, params=params)
+    assert response.status_int == 200
+    assert response.json['rows'] == [
+        ['2014-03-01', 7 * 3600, 3],
+        ['2014-04-01', 8 * 3600, 1],
+    ]
+
+    # User and project reports use the same arguments
+    params = {'group_by': 'project,task,day', 'from': '2014-03-03T00:00:00'}
+    user_url = UserResource.get_member_path(other_user.id) + '@report'
+    response = request_helper.get_json(user_url, params=params)
+    assert response.status_int == 200
+    assert response.json['rows'] == [
+        [project.id, task.id, '2014-03-09', 3 * 3600, 1],
+    ]
+    project_url = ProjectResource.get_member_path(project.id) + '@report'
+    params['group_by'] = 'activity_type'
+    response = request_helper.get_json(project_url, params=params)
+    assert response.status_int == 200
+    assert response.json['rows'] == [['unassigned', 18 * 3600, 5]]
+
+    # Invalid groups and dates are not allowed
+    for params in ({'group_by': 'invalid'},
+                   {'group_by': 'day,week'},
+                   {'from': '2014-03'}):
+        response = request_helper.get_json(report_url, params=params)
+        assert response.status_int == 400
+        assert response.json['error']['code'] == 'INVALID_REPORT'
+
+
+def test_activity_report_rollup(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    task = default_data.tasks.backend
+    user = default_data.users.dr_who
+    session.add_all([project, task, user])
+    (project_id, task_id, user_id) = (project.id, task.id, user.id)
+
+    activity_data = []
+    for (start, hours) in ((datetime(2014, 3, 3, 8, 0), 2),
+                           (datetime(2014, 3, 3, 14, 0), 1),
+                           (datetime(2014, 3, 4, 9, 0), 4)):
+        activity_data.append({
+            'description': u"Rollup activity",
+            'project_id': project_id,
+            'user_id': user_id,
+            'start': start.isoformat(),
+            'end': (start + timedelta(hours=hours)).isoformat(),
+        })
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, activity_data)
+    assert response.status_int == 200
+    activity_ids = [item['id'] for item in response.json]
+
+    # Change activities to move totals between days and tasks
+    member_url = ActivityResource.get_member_path(activity_ids[0])
+    data = dict(activity_data[0], start='2014-03-05T08:00:00')
+    data['end'] = '2014-03-05T09:30:00'
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 200
+    response = request_helper.put_json(url, [{
+        'id': activity_ids[2],
+        'description': u"Rollup activity",
+        'task_id': task_id,
+        'user_id': user_id,
+    }])
+    assert response.status_int == 200
+    member_url = ActivityResource.get_member_path(activity_ids[1])
+    response = request_helper.delete_json(member_url)
+    assert response.status_int == 200
+
+    def get_report_rows(use_rollup):
+        report = ActivityReport(
+            group_by=['user', 'project', 'task', 'activity_type', 'day'],
+            user_id_list=[user_id],
+            use_rollup=use_rollup,
+        )
+        assert report.is_rollup_report == use_rollup
+        return report.get_rows(session)
+
+    # Daily totals are the same as the ones computed from activities
+    rows = get_report_rows(False)
+    assert rows == [
+        [user_id, project_id, None, 'unassigned', '2014-03-05', 5400, 1],
+        [user_id, project_id, task_id, 'unassigned', '2014-03-04', 14400, 1],
+    ]
+    assert get_report_rows(True) == rows
+
+    # Totals can also be computed again for all activities
+    session.execute(activity_rollup_table.delete())
+    assert get_report_rows(True) == []
+    assert rebuild_rollup(session, chunk_size=1) == 1
+    assert get_report_rows(True) == rows
+
+    # Totals are replaced for each chunk of users
+    assert rebuild_rollup(session, chunk_size=1) == 1
+    assert get_report_rows(True) == rows
+
+
+def test_activity_report_cache(request_helper, default_data, session):
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    other_user = default_data.users.rick_castle
+    session.add_all([project, user, other_user])
+    (project_id, user_id, other_user_id) = (project.id, user.id, other_user.id)
+    REPORT_CACHE.clear()
+    REPORT_CACHE.reset_stats()
+
+    def get_activity_data(user_id, start, hours=1):
+        return {
+            'description': u"Cached activity",
+            'project_id': project_id,
+            'user_id': user_id,
+            'start': start.isoformat(),
+            'end': (start + timedelta(hours=hours)).isoformat(),
+        }
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, [
+        get_activity_data(user_id, datetime(2014, 3, 3, 8, 0)),
+    ])
+    assert response.status_int == 200
+    activity_id = response.json[0]['id']
+
+    # Same report arguments in any order use the same cached report
+    report_url = UserResource.get_member_path(user_id) + '@report'
+    params = {'group_by': 'day', 'from': '2014-03-01T00:00:00'}
+    response = request_helper.get_json(report_url, params=params)
+    assert response.json['rows'] == [['2014-03-03', 3600, 1]]
+    params = {'from': '2014-03-01T00:00:00', 'group_by': 'day'}
+    response = request_helper.get_json(report_url, params=params)
+    assert response.json['rows'] == [['2014-03-03', 3600, 1]]
+    assert len(REPORT_CACHE) == 1
+    stats = REPORT_CACHE.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['memory'] > 0
+
+    # Activities of other users or out of report dates don't
+    # remove cached reports
+    response = request_helper.post_json(url, [
+        get_activity_data(other_user_id, datetime(2014, 3, 3, 9, 0)),
+        get_activity_data(user_id, datetime(2014, 2, 28, 9, 0)),
+    ])
+    assert response.status_int == 200
+    assert len(REPORT_CACHE) == 1
+
+    # Changing an activity of the user removes cached report
+    member_url = ActivityResource.get_member_path(activity_id)
+    data = get_activity_data(user_id, datetime(2014, 3, 4, 8, 0), hours=2)
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 200
+    assert len(REPORT_CACHE) == 0
+    response = request_helper.get_json(report_url, params=params)
+    assert response.json['rows'] == [['2014-03-04', 7200, 1]]
+
+    # Reports for the days before an activity changes are also removed
+    report = ActivityReport(
+        group_by=['day'],
+        from_date=datetime(2014, 3, 4),
+        to_date=datetime(2014, 3, 5),
+        user_id_list=[user_id],
+    )
+    rows = REPORT_CACHE.get_report_data(report, session)['rows']
+    assert rows == [['2014-03-04', 7200, 1]]
+    assert len(REPORT_CACHE) == 2
+    data = get_activity_data(user_id, datetime(2014, 3, 3, 10, 0))
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 200
+    assert len(REPORT_CACHE) == 0
+
+    response = request_helper.get_json(url + '@report-cache')
+    assert response.status_int == 200
+    assert response.json['hit_ratio'] == REPORT_CACHE.stats()['hit_ratio']
+
+
+def test_activity_report_local_dates(request_helper, default_data, session):
+    """
+    Test that reports group activities by the local dates of their users.
+
+    """
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    other_user = default_data.users.rick_castle
+    session.add_all([project, user, other_user])
+    (project_id, user_id, other_user_id) = (project.id, user.id, other_user.id)
+    REPORT_CACHE.clear()
+
+    def get_activity_data(user_id, start, hours=1):
+        return {
+            'description': u"Local activity",
+            'project_id': project_id,
+            'user_id': user_id,
+            'start': start.isoformat(),
+            'end': (start + timedelta(hours=hours)).isoformat(),
+        }
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, [
+        get_activity_data(user_id, datetime(2014, 3, 3, 23, 30)),
+        get_activity_data(user_id, datetime(2014, 3, 30, 22, 30), hours=2),
+        get_activity_data(other_user_id, datetime(2014, 3, 3, 23, 30)),
+    ])
+    assert response.status_int == 200
+
+    # Time zones must be valid time zone names
+    member_url = UserResource.get_member_path(user_id)
+    data = request_helper.get_json(member_url).json
+    data['timezone'] = u'Europe/Nowhere'
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 400
+    data['timezone'] = u'Europe/Vienna'
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 200
+    assert response.json['timezone'] == u'Europe/Vienna'
+
+    # Vienna is UTC+1 in winter and UTC+2 after March 30
+    rows = sorted([
+        [user_id, '2014-03-04', 3600, 1],
+        [user_id, '2014-03-31', 7200, 1],
+        [other_user_id, '2014-03-03', 3600, 1],
+    ])
+    engines = ['sql']
+    if analytics.is_available():
+        engines.append('numpy')
+
+    for engine in engines:
+        report = ActivityReport(
+            group_by=['user', 'day'],
+            use_rollup=True,
+            use_snapshots=True,
+            use_local_dates=True,
+            engine=engine,
+        )
+        assert report.get_rows(session) == rows
+        assert report.local_dates
+        assert not report.is_rollup_report
+
+        # Report dates are local dates
+        report = ActivityReport(
+            group_by=['week'],
+            from_date=datetime(2014, 3, 4),
+            to_date=datetime(2014, 3, 31),
+            user_id_list=[user_id],
+            use_local_dates=True,
+            engine=engine,
+        )
+        assert report.get_rows(session) == [['2014-03-03', 3600, 1]]
+
+    # UTC dates are used when local dates are not enabled
+    report = ActivityReport(group_by=['user', 'day'], user_id_list=[user_id])
+    assert report.get_rows(session) == [
+        [user_id, '2014-03-03', 3600, 1],
+        [user_id, '2014-03-30', 7200, 1],
+    ]
+
+    # Reports for UTC users don't need time zone offsets
+    report = ActivityReport(
+        group_by=['day'],
+        user_id_list=[other_user_id],
+        use_local_dates=True,
+    )
+    assert report.get_rows(session) == [['2014-03-03', 3600, 1]]
+    assert not report.local_dates
+
+    # Changing a user removes its cached reports
+    report = ActivityReport(
+        group_by=['day'],
+        user_id_list=[user_id],
+        use_local_dates=True,
+    )
+    REPORT_CACHE.get_report_data(report, session)
+    assert len(REPORT_CACHE) == 1
+    data['timezone'] = u'America/New_York'
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 200
+    assert len(REPORT_CACHE) == 0
+    report = ActivityReport(
+        group_by=['day'],
+        user_id_list=[user_id],
+        use_local_dates=True,
+    )
+    assert report.get_rows(session) == [
+        ['2014-03-03', 3600, 1],
+        ['2014-03-30', 7200, 1],
+    ]
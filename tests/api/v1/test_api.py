@@ -1,11 +1,19 @@
 import pytest
 
 from pyramid.testing import DummyRequest
+from sqlalchemy import event
 
+from sandglass.time.api import API
 from sandglass.time.api import ApiDescribeResource
 from sandglass.time.api import ApiManager
 from sandglass.time.api.error import APIError
+from sandglass.time.api.v1 import ApiV1DescribeResource
+from sandglass.time.api.v1.project import ProjectResource
 from sandglass.time.api.v1.user import UserResource
+from sandglass.time.describe.cache import DESCRIPTIONS
+from sandglass.time.describe.resource import ModelResourceDescriber
+from sandglass.time.models import META
+from sandglass.time.models.permission import PERMISSIONS
 from sandglass.time.request import rest_collection_mode
 from sandglass.time.resource.base import BaseResource
 from sandglass.time.utils import get_settings
@@ -151,3 +159,82 @@ def test_api_describe(request_helper):
     assert 'resources' in response.json
     assert isinstance(response.json['resources'], list)
     assert len(response.json['resources'])
+
+
+@pytest.mark.usefixtures('default_data')
+def test_api_describe_cache(request_helper, monkeypatch):
+    """
+    Test that API descriptions are served from the descriptions cache.
+
+    """
+    # Descriptions are computed when application is created
+    assert DESCRIPTIONS.versions['v1']['api']
+    assert 'users' in DESCRIPTIONS.versions['v1']['resources']
+
+    def describe_fail(self):
+        raise AssertionError("Description was not cached")
+
+    monkeypatch.setattr(ModelResourceDescriber, 'describe', describe_fail)
+    monkeypatch.setattr(ApiV1DescribeResource, 'describe', describe_fail)
+
+    for url in ('/time/api/v1/@describe', '/time/api/v1/users/@describe'):
+        response = request_helper.get_json(url)
+        assert response.status_int == 200
+        assert isinstance(response.json, dict)
+        etag = response.etag
+        assert etag
+
+        # Clients can revalidate cached descriptions
+        headers = {'If-None-Match': '"{}"'.format(etag)}
+        response = request_helper.get_json(url, headers=headers)
+        assert response.status_int == 304
+
+        # JSONP callbacks are supported like in the JSON renderer
+        response = request_helper.get_json(url, params={'callback': 'cb'})
+        assert response.content_type == 'application/javascript'
+        assert response.body.startswith('cb({')
+        assert response.body.endswith('});')
+
+    # Cached descriptions are serialized like uncached ones
+    url = '/time/api/v1/users/@describe'
+    cached_body = request_helper.get_json(url).body
+    monkeypatch.undo()
+    monkeypatch.setattr(API, 'get_resource_version', lambda *args: None)
+    assert request_helper.get_json(url).body == cached_body
+
+
+def test_api_authenticated_user_queries(request_helper, default_data, session):
+    """
+    Test that authenticated user is loaded with a single query.
+
+    """
+    # Save all SQL statements executed during request
+    statements = []
+
+    def save_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    user = default_data.users.dr_who
+    session.add(user)
+
+    # Project filters check user groups and permissions
+    request_helper.auth_as_user(user)
+    # Build permission matrix before the request
+    PERMISSIONS.matrix
+    url = ProjectResource.get_collection_path()
+    engine = META.bind
+    event.listen(engine, 'before_cursor_execute', save_statement)
+    try:
+        response = request_helper.get_json(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', save_statement)
+
+    assert response.status_int == 200
+    # Visible project IDs are getted with a separate query
+    user_statements = [
+        statement for statement in statements
+        if 'time_project' not in statement and (
+            'time_user' in statement or 'time_group' in statement
+        )
+    ]
+    assert len(user_statements) == 1
@@ -1,5 +1,9 @@
+from sqlalchemy import event
+
+from sandglass.time.api.v1.client import ClientResource
 from sandglass.time.api.v1.group import GroupResource
 from sandglass.time.api.v1.project import ProjectResource
+from sandglass.time.models import META
 
 TESTS_DATA = {
     'groups': [
@@ -312,3 +316,262 @@ def test_delete_related_by_objects(request_helper, default_data, session):
     id_list = [group['id'] for group in response.json]
     for value in delete_list:
         assert value['id'] not in id_list
+
+
+def test_get_collection_pages(request_helper, default_data):
+    """
+    Test getting a collection using keyset pagination.
+
+    """
+    url = ClientResource.get_collection_path()
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+    id_list = [client['id'] for client in response.json]
+    assert len(id_list) > 2
+
+    # Get all clients page by page
+    page_id_list = []
+    params = {'limit': 2}
+    while True:
+        response = request_helper.get_json(url, params=params)
+        assert response.status_int == 200
+        assert isinstance(response.json, dict)
+        items = response.json['items']
+        assert len(items) <= 2
+        page_id_list.extend([client['id'] for client in items])
+        if not response.json['next']:
+            break
+
+        params['after'] = response.json['next']
+
+    # Pages should contain all clients sorted by ID
+    assert page_id_list == sorted(id_list)
+
+    # Pagination should work together with query filters
+    params = {'limit': 1, 'id': id_list[:2]}
+    response = request_helper.get_json(url, params=params)
+    assert response.status_int == 200
+    assert len(response.json['items']) == 1
+    params['after'] = response.json['next']
+    response = request_helper.get_json(url, params=params)
+    assert response.status_int == 200
+    assert len(response.json['items']) == 1
+    assert response.json['next'] is None
+
+    # Invalid pagination arguments should return an error
+    for params in ({'limit': 'INVALID'}, {'limit': 1, 'after': 'INVALID'}):
+        response = request_helper.get_json(url, params=params)
+        assert response.status_int == 400
+        assert response.json['error']['code'] == 'INVALID_PAGINATION'
+
+
+def test_get_collection_stream(request_helper, default_data, monkeypatch):
+    """
+    Test getting a collection streamed to the response.
+
+    """
+    # Use small chunks to stream collection in many chunks
+    monkeypatch.setattr(ClientResource, 'stream_chunk_size', 2)
+    monkeypatch.setattr(GroupResource, 'stream_chunk_size', 1)
+
+    url = ClientResource.get_collection_path()
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+    client_list = response.json
+    assert len(client_list) > 2
+
+    # Streamed collection should be the same as a non streamed one
+    response = request_helper.get_json(url, params={'stream': 'true'})
+    assert response.status_int == 200
+    assert response.content_type == 'application/json'
+    assert response.json == client_list
+
+    # Streaming should also work with returned fields and filters
+    params = {'stream': '1', 'fields': 'name', 'id': client_list[0]['id']}
+    response = request_helper.get_json(url, params=params)
+    assert response.status_int == 200
+    assert response.json == [
+        {'id': client_list[0]['id'], 'name': client_list[0]['name']},
+    ]
+
+    # Check streaming when related objects are included
+    url = GroupResource.get_collection_path()
+    params = {'include': 'users__pk'}
+    response = request_helper.get_json(url, params=params)
+    assert response.status_int == 200
+    group_list = response.json
+    assert len(group_list) > 1
+    params['stream'] = 'true'
+    response = request_helper.get_json(url, params=params)
+    assert response.status_int == 200
+    assert response.json == group_list
+
+    # Check that streaming supports JSONP
+    params = {'stream': 'true', 'callback': 'test'}
+    response = request_helper.get_json(url, params=params)
+    assert response.status_int == 200
+    assert response.content_type == 'application/javascript'
+    assert response.body.startswith('test([')
+    assert response.body.endswith(']);')
+
+
+def test_related_bulk_statements(request_helper, default_data, session):
+    """
+    Test that related objects are added and removed without loading them.
+
+    """
+    project = default_data.projects.public_project
+    session.add(project)
+    groups_url = ProjectResource.get_related_path(project.id, 'groups')
+    response = request_helper.get_json(groups_url)
+    assert response.status_int == 200
+    group_id_list = [group['id'] for group in response.json]
+    assert group_id_list
+
+    # Save all SQL statements executed during requests
+    statements = []
+
+    def save_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = META.bind
+    event.listen(engine, 'before_cursor_execute', save_statement)
+    try:
+        response = request_helper.delete_json(groups_url, group_id_list)
+        assert response.status_int == 200
+        assert response.json['info']['count'] == len(group_id_list)
+        response = request_helper.put_json(groups_url, group_id_list * 2)
+        assert response.status_int == 200
+        assert response.json['info']['count'] == len(group_id_list)
+    finally:
+        event.remove(engine, 'before_cursor_execute', save_statement)
+
+    # Groups should be removed and added using a single statement
+    delete_statements = [
+        statement for statement in statements
+        if statement.startswith('DELETE FROM time_group_project')
+    ]
+    assert len(delete_statements) == 1
+    insert_statements = [
+        statement for statement in statements
+        if statement.startswith('INSERT') and
+        'INTO time_group_project' in statement
+    ]
+    assert len(insert_statements) == 1
+    # Project group objects should not be loaded
+    for statement in statements:
+        if 'time_group_project' in statement:
+            assert 'time_group.name' not in statement
+
+    # Duplicated IDs should be related only once
+    response = request_helper.get_json(groups_url)
+    assert response.status_int == 200
+    assert sorted(group['id'] for group in response.json) == group_id_list
+
+    # Adding objects that are already related is ignored
+    response = request_helper.put_json(groups_url, group_id_list)
+    assert response.status_int == 200
+    assert response.json['info']['count'] == len(group_id_list)
+    response = request_helper.get_json(groups_url)
+    assert sorted(group['id'] for group in response.json) == group_id_list
+
+    # Check adding and removing objects for one to many relationships
+    client = default_data.clients.client2
+    project = default_data.projects.public_project
+    session.add_all([client, project])
+    projects_url = ClientResource.get_related_path(client.id, 'projects')
+    response = request_helper.delete_json(projects_url, [project.id])
+    assert response.status_int == 200
+    response = request_helper.get_json(projects_url)
+    assert project.id not in [item['id'] for item in response.json]
+    response = request_helper.put_json(projects_url, [project.id])
+    assert response.status_int == 200
+    assert response.json['info']['count'] == 1
+    response = request_helper.get_json(projects_url)
+    assert project.id in [item['id'] for item in response.json]
+
+
+def test_conditional_get(request_helper, default_data):
+    """
+    Check that GET requests return "304 Not Modified" responses
+    when client cached version is still valid.
+
+    """
+    url = ClientResource.get_collection_path()
+    response = request_helper.post_json(url, [{'name': u"Mycroft Holmes"}])
+    assert response.status_int == 200
+    client_id = response.json[0]['id']
+
+    # Member responses have cache validation headers
+    member_url = ClientResource.get_member_path(client_id)
+    response = request_helper.get_json(member_url)
+    assert response.status_int == 200
+    etag = response.etag
+    last_modified = response.headers['Last-Modified']
+    assert etag
+    assert 'must-revalidate' in response.headers['Cache-Control']
+    assert 'Authorization' in response.headers['Vary']
+
+    headers = {'If-None-Match': '"{}"'.format(etag)}
+    response = request_helper.get_json(member_url, headers=headers)
+    assert response.status_int == 304
+    assert response.etag == etag
+    assert not response.body
+
+    headers = {'If-Modified-Since': last_modified}
+    response = request_helper.get_json(member_url, headers=headers)
+    assert response.status_int == 304
+
+    # A different returned fields argument gives a different ETag
+    response = request_helper.get_json(
+        member_url,
+        params={'fields': 'name'},
+        headers={'If-None-Match': '"{}"'.format(etag)},
+    )
+    assert response.status_int == 200
+    assert response.json == {'id': client_id, 'name': u"Mycroft Holmes"}
+
+    # Collection responses only use ETags
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+    collection_etag = response.etag
+    assert collection_etag
+    assert 'Last-Modified' not in response.headers
+
+    headers = {'If-None-Match': '"{}"'.format(collection_etag)}
+    response = request_helper.get_json(url, headers=headers)
+    assert response.status_int == 304
+
+    # Collection pages and streams don't compute a collection version
+    for params in ({'limit': 10}, {'stream': 'true'}):
+        response = request_helper.get_json(
+            url,
+            params=params,
+            headers=headers,
+        )
+        assert response.status_int == 200
+        assert response.etag is None
+
+    # Updating the client changes member and collection ETags
+    data = {'name': u"Sherlock Holmes"}
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 200
+
+    headers = {'If-None-Match': '"{}"'.format(etag)}
+    response = request_helper.get_json(member_url, headers=headers)
+    assert response.status_int == 200
+    assert response.json['name'] == u"Sherlock Holmes"
+    assert response.etag != etag
+
+    headers = {'If-None-Match': '"{}"'.format(collection_etag)}
+    response = request_helper.get_json(url, headers=headers)
+    assert response.status_int == 200
+    assert response.etag != collection_etag
+
+    # Deleting a client changes collection ETag
+    collection_etag = response.etag
+    response = request_helper.delete_json(member_url)
+    assert response.status_int == 200
+    headers = {'If-None-Match': '"{}"'.format(collection_etag)}
+    response = request_helper.get_json(url, headers=headers)
+    assert response.status_int == 200
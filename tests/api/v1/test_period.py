@@ -0,0 +1,173 @@
+from datetime import datetime
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from sandglass.time.api.v1.activity import ActivityResource
+from sandglass.time.api.v1.period import PeriodResource
+from sandglass.time.api.v1.user import UserResource
+from sandglass.time.models.period import activity_snapshot_table
+from sandglass.time.reports.activity import ActivityReport
+from sandglass.time.reports.rollup import get_lock_users_statement
+
+
+def get_snapshot_seconds(session):
+    table = activity_snapshot_table
+    statement = select([func.sum(table.c.seconds)])
+    return session.execute(statement).scalar()
+
+
+def test_period_close_and_open(request_helper, default_data, session):
+    """
+    Test that activities of closed periods can't be changed.
+
+    """
+    project = default_data.projects.public_project
+    user = default_data.users.dr_who
+    developers = default_data.groups.developer
+    session.add_all([project, user, developers])
+    (project_id, user_id, group_id) = (project.id, user.id, developers.id)
+
+    def get_activity_data(start, hours=1):
+        return {
+            'description': u"Period activity",
+            'project_id': project_id,
+            'user_id': user_id,
+            'start': start.isoformat(),
+            'end': (start + timedelta(hours=hours)).isoformat(),
+        }
+
+    url = ActivityResource.get_collection_path()
+    response = request_helper.post_json(url, [
+        get_activity_data(datetime(2014, 3, 3, 8, 0), hours=2),
+        get_activity_data(datetime(2014, 3, 31, 20, 0), hours=1),
+        get_activity_data(datetime(2014, 4, 1, 8, 0), hours=4),
+    ])
+    assert response.status_int == 200
+    activity_ids = [item['id'] for item in response.json]
+
+    # Close March for the user
+    periods_url = PeriodResource.get_collection_path()
+    response = request_helper.post_json(periods_url, [{
+        'start': '2014-03-01',
+        'end': '2014-04-01',
+        'user_id': user_id,
+    }])
+    assert response.status_int == 200
+    period_id = response.json[0]['id']
+    assert get_snapshot_seconds(session) == 3 * 3600
+
+    # Activities can't be changed from or into closed periods
+    member_url = ActivityResource.get_member_path(activity_ids[0])
+    data = get_activity_data(datetime(2014, 4, 2, 8, 0))
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 400
+    assert response.json['error']['code'] == 'PERIOD_CLOSED'
+    assert response.json['error']['details'] == ['2014-03-03']
+    member_url = ActivityResource.get_member_path(activity_ids[2])
+    data = get_activity_data(datetime(2014, 3, 30, 8, 0))
+    response = request_helper.put_json(member_url, data)
+    assert response.json['error']['code'] == 'PERIOD_CLOSED'
+    response = request_helper.post_json(url, [
+        get_activity_data(datetime(2014, 3, 4, 8, 0)),
+    ])
+    assert response.json['error']['code'] == 'PERIOD_CLOSED'
+    member_url = ActivityResource.get_member_path(activity_ids[1])
+    response = request_helper.delete_json(member_url)
+    assert response.json['error']['code'] == 'PERIOD_CLOSED'
+
+    # Activities of open days can be changed
+    member_url = ActivityResource.get_member_path(activity_ids[2])
+    data = get_activity_data(datetime(2014, 4, 2, 8, 0), hours=3)
+    response = request_helper.put_json(member_url, data)
+    assert response.status_int == 200
+
+    # Periods can't overlap closed periods of their users
+    for data in ({'start': '2014-03-31', 'end': '2014-04-30',
+                  'group_id': group_id},
+                 {'start': '2014-05-01', 'end': '2014-05-01'}):
+        response = request_helper.post_json(periods_url, [data])
+        assert response.status_int == 400
+        assert response.json['error']['code'] == 'INVALID_PERIOD'
+
+    # Periods are not opened when their update fails
+    period_url = PeriodResource.get_member_path(period_id)
+    response = request_helper.put_json(period_url, {
+        'start': '2014-04-01',
+        'end': '2014-03-01',
+        'user_id': user_id,
+    })
+    assert response.status_int == 400
+    assert response.json['error']['code'] == 'INVALID_PERIOD'
+    assert get_snapshot_seconds(session) == 3 * 3600
+    member_url = ActivityResource.get_member_path(activity_ids[1])
+    response = request_helper.delete_json(member_url)
+    assert response.json['error']['code'] == 'PERIOD_CLOSED'
+
+    # Reports merge frozen totals with the days that are not closed
+    rows = [
+        ['2014-03-03', 2 * 3600, 1],
+        ['2014-03-31', 3600, 1],
+        ['2014-04-02', 3 * 3600, 1],
+    ]
+    for use_rollup in (False, True):
+        report = ActivityReport(
+            group_by=['day'],
+            user_id_list=[user_id],
+            use_rollup=use_rollup,
+            use_snapshots=True,
+        )
+        assert report.is_snapshot_report
+        assert report.get_rows(session) == rows
+
+    # Closed days are not computed again from activities
+    table = activity_snapshot_table
+    session.execute(table.update().values(seconds=table.c.seconds + 60))
+    assert report.get_rows(session)[0] == ['2014-03-03', 2 * 3600 + 60, 1]
+    session.execute(table.update().values(seconds=table.c.seconds - 60))
+
+    # Closed reports can be cached by clients
+    report_url = UserResource.get_member_path(user_id) + '@report'
+    params = {
+        'group_by': 'week',
+        'from': '2014-03-01T00:00:00',
+        'to': '2014-04-01T00:00:00',
+    }
+    response = request_helper.get_json(report_url, params=params)
+    assert response.status_int == 200
+    assert response.cache_control.max_age == 86400
+    headers = {'If-None-Match': response.etag}
+    response = request_helper.get_json(
+        report_url,
+        params=params,
+        headers=headers,
+    )
+    assert response.status_int == 304
+    params['to'] = '2014-04-02T00:00:00'
+    response = request_helper.get_json(report_url, params=params)
+    assert response.status_int == 200
+    assert response.cache_control.max_age is None
+
+    # Opening a period again allows to change its activities
+    response = request_helper.delete_json(
+        PeriodResource.get_member_path(period_id),
+    )
+    assert response.status_int == 200
+    assert get_snapshot_seconds(session) is None
+    member_url = ActivityResource.get_member_path(activity_ids[1])
+    response = request_helper.delete_json(member_url)
+    assert response.status_int == 200
+
+
+def test_period_lock_users():
+    """
+    Test that users are locked while periods are closed.
+
+    """
+    dialect = postgresql.dialect()
+    statement = get_lock_users_statement([2, 1])
+    assert str(statement.compile(dialect=dialect)).endswith('FOR UPDATE')
+    statement = get_lock_users_statement([2, 1], read=True)
+    assert str(statement.compile(dialect=dialect)).endswith('FOR SHARE')
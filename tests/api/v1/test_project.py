@@ -1,6 +1,11 @@
+import pytest
+
+from pyramid.exceptions import NotFound
+
 from sandglass.time.api.v1.group import GroupResource
 from sandglass.time.api.v1.project import ProjectResource
 from sandglass.time.models.permission import Permission
+from sandglass.time.models.project import VISIBLE_PROJECTS
 
 
 def test_project_create_single(request_helper, default_data, session):
@@ -14,6 +19,9 @@ def test_project_create_single(request_helper, default_data, session):
     url = ProjectResource.get_collection_path()
     project_data = dict(project)
     project_data['id'] = None
+    # Timestamps are set by the server
+    del project_data['created']
+    del project_data['modified']
     response = request_helper.post_json(url, [project_data])
     # All post to collection returns a collection
     assert isinstance(response.json, list)
@@ -100,3 +108,85 @@ def test_project_private_query_filter(request_helper, default_data, session):
     assert response.status == '200 OK'
     assert isinstance(response.json, list)
     assert admin_visible_count == len(response.json)
+
+
+def test_project_visible_groups_filter(request_helper, default_data, session):
+    """
+    Test that private projects shared with a group are visible
+    for the users of the group.
+
+    """
+    user = default_data.users.dr_who
+    project = default_data.projects.private_project
+    group = default_data.groups.employee
+    session.add_all([user, project, group])
+    user_id = user.id
+    project_id = project.id
+    group_projects_url = GroupResource.get_related_path(group.id, 'projects')
+
+    url = ProjectResource.get_collection_path()
+    request_helper.auth_as_user(user)
+    response = request_helper.get_json(url)
+    assert response.status == '200 OK'
+    assert project_id not in [item['id'] for item in response.json]
+    # Visible projects are cached for the user
+    assert project_id not in VISIBLE_PROJECTS.get(user_id)[1]
+
+    # Share private project with a group of the user
+    request_helper.auth_as_admin()
+    response = request_helper.put_json(group_projects_url, [project_id])
+    assert response.status == '200 OK'
+    assert user_id not in VISIBLE_PROJECTS
+
+    # Private project is now visible for the user
+    request_helper.auth_as_user(user)
+    response = request_helper.get_json(url)
+    assert response.status == '200 OK'
+    assert project_id in [item['id'] for item in response.json]
+    assert project_id in VISIBLE_PROJECTS.get(user_id)[1]
+
+    # Cached IDs of processes that didn't make a change are not used
+    cached = VISIBLE_PROJECTS.get(user_id)
+    request_helper.auth_as_admin()
+    response = request_helper.delete_json(group_projects_url, [project_id])
+    assert response.status == '200 OK'
+    VISIBLE_PROJECTS.set(user_id, cached)
+    request_helper.auth_as_user(user)
+    response = request_helper.get_json(url)
+    assert project_id not in [item['id'] for item in response.json]
+    assert VISIBLE_PROJECTS.get(user_id)[0] == cached[0] + 1
+
+
+def test_project_private_report(request_helper, default_data, session):
+    """
+    Test that reports of private projects are only available
+    for users that can see the project.
+
+    """
+    user = default_data.users.dr_who
+    owner = default_data.users.shepherd_book
+    project = default_data.projects.private_project
+    public_project = default_data.projects.public_project
+    session.add_all([user, owner, project, public_project])
+    report_url = ProjectResource.get_member_path(project.id) + '@report'
+    public_report_url = (
+        ProjectResource.get_member_path(public_project.id) + '@report'
+    )
+    # User objects expire after each request
+    credentials = [(user.token, user.key), (owner.token, owner.key)]
+
+    (request_helper.auth_token, request_helper.auth_key) = credentials[0]
+    with pytest.raises(NotFound):
+        request_helper.get_json(report_url)
+
+    response = request_helper.get_json(public_report_url)
+    assert response.status_int == 200
+
+    # Reports are available for the owner and for administrators
+    (request_helper.auth_token, request_helper.auth_key) = credentials[1]
+    response = request_helper.get_json(report_url)
+    assert response.status_int == 200
+    assert response.json['rows'] == [[0, 0]]
+    request_helper.auth_as_admin()
+    response = request_helper.get_json(report_url)
+    assert response.status_int == 200
@@ -0,0 +1,114 @@
+import pytest
+
+from sandglass.time.api.v1.user import UserResource
+from sandglass.time.auth.token import TokenRevocations
+from sandglass.time.auth.token import TokenSigner
+from sandglass.time.models.group import Group
+from sandglass.time.security import Users
+
+
+@pytest.fixture(scope='function')
+def settings(settings):
+    # Use signed access tokens for authentication
+    settings = dict(settings)
+    settings['auth.policy'] = 'signed'
+    settings['auth.token_secret'] = 'test-secret'
+    return settings
+
+
+def get_bearer_header(access_token):
+    return {'Authorization': 'Bearer {}'.format(access_token)}
+
+
+def test_token_signer(default_data, session):
+    """
+    Test creation and validation of signed access tokens.
+
+    """
+    now = [1000.0]
+    revocations = TokenRevocations(timer=lambda: now[0])
+    signer = TokenSigner(
+        'secret',
+        max_age=60,
+        revocations=revocations,
+        timer=lambda: now[0],
+    )
+    token = signer.create_token(1, [u"time.Users"])
+    data = signer.parse_token(token)
+    assert data['uid'] == 1
+    assert data['p'] == [u"time.Users"]
+
+    # Tokens signed with other secrets are not valid
+    other_signer = TokenSigner('other', revocations=revocations)
+    assert other_signer.parse_token(token) is None
+    assert signer.parse_token('invalid') is None
+    assert signer.parse_token(token + 'x') is None
+
+    # Tokens are not valid after revocation or expiration
+    now[0] += 1
+    revocations.revoke([2])
+    assert signer.parse_token(token)
+    revocations.revoke([1])
+    assert signer.parse_token(token) is None
+
+    # Revocations are saved in database for all processes
+    other_revocations = TokenRevocations()
+    assert other_revocations.is_revoked(1, 1001.0)
+    assert not other_revocations.is_revoked(1, 1002.0)
+    assert other_revocations.is_revoked(999999, 1002.0)
+
+    now[0] += 1
+    token = signer.create_token(1, [])
+    assert signer.parse_token(token)
+    now[0] += 60
+    assert signer.parse_token(token) is None
+
+
+@pytest.mark.usefixtures('default_data')
+def test_access_token(request_helper, session):
+    """
+    Test authentication using signed access tokens.
+
+    """
+    # Exchange Basic auth credentials for an access token
+    token_url = UserResource.get_collection_path() + '@access-token'
+    response = request_helper.post_json(token_url)
+    assert response.status_int == 200
+    assert response.json['token_type'] == 'Bearer'
+    access_token = response.json['access_token']
+
+    # Basic auth is not used when signed tokens are enabled
+    url = UserResource.get_collection_path()
+    response = request_helper.get_json(url)
+    assert response.status_int == 401
+    assert response.headers['WWW-Authenticate'].startswith('Bearer')
+
+    request_helper.require_authorization = False
+    headers = get_bearer_header(access_token)
+    response = request_helper.get_json(url, headers=headers)
+    assert response.status_int == 200
+    assert isinstance(response.json, list)
+
+    # Invalid tokens are not authenticated
+    headers = get_bearer_header(access_token[:-1])
+    response = request_helper.get_json(url, headers=headers)
+    assert response.status_int == 401
+
+    # Tokens can also be getted using email and password
+    data = {'email': u"admin@sandglass.net", 'password': u"test"}
+    response = request_helper.post_json(token_url, data)
+    assert response.status_int == 200
+    assert response.json['access_token']
+
+    data['password'] = u"invalid"
+    response = request_helper.post_json(token_url, data)
+    assert response.status_int == 400
+
+    # Changing user groups revokes user access tokens
+    group = Group.query(session).filter_by(name=Users).one()
+    groups_url = UserResource.get_related_path(1, 'groups')
+    headers = get_bearer_header(access_token)
+    response = request_helper.put_json(groups_url, [group.id], headers=headers)
+    assert response.status_int == 200
+    response = request_helper.get_json(url, headers=headers)
+    assert response.status_int == 401
@@ -4,9 +4,18 @@ import pytest
 
 from pyramid.exceptions import NotFound
 from pyramid.httpexceptions import HTTPNotFound
+from sqlalchemy import event
 
 from sandglass.time.api.v1.activity import ActivityResource
 from sandglass.time.api.v1.user import UserResource
+from sandglass.time.auth.cache import AUTH_CACHE
+from sandglass.time.auth.cache import get_cache_key
+from sandglass.time.auth.token_filter import TOKEN_FILTER
+from sandglass.time.bloom import BloomFilter
+from sandglass.time.models import META
+from sandglass.time.models.group import Group
+from sandglass.time.security import Administrators
+from sandglass.time.security import Managers
 
 USER_DATA = [
     {
@@ -401,3 +410,135 @@ def test_user_activities(request_helper, default_data, session):
     url = UserResource.get_member_path(9999) + '@activities'
     with pytest.raises(HTTPNotFound):
         response = request_helper.get_json(url)
+
+
+def test_user_auth_cache(request_helper, default_data, session):
+    """
+    Test that user principals are cached between requests and
+    invalidated when user groups change.
+
+    """
+    user = default_data.users.dr_who
+    session.add(user)
+    user_id = user.id
+
+    AUTH_CACHE.clear()
+    AUTH_CACHE.reset_stats()
+    url = UserResource.get_member_path(user_id)
+    request_helper.auth_as_user(user)
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+    assert get_cache_key(user.token, user.key) in AUTH_CACHE
+    assert AUTH_CACHE.stats()['misses'] == 1
+
+    # Principals are getted from cache
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+    assert AUTH_CACHE.stats()['hits']
+
+    # Changing user groups removes user from cache
+    request_helper.auth_as_admin()
+    admin_group = Group.query(session).filter_by(name=Administrators).one()
+    groups_url = UserResource.get_related_path(user_id, 'groups')
+    response = request_helper.put_json(groups_url, [admin_group.id])
+    assert response.status_int == 200
+    assert get_cache_key(user.token, user.key) not in AUTH_CACHE
+
+    # Cache statistics are available for administrators
+    url = UserResource.get_collection_path() + '@auth-cache'
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+    assert response.json['hits'] == AUTH_CACHE.stats()['hits']
+
+
+def test_user_report_visibility(request_helper, default_data, session):
+    """
+    Test that users can only get their own report, unless
+    they can update users.
+
+    """
+    user = default_data.users.dr_who
+    other_user = default_data.users.rick_castle
+    manager = default_data.users.james_william_elliot
+    session.add_all([user, other_user, manager])
+    url = UserResource.get_member_path(user.id) + '@report'
+    other_url = UserResource.get_member_path(other_user.id) + '@report'
+    # User objects expire after each request
+    manager_credentials = (manager.token, manager.key)
+    groups_url = UserResource.get_related_path(manager.id, 'groups')
+    managers_group = Group.query(session).filter_by(name=Managers).one()
+    response = request_helper.put_json(groups_url, [managers_group.id])
+    assert response.status_int == 200
+
+    request_helper.auth_as_user(user)
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+    with pytest.raises(NotFound):
+        request_helper.get_json(other_url)
+
+    # Managers can update users, so they can get their reports
+    (request_helper.auth_token, request_helper.auth_key) = (
+        manager_credentials
+    )
+    response = request_helper.get_json(other_url)
+    assert response.status_int == 200
+    with pytest.raises(NotFound):
+        request_helper.get_json(
+            UserResource.get_member_path(999999) + '@report',
+        )
+
+
+def test_user_token_filter(request_helper, default_data, monkeypatch):
+    """
+    Test that unknown user tokens are rejected by the tokens filter.
+
+    """
+    monkeypatch.setattr(TOKEN_FILTER, 'enabled', True)
+    monkeypatch.setattr(TOKEN_FILTER, 'bloom', None)
+    monkeypatch.setattr(TOKEN_FILTER, 'built_at', 0)
+    TOKEN_FILTER.build()
+    url = UserResource.get_collection_path()
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+
+    # Save all SQL statements executed during request
+    statements = []
+
+    def save_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    request_helper.auth_token = 'unknown-token'
+    engine = META.bind
+    event.listen(engine, 'before_cursor_execute', save_statement)
+    try:
+        response = request_helper.get_json(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', save_statement)
+
+    # Unknown tokens are rejected without database queries
+    assert response.status_int == 401
+    assert not [stmt for stmt in statements if 'time_user' in stmt]
+    stats = TOKEN_FILTER.stats()
+    assert stats['rejected'] >= 1
+    assert stats['size'] >= 1
+
+    # Tokens of users created by current process are added when saved
+    request_helper.require_authorization = False
+    response = request_helper.post_json(url + '@signup', USER_DATA[2])
+    assert response.status_int == 200
+    request_helper.require_authorization = True
+    request_helper.auth_token = response.json['token']
+    request_helper.auth_key = response.json['key']
+    response = request_helper.get_json(url)
+    assert response.status_int == 200
+
+    # Filter is built again outside of the request
+    monkeypatch.setattr(TOKEN_FILTER, 'bloom', BloomFilter(1000))
+    TOKEN_FILTER.rebuild()
+    assert request_helper.auth_token in TOKEN_FILTER.bloom
+    assert len(TOKEN_FILTER.bloom) == stats['size'] + 1
+    builds = []
+    monkeypatch.setattr(TOKEN_FILTER, 'build', lambda: builds.append(1))
+    TOKEN_FILTER.start_build().join()
+    TOKEN_FILTER.start_build().join()
+    assert len(builds) == 2
\ No newline at end of file
@@ -0,0 +1,25 @@
+from sandglass.time.bloom import BloomFilter
+
+
+def test_bloom_filter():
+    """
+    Test that Bloom filters contain all added values and reject
+    most values that were not added.
+
+    """
+    bloom = BloomFilter(1000, error_rate=0.01)
+    value_list = [u"token-{}".format(index) for index in range(1000)]
+    for value in value_list:
+        bloom.add(value)
+
+    assert len(bloom) == 1000
+    # Added values are always found
+    assert all(value in bloom for value in value_list)
+
+    # Other values are found with a small probability
+    false_positives = sum(
+        1 for index in range(10000)
+        if "other-{}".format(index) in bloom
+    )
+    assert false_positives < 300
+    assert 0 < bloom.get_false_positive_rate() < 0.03
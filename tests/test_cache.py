@@ -0,0 +1,79 @@
+from sandglass.time.cache import LRUCache
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache():
+    """
+    Test LRU eviction, TTL expiration and statistics of caches.
+
+    """
+    timer = FakeTimer()
+    cache = LRUCache(max_size=2, ttl=10, timer=timer)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    # Least recently used value is removed when cache is full
+    cache.set('c', 3)
+    assert len(cache) == 2
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert cache.get('b', 'default') == 'default'
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+    stats = cache.stats()
+    assert stats['hits'] == 3
+    assert stats['misses'] == 2
+    assert stats['size'] == 2
+
+    # Values expire after TTL seconds
+    timer.now = 10
+    assert cache.get('a') is None
+    assert len(cache) == 1
+
+    cache.set('a', 1)
+    cache.set('d', 4)
+    assert cache.delete_many(lambda key, value: value > 2) == 1
+    assert cache.delete('a')
+    assert not cache.delete('a')
+    assert len(cache) == 0
+
+    cache.reset_stats()
+    assert cache.stats()['hits'] == 0
+
+    # Cache with zero size doesn't save values
+    cache = LRUCache(max_size=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+
+def test_lru_cache_memory():
+    """
+    Test that cache memory is limited to a number of bytes.
+
+    """
+    cache = LRUCache(max_size=10, ttl=10, max_memory=10, get_size=len)
+    cache.set('a', 'aaaa')
+    cache.set('b', 'bbbb')
+    assert cache.get('a') == 'aaaa'
+    assert cache.stats()['memory'] == 8
+    # Least recently used values are removed to fit new values
+    cache.set('c', 'cccc')
+    assert 'b' not in cache
+    assert cache.stats()['memory'] == 8
+    # Values bigger than the memory limit are not saved
+    cache.set('a', 'a' * 11)
+    assert 'a' not in cache
+    assert cache.stats()['memory'] == 4
+    assert cache.delete('c')
+    assert cache.stats()['memory'] == 0
+
+    assert cache.get('c') is None
+    assert cache.stats()['hit_ratio'] == 0.5
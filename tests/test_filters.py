@@ -0,0 +1,35 @@
+from pyramid import testing
+
+from sandglass.time.filters.project import ByVisibleProject
+from sandglass.time.models.task import Task
+
+
+class TaskResource(object):
+    model = Task
+
+
+def test_by_visible_project_filter(default_data, session):
+    """
+    Test filtering query results by visible projects.
+
+    Results without project are not filtered.
+
+    """
+    user = default_data.users.dr_who
+    task = default_data.tasks.private
+    public_task = default_data.tasks.meeting
+    session.add_all([user, task, public_task])
+    # Add a task without project
+    projectless_task = Task(name=u"Projectless", user_id=task.user_id)
+    session.add(projectless_task)
+    session.flush()
+
+    query = Task.query(session=session)
+    request = testing.DummyRequest(authenticated_user=user)
+    query = ByVisibleProject().filter_query(query, request, TaskResource)
+    assert 'IS NULL' in str(query)
+
+    task_id_list = [item.id for item in query]
+    assert projectless_task.id in task_id_list
+    assert public_task.id in task_id_list
+    assert task.id not in task_id_list
@@ -0,0 +1,157 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy import inspect
+
+from sandglass.time.models import META
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    'migrations',
+)
+
+ACTIVITY_INDEXES = set([
+    'idx_time_activity_user_start',
+    'idx_time_activity_project_start',
+    'idx_time_activity_task_id',
+])
+
+
+def get_alembic_config(url):
+    config = Config()
+    config.set_main_option('script_location', MIGRATIONS_DIR)
+    config.set_main_option('sqlalchemy.url', url)
+    return config
+
+
+def get_index_names(engine, table_name):
+    indexes = inspect(engine).get_indexes(table_name)
+    return set(index['name'] for index in indexes)
+
+
+def test_activity_indexes_migration(tmpdir):
+    """
+    Test activity indexes migration on an existing database.
+
+    """
+    url = 'sqlite:///{}'.format(tmpdir.join('sandglass.db'))
+    engine = create_engine(url)
+    META.create_all(engine)
+    # New databases are created with the indexes
+    assert get_index_names(engine, 'time_activity') == ACTIVITY_INDEXES
+
+    # Existing indexes are skipped
+    config = get_alembic_config(url)
+    command.upgrade(config, 'head')
+    assert get_index_names(engine, 'time_activity') == ACTIVITY_INDEXES
+
+    command.downgrade(config, 'base')
+    assert not get_index_names(engine, 'time_activity')
+
+    command.upgrade(config, 'head')
+    assert get_index_names(engine, 'time_activity') == ACTIVITY_INDEXES
+
+
+def test_association_primary_keys_migration(tmpdir):
+    """
+    Test that association table duplicates are removed when
+    primary keys are added.
+
+    """
+    url = 'sqlite:///{}'.format(tmpdir.join('sandglass.db'))
+    engine = create_engine(url)
+    META.create_all(engine)
+    config = get_alembic_config(url)
+    command.upgrade(config, 'head')
+    # Tables without primary keys can contain duplicated rows
+    command.downgrade(config, '3f1c2a7d9b10')
+    table_names = inspect(engine).get_table_names()
+    assert 'time_activity_rollup' not in table_names
+    assert 'time_activity_snapshot' not in table_names
+    assert 'time_timezone_offset' not in table_names
+    assert 'time_cache_version' not in table_names
+    pk_constraint = inspect(engine).get_pk_constraint('time_group_user')
+    assert not pk_constraint['constrained_columns']
+    insert = 'INSERT INTO time_group_user (group_id, user_id) VALUES (?, ?)'
+    engine.execute(insert, [(1, 1), (1, 1), (1, 2), (None, 3)])
+
+    command.upgrade(config, 'head')
+    pk_constraint = inspect(engine).get_pk_constraint('time_group_user')
+    assert pk_constraint['constrained_columns'] == ['group_id', 'user_id']
+    assert 'idx_time_group_user_user_id' in get_index_names(
+        engine,
+        'time_group_user',
+    )
+    rows = engine.execute('SELECT group_id, user_id FROM time_group_user')
+    assert sorted(tuple(row) for row in rows) == [(1, 1), (1, 2)]
+    table_names = inspect(engine).get_table_names()
+    assert 'time_activity_rollup' in table_names
+    for name in ('time_period', 'time_period_user', 'time_activity_snapshot'):
+        assert name in table_names
+    assert 'time_timezone_offset' in table_names
+    rows = engine.execute('SELECT name, version FROM time_cache_version')
+    assert [tuple(row) for row in rows] == [(u'visible_projects', 0)]
+
+
+def test_timestamp_columns_migration(tmpdir):
+    """
+    Test that timestamp columns are added to tables created without them.
+
+    """
+    url = 'sqlite:///{}'.format(tmpdir.join('sandglass.db'))
+    engine = create_engine(url)
+    META.create_all(engine)
+    engine.execute('CREATE TABLE time_client_old (id INTEGER, name TEXT)')
+    engine.execute('INSERT INTO time_client_old VALUES (1, "Lestrade")')
+    engine.execute('DROP TABLE time_client')
+    engine.execute('ALTER TABLE time_client_old RENAME TO time_client')
+
+    config = get_alembic_config(url)
+    command.upgrade(config, 'head')
+    columns = inspect(engine).get_columns('time_client')
+    column_names = [column['name'] for column in columns]
+    assert 'created' in column_names
+    assert 'modified' in column_names
+    rows = engine.execute('SELECT id, created, modified FROM time_client')
+    assert [tuple(row) for row in rows] == [(1, None, None)]
+    user_columns = inspect(engine).get_columns('time_user')
+    assert 'timezone' in [column['name'] for column in user_columns]
+    assert 'tokens_revoked_at' in [column['name'] for column in user_columns]
+
+
+def test_activity_rollup_unique_migration(tmpdir):
+    """
+    Test that duplicated daily totals are deleted when unique index
+    is added.
+
+    """
+    url = 'sqlite:///{}'.format(tmpdir.join('sandglass.db'))
+    engine = create_engine(url)
+    META.create_all(engine)
+    config = get_alembic_config(url)
+    command.upgrade(config, 'head')
+    command.downgrade(config, 'b6e4f1a9c382')
+    assert 'uq_time_activity_rollup_group' not in get_index_names(
+        engine,
+        'time_activity_rollup',
+    )
+    insert = (
+        'INSERT INTO time_activity_rollup (user_id, project_id, task_id, '
+        'activity_type, day, seconds, count) VALUES (?, ?, ?, ?, ?, ?, ?)'
+    )
+    engine.execute(insert, [
+        (1, 1, None, 'working', '2014-03-03', 3600, 1),
+        (1, 1, None, 'working', '2014-03-03', 3600, 1),
+        (1, 1, None, 'working', '2014-03-04', 3600, 1),
+        (2, 1, None, 'working', '2014-03-03', 3600, 1),
+    ])
+
+    command.upgrade(config, 'head')
+    assert 'uq_time_activity_rollup_group' in get_index_names(
+        engine,
+        'time_activity_rollup',
+    )
+    rows = engine.execute('SELECT user_id, day FROM time_activity_rollup')
+    assert [tuple(row) for row in rows] == [(2, '2014-03-03')]
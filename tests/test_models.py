@@ -0,0 +1,133 @@
+from sqlalchemy.orm import load_only
+
+from sandglass.time.events import ModelChanged
+from sandglass.time.models import READONLY_SESSION
+from sandglass.time.models.client import Client
+from sandglass.time.models.group import Group
+from sandglass.time.models.permission import invalidate_permission_matrix
+from sandglass.time.models.permission import Permission
+from sandglass.time.models.permission import PermissionMatrix
+from sandglass.time.models.permission import PERMISSIONS
+from sandglass.time.models.serializer import ModelSerializer
+from sandglass.time.models.user import User
+
+
+def test_model_serializer(default_data, session):
+    """
+    Test serialization of model objects.
+
+    """
+    # Serializers are created once for each model class
+    serializer = User.get_serializer()
+    assert isinstance(serializer, ModelSerializer)
+    assert User.get_serializer() is serializer
+    assert Client.get_serializer() is not serializer
+
+    # Private fields should not be serialized
+    assert 'id' in serializer.field_names
+    assert 'email' in serializer.field_names
+    assert '_password' not in serializer.field_names
+    assert 'password' not in serializer.field_names
+
+    user = default_data.users.dr_who
+    session.add(user)
+    data = serializer.serialize(user)
+    assert sorted(data.keys()) == sorted(serializer.field_names)
+    assert data['email'] == user.email
+    assert dict(user) == data
+
+    # Expired fields should be loaded during serialization
+    session.expire(user)
+    assert serializer.serialize(user) == data
+
+    # Deferred fields should not be serialized
+    session.expunge_all()
+    query = User.query(session=session).options(load_only('id', 'email'))
+    user = query.filter_by(id=user.id).one()
+    assert serializer.serialize(user) == {'id': user.id, 'email': user.email}
+    assert dict(user) == {'id': user.id, 'email': user.email}
+
+
+def test_permission_matrix(default_data, session, monkeypatch):
+    """
+    Test user permission checks using the permission matrix.
+
+    """
+    user = default_data.users.dr_who
+    session.add(user)
+    group = user.groups[0]
+    permission = Permission(name=u"time.test.matrix")
+    other_permission = Permission(name=u"time.test.other")
+    session.add_all([permission, other_permission])
+    group.permissions.append(permission)
+    session.flush()
+
+    # Matrix is only built again after it is invalidated
+    PERMISSIONS.invalidate()
+    matrix = PERMISSIONS.matrix
+    assert PERMISSIONS.matrix is matrix
+    invalidate_permission_matrix(ModelChanged(None, User, [user.id]))
+    assert PERMISSIONS.matrix is matrix
+    event = ModelChanged(None, Group, [group.id], related_name='permissions')
+    invalidate_permission_matrix(event)
+    assert PERMISSIONS.matrix is not matrix
+
+    # Matrix is built again when it expires
+    now = [1000.0]
+    matrix_permissions = PermissionMatrix(ttl=30, timer=lambda: now[0])
+    matrix = matrix_permissions.matrix
+    now[0] += 29
+    assert matrix_permissions.matrix is matrix
+    now[0] += 1
+    assert matrix_permissions.matrix is not matrix
+
+    # Matrix is not saved when it is invalidated while it is built
+    build = matrix_permissions.build
+
+    def build_and_invalidate(session=None):
+        result = build(session)
+        matrix_permissions.invalidate()
+        return result
+
+    matrix_permissions.invalidate()
+    matrix_permissions.build = build_and_invalidate
+    assert matrix_permissions.matrix
+    assert not matrix_permissions.is_valid()
+    matrix_permissions.build = build
+    matrix = matrix_permissions.matrix
+    assert matrix_permissions.matrix is matrix
+
+    # Matrix is built using a read only session that is closed
+    closed_sessions = []
+
+    def create_session():
+        readonly_session = READONLY_SESSION()
+        close = readonly_session.close
+
+        def close_session():
+            closed_sessions.append(readonly_session)
+            close()
+
+        readonly_session.close = close_session
+        return readonly_session
+
+    matrix_permissions.invalidate()
+    monkeypatch.setattr(
+        'sandglass.time.models.permission.READONLY_SESSION',
+        create_session,
+    )
+    assert matrix_permissions.matrix
+    assert len(closed_sessions) == 1
+    assert closed_sessions[0] is not session
+    monkeypatch.undo()
+
+    assert user.has_permission(u"time.test.matrix")
+    assert not user.has_permission(u"time.test.other")
+    assert not user.has_permission(u"time.test.unknown")
+    assert u"time.test.matrix" in user.permissions
+    assert not user.is_admin
+
+    # Admin flag is computed from administrator groups
+    admin_user = User.query(session).get(1)
+    assert admin_user.is_admin
+    assert not admin_user.has_permission(u"time.test.matrix")
@@ -0,0 +1,220 @@
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+
+from sandglass.time.models.activity import Activity
+from sandglass.time.models.user import timezone_offset_table
+from sandglass.time.reports import analytics
+from sandglass.time.reports import timezone
+from sandglass.time.reports.activity import ActivityReport
+from sandglass.time.reports.sql import add_seconds
+from sandglass.time.reports.sql import date_bucket
+from sandglass.time.reports.sql import duration_seconds
+from sandglass.time.reports.sql import epoch_seconds
+from sandglass.time.reports.timezone import get_saved_timezones
+from sandglass.time.reports.timezone import get_timezone_offsets
+from sandglass.time.reports.timezone import save_timezone_offsets
+
+
+def compile_expression(expression, dialect):
+    return str(expression.compile(dialect=dialect))
+
+
+def set_autocommit(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+def test_report_sql_expressions():
+    """
+    Test that report expressions are compiled for each database.
+
+    """
+    table = Activity.__table__
+    duration = duration_seconds(table.c.start, table.c.end)
+    week = date_bucket('week', table.c.start)
+    epoch = epoch_seconds(table.c.start)
+    local = add_seconds(table.c.start, 3600)
+
+    sql = compile_expression(duration, sqlite.dialect())
+    assert 'julianday(time_activity."end")' in sql
+    sql = compile_expression(week, sqlite.dialect())
+    assert sql == "date(time_activity.start, 'weekday 0', '-6 days')"
+    sql = compile_expression(epoch, sqlite.dialect())
+    assert sql == "CAST(strftime('%s', time_activity.start) AS INTEGER)"
+    sql = compile_expression(local, sqlite.dialect())
+    assert sql.startswith("strftime('%Y-%m-%d %H:%M:%f000', time_activity")
+
+    sql = compile_expression(duration, postgresql.dialect())
+    assert 'EXTRACT(EPOCH FROM' in sql
+    sql = compile_expression(week, postgresql.dialect())
+    assert sql == "CAST(date_trunc('week', time_activity.start) AS DATE)"
+    sql = compile_expression(local, postgresql.dialect())
+    assert "* INTERVAL '1 second'" in sql
+
+    sql = compile_expression(duration, mysql.dialect())
+    assert sql.startswith('TIMESTAMPDIFF(SECOND, time_activity.start')
+    sql = compile_expression(week, mysql.dialect())
+    assert 'WEEKDAY(time_activity.start)' in sql
+    sql = compile_expression(epoch, mysql.dialect())
+    assert "'1970-01-01', time_activity.start" in sql
+    sql = compile_expression(local, mysql.dialect())
+    assert sql.startswith('DATE_ADD(time_activity.start, INTERVAL')
+
+
+def test_timezone_offsets():
+    """
+    Test that time zone offsets include daylight saving time changes.
+
+    """
+    def get_offset(offsets, value):
+        for (start, end, offset) in offsets:
+            if start <= value < end:
+                return offset
+
+    offsets = get_timezone_offsets('Europe/Vienna')
+    # Offsets are contiguous
+    for (previous, current) in zip(offsets, offsets[1:]):
+        assert previous[1] == current[0]
+
+    # Daylight saving time starts at 01:00 UTC on 2014-03-30
+    assert get_offset(offsets, datetime(2014, 3, 30, 0, 59)) == 3600
+    assert get_offset(offsets, datetime(2014, 3, 30, 1, 0)) == 7200
+    assert get_offset(offsets, datetime(2014, 10, 26, 1, 0)) == 3600
+
+    assert get_timezone_offsets('UTC') == [
+        (datetime(1900, 1, 1), datetime(9999, 12, 31), 0),
+    ]
+    assert get_timezone_offsets('Unknown/Zone')[0][2] == 0
+    assert get_timezone_offsets('Etc/GMT-3')[0][2] == 3 * 3600
+
+
+
+def test_save_timezone_offsets(monkeypatch):
+    """
+    Test that offsets saved at the same time by another request
+    are ignored when database can't ignore existing rows.
+
+    """
+    # Savepoints need explicit transactions with pysqlite
+    engine = create_engine('sqlite://')
+    event.listen(engine, 'connect', set_autocommit)
+    event.listen(engine, 'begin', lambda conn: conn.execute('BEGIN'))
+    timezone_offset_table.create(engine)
+    session = sessionmaker(bind=engine)()
+
+    timezones = [u'Europe/Vienna']
+    save_timezone_offsets(session, timezones)
+    assert get_saved_timezones(session, timezones) == set(timezones)
+
+    # Simulate offsets saved after they were checked
+    monkeypatch.setattr(timezone, 'INSERT_IGNORE_PREFIXES', {})
+    monkeypatch.setattr(timezone, 'get_saved_timezones', lambda *args: set())
+    timezones.append(u'America/New_York')
+    save_timezone_offsets(session, timezones)
+    monkeypatch.undo()
+    session.commit()
+    assert get_saved_timezones(session, timezones) == set(timezones)
+    session.close()
+
+
+def test_activity_columns():
+    """
+    Test vectorized totals, pivots and percentiles of activity columns.
+
+    """
+    numpy = pytest.importorskip('numpy')
+
+    # 2014-03-02 is a Sunday and 2014-03-03 is a Monday
+    day = 16131 * analytics.SECONDS_PER_DAY
+    start = [day + 3600, day + 7200, day + 86400, day + 86400 + 3600]
+    hours = [1, 2, 3, 4]
+    columns = analytics.ActivityColumns(
+        start=start,
+        end=[value + count * 3600 for (value, count) in zip(start, hours)],
+        user_id=[1, 2, 1, -1],
+        project_id=[5, 5, 6, 6],
+        task_id=[-1, -1, -1, 7],
+        activity_type=[0, 0, 1, 0],
+    )
+    assert columns.user_id.dtype == numpy.int32
+    assert columns.durations.tolist() == [3600, 7200, 10800, 14400]
+
+    (keys, seconds, counts) = columns.group_sum(['user', 'week'])
+    rows = analytics.get_report_rows(columns, ['user', 'week'])
+    assert rows == [
+        [None, '2014-03-03', 4 * 3600, 1],
+        [1, '2014-02-24', 3600, 1],
+        [1, '2014-03-03', 3 * 3600, 1],
+        [2, '2014-02-24', 2 * 3600, 1],
+    ]
+    assert analytics.get_report_rows(columns, []) == [[10 * 3600, 4]]
+    rows = analytics.get_report_rows(columns, ['activity_type', 'month'])
+    assert rows[0][0] == analytics.ACTIVITY_TYPE_CATEGORIES[0]
+    assert [row[1] for row in rows] == ['2014-03-01', '2014-03-01']
+
+    (rows, cols, totals) = columns.pivot('project', 'day')
+    assert rows.tolist() == [5, 6]
+    assert cols.tolist() == [16131, 16132]
+    assert totals.tolist() == [[3 * 3600, 0], [0, 7 * 3600]]
+
+    percents = [0, 25, 50, 90, 100]
+    (keys, values) = columns.percentiles(percents)
+    expected = numpy.percentile(columns.durations, percents)
+    assert numpy.allclose(values[0], expected)
+    (keys, values) = columns.percentiles([50], names=['project'])
+    assert keys.tolist() == [[5], [6]]
+    assert values.tolist() == [[5400.0], [12600.0]]
+
+
+def test_activity_report_engines(default_data, session):
+    """
+    Test that NumPy and SQL engines compute the same reports.
+
+    """
+    pytest.importorskip('numpy')
+
+    user = default_data.users.dr_who
+    project = default_data.projects.public_project
+    session.add_all([user, project])
+    for (start, hours, project_id) in (
+            (datetime(2014, 3, 2, 22, 0), 1, project.id),
+            (datetime(2014, 3, 3, 8, 0), 2, project.id),
+            (datetime(2014, 3, 3, 14, 30), 1, None),
+            (datetime(2014, 3, 31, 23, 0), 3, project.id)):
+        session.add(Activity(
+            description=u"Engine activity",
+            user_id=user.id,
+            project_id=project_id,
+            start=start,
+            end=start + timedelta(hours=hours),
+        ))
+
+    # Activities without end are not included
+    session.add(Activity(
+        description=u"Unfinished activity",
+        user_id=user.id,
+        start=datetime(2014, 3, 4, 8, 0),
+    ))
+    session.flush()
+
+    for group_by in ([], ['user', 'day'], ['project', 'week'],
+                     ['activity_type', 'task', 'month']):
+        reports = [
+            ActivityReport(
+                group_by=group_by,
+                from_date=datetime(2014, 3, 1),
+                user_id_list=[user.id],
+                engine=engine,
+            )
+            for engine in ('sql', 'numpy')
+        ]
+        assert reports[1].is_analytics_report
+        assert reports[0].get_rows(session) == reports[1].get_rows(session)